@@ -4,29 +4,114 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from dotenv import load_dotenv
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached, object_session
+from .replica import RoutingSession
 import logging
 
 logging.basicConfig()
-logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
 
 # Загружаем переменные окружения
 load_dotenv()
 
-# Инициализация базы данных
-db = SQLAlchemy()
+# Инициализация базы данных (сессия умеет читать отчёты с реплики)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
 # Инициализация Flask-Login
 login_manager = LoginManager()
 
+# Ключ session.info: id пользователей, изменённых в текущей транзакции
+USER_IDS_KEY = 'user_cache_ids'
+# Ключ session.info: (магазин, месяц) сотрудников, изменённых в транзакции
+EMPLOYEE_KEYS_KEY = 'employee_cache_keys'
+
+
+def env_flag(name, default=False):
+    """Булево значение переменной окружения (1/true/yes/on)."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def engine_options(database_url):
+    """
+    Параметры движка SQLAlchemy (пул соединений) из переменных окружения.
+    Размер пула и тайм-аут запросов применяются только к серверным базам.
+    """
+    options = {
+        # Проверка соединения перед выдачей из пула (после простоя)
+        'pool_pre_ping': env_flag("DB_POOL_PRE_PING", True),
+        # Пересоздание соединений старше N секунд (-1 — не пересоздавать)
+        'pool_recycle': int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    }
+    if not database_url or database_url.startswith('sqlite'):
+        return options
+
+    options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", 5)),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", 30)),
+    )
+    statement_timeout = int(os.getenv("DB_STATEMENT_TIMEOUT", 0))
+    if statement_timeout and database_url.startswith('postgresql'):
+        options['connect_args'] = {
+            'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
 
 def create_app():
     # Инициализация приложения Flask
     app = Flask(__name__)
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("DATABASE_URL")
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'])
+    # Реплика для отчётных страниц (необязательно)
+    replica_url = os.getenv("DATABASE_REPLICA_URL")
+    if replica_url:
+        app.config['SQLALCHEMY_BINDS'] = {
+            'replica': {'url': replica_url, **engine_options(replica_url)}}
+    # Сколько секунд после записи пользователь читает отчёты с основной базы
+    app.config['REPLICA_STICKY_SECONDS'] = float(
+        os.getenv("REPLICA_STICKY_SECONDS", 5))
     app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "4815162342")
 
+    # Логирование SQL (каждый запрос с параметрами) — только по запросу
+    app.config['SQL_ECHO'] = env_flag("SQL_ECHO")
+    # Профилирование запросов: Server-Timing и JSON-журнал
+    app.config['PROFILE_REQUESTS'] = env_flag("PROFILE_REQUESTS")
+    app.config['PROFILE_LOG'] = os.getenv("PROFILE_LOG")
+    # Кэш пользователей для load_user (0 — выключен). Другие процессы
+    # видят изменение пользователя (в том числе прав) не позже, чем через TTL
+    app.config['USER_CACHE_TTL'] = int(os.getenv("USER_CACHE_TTL", 30))
+    app.config['USER_CACHE_SIZE'] = int(os.getenv("USER_CACHE_SIZE", 1024))
+    # Кэш сотрудников для выпадающих списков форм (0 — выключен). Как и кэш
+    # пользователей, он у каждого процесса свой: изменения сотрудников другие
+    # воркеры видят не позже, чем через TTL
+    app.config['EMPLOYEE_CACHE_TTL'] = int(os.getenv("EMPLOYEE_CACHE_TTL", 300))
+    app.config['EMPLOYEE_CACHE_SIZE'] = int(os.getenv("EMPLOYEE_CACHE_SIZE", 256))
+    # Размер страницы общих таблиц доходов/возвратов/расходов
+    app.config['LEDGER_PAGE_SIZE'] = int(os.getenv("LEDGER_PAGE_SIZE", 100))
+    # Потоки для параллельных запросов (JSON API и главная страница)
+    app.config['PARALLEL_WORKERS'] = int(os.getenv("PARALLEL_WORKERS", 4))
+    # Запросы главной страницы параллельно (0 — по очереди, как раньше)
+    app.config['DASHBOARD_PARALLEL'] = env_flag("DASHBOARD_PARALLEL", True)
+    # Кэш главной страницы: пусто — в памяти процесса, local:// или redis://...
+    app.config['DASHBOARD_CACHE_URL'] = os.getenv("DASHBOARD_CACHE_URL", "")
+    app.config['DASHBOARD_CACHE_TTL'] = int(os.getenv("DASHBOARD_CACHE_TTL", 300))
+    app.config['DASHBOARD_CACHE_SIZE'] = int(os.getenv("DASHBOARD_CACHE_SIZE", 256))
+    # Статика с отпечатком из `flask assets build` (0 — всегда /static/);
+    # в режиме отладки по умолчанию выключена, чтобы правки были видны сразу
+    app.config['ASSETS_FINGERPRINT'] = env_flag("ASSETS_FINGERPRINT", not app.debug)
+    # Кэш байт-кода шаблонов Jinja; пустой каталог — временный каталог системы
+    app.config['JINJA_BYTECODE_CACHE'] = env_flag("JINJA_BYTECODE_CACHE", True)
+    app.config['JINJA_CACHE_DIR'] = os.getenv("JINJA_CACHE_DIR", "")
+
+    logging.getLogger('sqlalchemy.engine').setLevel(
+        logging.INFO if app.config['SQL_ECHO'] else logging.WARNING)
+
     # Подключение базы данных
     db.init_app(app)
     migrate.init_app(app, db)
@@ -35,16 +120,121 @@ def create_app():
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'  # Указать маршрут для страницы входа
 
+    # Статика с отпечатками, кэш шаблонов и CLI `flask assets build`
+    from . import assets
+    assets.init_app(app)
+
     # Регистрация маршрутов
     from .routes import init_routes
     init_routes(app)
+
+    # Время последней записи пользователя для чтения с реплики
+    from . import replica
+    replica.init_app(app)
+
+    # Счётчик SQL-запросов и профилирование запросов
+    from . import profiling
+    profiling.init_app(app)
+
+    # Дневные итоги для главной страницы и CLI `flask rollups ...`
+    from . import rollups
+    rollups.init_app(app)
     with app.app_context():
         from app import models
 
+    # Импорт CSV: `flask import-csv ...` и страница /import
+    from . import importer
+    importer.init_app(app)
+
+    # Кэш главной страницы, сбрасываемый после коммитов с изменениями
+    from . import dashboard_cache
+    dashboard_cache.init_app(app)
+
+    # Кэш пользователей сбрасывается после коммита, изменившего строку User
+    from .cache import user_cache
+    user_cache.configure(maxsize=app.config['USER_CACHE_SIZE'],
+                         ttl=app.config['USER_CACHE_TTL'])
+    for event_name in ('after_insert', 'after_update', 'after_delete'):
+        if not event.contains(models.User, event_name, _note_user_change):
+            event.listen(models.User, event_name, _note_user_change)
+    if not event.contains(db.session, 'after_commit', _invalidate_users):
+        event.listen(db.session, 'after_commit', _invalidate_users)
+        event.listen(db.session, 'after_rollback', _forget_user_changes)
+
+    # Кэш сотрудников для форм сбрасывается после коммита, изменившего Employee
+    from .cache import employee_cache
+    employee_cache.configure(maxsize=app.config['EMPLOYEE_CACHE_SIZE'],
+                             ttl=app.config['EMPLOYEE_CACHE_TTL'])
+    for event_name in ('after_insert', 'after_update', 'after_delete'):
+        if not event.contains(models.Employee, event_name, _note_employee_change):
+            event.listen(models.Employee, event_name, _note_employee_change)
+    if not event.contains(db.session, 'after_commit', _invalidate_employees):
+        event.listen(db.session, 'after_commit', _invalidate_employees)
+        event.listen(db.session, 'after_rollback', _forget_employee_changes)
+
     return app
 
 
+def _note_user_change(mapper, connection, target):
+    # Сбрасывать сразу нельзя: до коммита параллельный запрос закэшировал бы
+    # старую строку снова, а при откате запись была бы сброшена зря
+    object_session(target).info.setdefault(USER_IDS_KEY, set()).add(target.id)
+
+
+def _invalidate_users(session):
+    # after_commit срабатывает и для SAVEPOINT — ждём внешнюю транзакцию
+    if session.in_nested_transaction():
+        return
+    from .cache import user_cache
+    for user_id in session.info.pop(USER_IDS_KEY, ()):
+        user_cache.invalidate(user_id)
+
+
+def _forget_user_changes(session):
+    if not session.in_nested_transaction():
+        session.info.pop(USER_IDS_KEY, None)
+
+
+def _note_employee_change(mapper, connection, target):
+    # Как у пользователей — сброс после коммита. Сотрудника могли перевести
+    # в другой магазин или месяц, поэтому запоминаем и прежние ключи
+    state = inspect(target)
+    shop_ids = {target.shop_id, *state.attrs.shop_id.history.deleted}
+    months = {target.month, *state.attrs.month.history.deleted}
+    object_session(target).info.setdefault(EMPLOYEE_KEYS_KEY, set()).update(
+        (shop_id, month) for shop_id in shop_ids for month in months)
+
+
+def _invalidate_employees(session):
+    if session.in_nested_transaction():
+        return
+    from .cache import employee_cache
+    for key in session.info.pop(EMPLOYEE_KEYS_KEY, ()):
+        employee_cache.invalidate(key)
+
+
+def _forget_employee_changes(session):
+    if not session.in_nested_transaction():
+        session.info.pop(EMPLOYEE_KEYS_KEY, None)
+
+
 @login_manager.user_loader
 def load_user(user_id):
     from app.models import User  # Импорт модели пользователя
-    return User.query.get(int(user_id))
+    from .cache import user_cache
+    user_id = int(user_id)
+
+    # Из кэша — объект, присоединённый к сессии без SELECT (как загруженный)
+    values = user_cache.get(user_id)
+    if values is not None:
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        user_cache.set(user_id, {
+            column.key: getattr(user, column.key)
+            for column in User.__table__.columns
+        })
+    return user
@@ -0,0 +1,207 @@
+"""
+JSON API для журналов магазина и агрегатов главной страницы.
+
+    GET /api/shops/<shop_id>/<ledger>?start_date=&end_date=&after=&per_page=
+        ledger: incomes, returns, expenses, sales_returns, expenses_table
+    GET /api/dashboard?start_date=&end_date=
+    POST /api/shops/<shop_id>/<table>/delta
+        table: sales_returns, expenses_table (формат тела — app.delta)
+
+Независимые запросы одного ответа (страница и итоги журнала; ряды,
+матрица магазинов и зарплаты дашборда) выполняются параллельно через
+app.parallel, поэтому ответ ждёт самый долгий из них, а не их сумму.
+"""
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, abort, request
+from flask_login import current_user, login_required
+from sqlalchemy import tuple_
+from werkzeug.exceptions import default_exceptions
+
+from app import db
+from app.delta import DELTA_TABLES, apply_delta
+from app.dashboard import dashboard_series, payroll_total, shop_profit_matrix
+from app.exports import LEDGERS, ledger_query
+from app.forms import SALES_RETURN_AMOUNT_FIELDS, SHOP_EXPENSE_CATEGORIES
+from app.models import Shop
+from app.money import column_totals
+from app.pagination import decode_cursor, encode_cursor, page_size
+from app.parallel import run_parallel
+from app.replica import reporting
+
+api_bp = Blueprint('api', __name__, url_prefix='/api')
+
+# Журнал -> колонки, по которым считаются итоги за период
+LEDGER_TOTALS = {
+    'incomes': ('amount',),
+    'returns': ('amount',),
+    'expenses': ('amount',),
+    'sales_returns': SALES_RETURN_AMOUNT_FIELDS,
+    'expenses_table': SHOP_EXPENSE_CATEGORIES,
+}
+
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _field_names(ledger):
+    """Имена полей JSON: колонки модели журнала и <таблица>_<колонка> для JOIN."""
+    model, columns, _ = LEDGERS[ledger]
+    return [column.key if column.class_ is model
+            else f'{column.class_.__tablename__}_{column.key}'
+            for _, column in columns]
+
+
+def _parse_date(value):
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        abort(400, description=f"Дата должна быть строкой ГГГГ-ММ-ДД: {value!r}")
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        abort(400, description=f"Некорректная дата: {value}")
+
+
+def _json_error(error):
+    # Клиенты API ждут JSON, а не HTML-страницу ошибки Flask
+    return {'message': error.description}, error.code
+
+
+# По кодам, а не по HTTPException: обработчик приложения для кода (404)
+# иначе выигрывает у обработчика blueprint для класса исключения
+for _code in default_exceptions:
+    api_bp.register_error_handler(_code, _json_error)
+
+
+def _check_shop(shop_id):
+    if current_user.shop_id is not None and current_user.shop_id != shop_id:
+        abort(403)
+
+
+def ledger_page(ledger, shop_id, start_date, end_date, cursor, size):
+    """Строки журнала после курсора (date, id) и курсор следующей страницы."""
+    model = LEDGERS[ledger][0]
+    query = ledger_query(ledger, shop_id, start_date, end_date)
+    position = decode_cursor(cursor)
+    if position is not None:
+        query = query.where(tuple_(model.date, model.id) > tuple_(*position))
+
+    rows = db.session.execute(query.limit(size + 1)).all()
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(rows[-1].date, rows[-1].id)
+
+    names = _field_names(ledger)
+    items = [{name: _json_value(value) for name, value in zip(names, row)}
+             for row in rows]
+    return items, next_cursor
+
+
+def ledger_totals(ledger, shop_id, start_date, end_date):
+    """Суммы колонок LEDGER_TOTALS за период."""
+    model = LEDGERS[ledger][0]
+    criteria = [model.shop_id == shop_id]
+    if start_date:
+        criteria.append(model.date >= start_date)
+    if end_date:
+        criteria.append(model.date <= end_date)
+    return column_totals(model, LEDGER_TOTALS[ledger], *criteria)
+
+
+@api_bp.route('/shops/<int:shop_id>/<ledger>', methods=['GET'])
+@login_required
+@reporting
+def shop_ledger(shop_id, ledger):
+    if ledger not in LEDGERS:
+        abort(404)
+    _check_shop(shop_id)
+
+    start_date = _parse_date(request.args.get('start_date'))
+    end_date = _parse_date(request.args.get('end_date'))
+    cursor = request.args.get('after')
+    size = page_size()
+
+    results, _ = run_parallel({
+        'page': lambda: ledger_page(ledger, shop_id, start_date, end_date,
+                                    cursor, size),
+        'totals': lambda: ledger_totals(ledger, shop_id, start_date, end_date),
+    })
+    items, next_cursor = results['page']
+    return {
+        'shop_id': shop_id,
+        'ledger': ledger,
+        'items': items,
+        'next_cursor': next_cursor,
+        'totals': results['totals'],
+    }
+
+
+@api_bp.route('/dashboard', methods=['GET'])
+@login_required
+@reporting
+def dashboard():
+    """Ряды, итоги, прибыль по магазинам и зарплаты за период (по умолчанию — неделя)."""
+    end_date = _parse_date(request.args.get('end_date')) or date.today()
+    start_date = (_parse_date(request.args.get('start_date'))
+                  or end_date - timedelta(days=6))
+    scope = current_user.shop_id
+
+    shops_query = Shop.query.order_by(Shop.id)
+    if scope is not None:
+        shops_query = shops_query.filter(Shop.id == scope)
+    # Магазины загружены здесь; задача читает у них только уже загруженные поля
+    shops = shops_query.all()
+
+    results, timings = run_parallel({
+        'series': lambda: dashboard_series(start_date, end_date, shop_id=scope),
+        'shops': lambda: shop_profit_matrix(start_date, end_date, shops),
+        'payroll': lambda: payroll_total(start_date, end_date, shop_id=scope),
+    })
+    series = results['series']
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'days': [day.isoformat() for day in series.days],
+        'series': series.series,
+        'totals': series.totals,
+        'net_profit': series.net_profit,
+        'shops': [{'id': row.shop.id, 'name': row.shop.name,
+                   'values': row.values, 'total': row.total}
+                  for row in results['shops']],
+        'payroll': results['payroll'],
+        'timings_ms': {name: round(value, 2) for name, value in timings.items()},
+    }
+
+
+@api_bp.route('/shops/<int:shop_id>/<ledger>/delta', methods=['POST'])
+@login_required
+def ledger_delta(shop_id, ledger):
+    """
+    Применяет добавленные, изменённые и удалённые строки одной транзакцией
+    и возвращает их новые id/версии, конфликты версий и итоги за период.
+    Строки с устаревшей версией пропускаются, остальные сохраняются.
+    """
+    if ledger not in DELTA_TABLES:
+        abort(404)
+    _check_shop(shop_id)
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        abort(400, description="Ожидается JSON-объект.")
+    start_date = _parse_date(payload.get('start_date'))
+    end_date = _parse_date(payload.get('end_date'))
+
+    try:
+        result = apply_delta(ledger, shop_id, payload)
+        db.session.commit()
+    except ValueError as error:
+        db.session.rollback()
+        return {'message': str(error)}, 400
+
+    result['totals'] = ledger_totals(ledger, shop_id, start_date, end_date)
+    return result
@@ -0,0 +1,223 @@
+"""
+Статические файлы с отпечатком содержимого и кэш скомпилированных шаблонов.
+
+    flask assets build [--clean]
+
+собирает CSS и JS из app/static в app/static/dist: имя каждого файла
+получает отпечаток содержимого (css/index.3f9a1c2b7d4e.css), рядом
+кладутся сжатые копии .gz и, если установлен пакет brotli, .br, а
+manifest.json связывает исходное имя с собранным. Шаблоны подключают файлы
+через asset_url('css/index.css'): при собранном манифесте это
+/assets/<имя с отпечатком> с Cache-Control: immutable на год — изменённый
+файл получает новое имя, поэтому браузер не перепроверяет старый. Без
+сборки asset_url ведёт на обычный /static/ (удобно при разработке), как и
+для файлов, изменённых после сборки: при запуске их отпечаток сверяется
+с манифестом, а в журнал пишется предупреждение.
+
+Шаблоны компилируются в байт-код Jinja (FileSystemBytecodeCache): новый
+процесс не разбирает их заново при первом показе страницы, а сборка
+заполняет кэш заранее.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+import click
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.utils import safe_join
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Расширения исходных файлов, которые попадают в сборку
+ASSET_EXTENSIONS = ('.css', '.js')
+# Файл с отпечатком не меняется никогда — кэшируем на год
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Сжатые копии: (суффикс файла, Content-Encoding) в порядке предпочтения
+ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'))
+
+assets_bp = Blueprint('assets', __name__, url_prefix='/assets')
+assets_cli = AppGroup('assets', help='Сборка статических файлов и шаблонов.')
+
+
+def source_files(static_folder):
+    """Исходные файлы сборки: пути относительно static (через '/'), без dist."""
+    paths = []
+    for root, dirs, files in os.walk(static_folder):
+        if root == static_folder and DIST_DIR in dirs:
+            dirs.remove(DIST_DIR)
+        for name in files:
+            if name.endswith(ASSET_EXTENSIONS):
+                path = os.path.relpath(os.path.join(root, name), static_folder)
+                paths.append(path.replace(os.sep, '/'))
+    return sorted(paths)
+
+
+def fingerprinted_name(path, data):
+    """css/index.css -> css/index.<12 знаков sha256>.css"""
+    base, ext = os.path.splitext(path)
+    return f'{base}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as output:
+        output.write(data)
+
+
+def build(static_folder, brotli=None):
+    """
+    Собирает файлы в static/dist: копия с отпечатком, .gz и (если передан
+    модуль brotli) .br. Пишет и возвращает манифест {исходное имя: собранное}.
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    manifest = {}
+    for path in source_files(static_folder):
+        with open(os.path.join(static_folder, path), 'rb') as source:
+            data = source.read()
+        built = fingerprinted_name(path, data)
+        target = os.path.join(dist, built)
+        _write(target, data)
+        # mtime=0 — одинаковое содержимое даёт одинаковый архив
+        _write(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write(target + '.br', brotli.compress(data, quality=11))
+        manifest[path] = built
+
+    _write(os.path.join(dist, MANIFEST_NAME),
+           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def clean(static_folder, manifest):
+    """Удаляет из dist файлы прежних сборок. Возвращает их число."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    keep = {MANIFEST_NAME} | set(manifest.values())
+    removed = 0
+    for root, _, files in os.walk(dist):
+        for name in files:
+            path = os.path.relpath(os.path.join(root, name), dist).replace(os.sep, '/')
+            for suffix, _ in ENCODINGS:
+                if path.endswith(suffix):
+                    path = path[:-len(suffix)]
+            if path not in keep:
+                os.remove(os.path.join(root, name))
+                removed += 1
+    return removed
+
+
+def load_manifest(static_folder):
+    """Манифест последней сборки или {}, если сборки не было."""
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME),
+                  encoding='utf-8') as source:
+            return json.load(source)
+    except FileNotFoundError:
+        return {}
+
+
+def stale_sources(static_folder, manifest):
+    """Файлы манифеста, исходник которых изменён или удалён после сборки."""
+    stale = []
+    for path, built in manifest.items():
+        try:
+            with open(os.path.join(static_folder, path), 'rb') as source:
+                data = source.read()
+        except FileNotFoundError:
+            stale.append(path)
+            continue
+        if fingerprinted_name(path, data) != built:
+            stale.append(path)
+    return sorted(stale)
+
+
+def asset_url(path):
+    """URL статического файла: собранного с отпечатком, если он есть."""
+    built = current_app.extensions['assets'].get(path)
+    if built is None:
+        return url_for('static', filename=path)
+    return url_for('assets.asset', filename=built)
+
+
+@assets_bp.route('/<path:filename>')
+def asset(filename):
+    """Собранный файл: сжатая копия по Accept-Encoding, кэш навсегда."""
+    dist = os.path.join(current_app.static_folder, DIST_DIR)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    for suffix, encoding in ENCODINGS:
+        compressed = safe_join(dist, filename + suffix)
+        if request.accept_encodings[encoding] and compressed \
+                and os.path.isfile(compressed):
+            response = send_from_directory(dist, filename + suffix,
+                                           mimetype=mimetype,
+                                           max_age=IMMUTABLE_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(dist, filename, mimetype=mimetype,
+                                       max_age=IMMUTABLE_MAX_AGE)
+
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
+
+
+def compile_templates(app):
+    """Загружает все шаблоны, заполняя кэш байт-кода. Возвращает их число."""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+@assets_cli.command('build')
+@click.option('--clean', 'remove_old', is_flag=True,
+              help='удалить из dist файлы прежних сборок')
+def build_command(remove_old):
+    """Собрать CSS/JS с отпечатками и сжатием, скомпилировать шаблоны."""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        click.echo("Пакет brotli не установлен — собираются только копии .gz.")
+
+    static_folder = current_app.static_folder
+    manifest = build(static_folder, brotli)
+    current_app.extensions['assets'] = manifest
+    click.echo(f"Собрано файлов: {len(manifest)} → {DIST_DIR}/{MANIFEST_NAME}")
+    if remove_old:
+        click.echo(f"Удалено файлов прежних сборок: {clean(static_folder, manifest)}")
+
+    if current_app.jinja_env.bytecode_cache is None:
+        click.echo("Кэш байт-кода шаблонов выключен (JINJA_BYTECODE_CACHE=0).")
+    else:
+        click.echo(f"Шаблонов скомпилировано: {compile_templates(current_app)}")
+
+
+def init_app(app):
+    manifest = {}
+    if app.config['ASSETS_FINGERPRINT']:
+        manifest = load_manifest(app.static_folder)
+        stale = stale_sources(app.static_folder, manifest)
+        if stale:
+            # Устаревшая копия из dist отдавала бы старый код — берём исходник
+            app.logger.warning(
+                "Статика изменена после `flask assets build`, отдаётся из "
+                "/static/ до пересборки: %s", ', '.join(stale))
+            for path in stale:
+                del manifest[path]
+    app.extensions['assets'] = manifest
+    app.add_template_global(asset_url)
+
+    if app.config['JINJA_BYTECODE_CACHE']:
+        directory = app.config['JINJA_CACHE_DIR'] or None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+    app.register_blueprint(assets_bp)
+    app.cli.add_command(assets_cli)
@@ -0,0 +1,163 @@
+"""
+Массовая запись строк одним запросом и построчная запись с проверкой версий.
+"""
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import dashboard_cache, db, rollups
+
+# Диалекты с INSERT ... ON CONFLICT DO UPDATE
+ON_CONFLICT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def upsert(model, rows, index_elements, update_columns, session=None):
+    """
+    Вставляет строки `rows` (список словарей) в таблицу модели, а при
+    конфликте по уникальному ключу `index_elements` обновляет `update_columns`.
+    Если update_columns пуст, конфликтующие строки пропускаются.
+
+    PostgreSQL и SQLite выполняют это одним INSERT ... ON CONFLICT.
+    Для остальных баз — один SELECT существующих ключей, затем
+    пакетные INSERT и UPDATE.
+
+    Возвращает число вставленных или обновлённых строк.
+    """
+    session = session or db.session
+    if not rows:
+        return 0
+
+    dialect = session.get_bind().dialect.name
+    make_insert = ON_CONFLICT_INSERTS.get(dialect)
+    if make_insert is not None:
+        stmt = make_insert(model.__table__).values(rows)
+        if update_columns:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={name: stmt.excluded[name] for name in update_columns})
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+        return session.execute(stmt).rowcount
+
+    return _upsert_fallback(session, model, rows, index_elements, update_columns)
+
+
+def _upsert_fallback(session, model, rows, index_elements, update_columns):
+    table = model.__table__
+    key_columns = [table.c[name] for name in index_elements]
+
+    def key_of(row):
+        return tuple(row[name] for name in index_elements)
+
+    existing = {tuple(found) for found in session.execute(
+        select(*key_columns).where(or_(*[
+            and_(*[column == value for column, value in zip(key_columns, key_of(row))])
+            for row in rows
+        ]))
+    )}
+
+    new_rows = {}
+    for row in rows:
+        if key_of(row) not in existing:
+            new_rows.setdefault(key_of(row), row)
+    if new_rows:
+        session.execute(table.insert(), list(new_rows.values()))
+    if not update_columns:
+        return len(new_rows)
+
+    for row in rows:
+        if key_of(row) in existing:
+            session.execute(
+                update(table)
+                .where(and_(*[column == row[column.name] for column in key_columns]))
+                .values({name: row[name] for name in update_columns}))
+    return len(rows)
+
+
+def assign_changed(obj, values):
+    """
+    Присваивает объекту только отличающиеся значения, чтобы строки без
+    изменений не попадали в UPDATE. Возвращает True, если что-то изменилось.
+    """
+    changed = False
+    for name, value in values.items():
+        if getattr(obj, name) != value:
+            setattr(obj, name, value)
+            changed = True
+    return changed
+
+
+def _conflict(session, model, row_id):
+    """Описание конфликта: текущая версия строки или отметка, что её удалили."""
+    version = session.scalar(select(model.version_id).where(model.id == row_id))
+    return {'id': row_id, 'version': version,
+            'reason': 'deleted' if version is None else 'stale'}
+
+
+def _note_changes(session, obj, values):
+    """
+    Сообщает дневным итогам и кэшу главной страницы о строке, изменённой
+    мимо ORM: её (магазин, дата) до и после изменения.
+    """
+    keys = {(obj.shop_id, obj.date)}
+    if values is not None:
+        keys.add((values.get('shop_id', obj.shop_id),
+                  values.get('date', obj.date)))
+    keys = {(int(shop_id), day) for shop_id, day in keys
+            if shop_id is not None and day is not None}
+    rollups.note_changes(session, keys)
+    dashboard_cache.note_changes(
+        session, {(shop_id, day, day) for shop_id, day in keys})
+
+
+def apply_versioned(changes, session=None):
+    """
+    Применяет изменения к строкам моделей с version_id_col (продажи/возвраты
+    и расходы магазина) — по одному UPDATE или DELETE на строку с условием
+    на версию, без точек сохранения.
+
+    changes — список (объект, версия, значения): версия — та, что видел
+    клиент (None — не проверять), значения None — удалить строку. Строка,
+    версия которой уже не совпадает, или которую изменили либо удалили
+    между чтением и записью (UPDATE/DELETE ... WHERE version_id = ... не
+    затронул строк), пропускается — остальные остаются в транзакции.
+    Итоги и кэш главной страницы по изменённым строкам пересчитываются
+    перед коммитом (app.rollups.note_changes, app.dashboard_cache.note_changes).
+    Возвращает список конфликтов {'id', 'version', 'reason'}.
+    """
+    session = session or db.session
+    conflicts = []
+    for obj, version, values in changes:
+        model, row_id = type(obj), obj.id
+        if version is not None and obj.version_id != version:
+            conflicts.append(_conflict(session, model, row_id))
+            continue
+
+        table = model.__table__
+        current = and_(table.c.id == row_id,
+                       table.c.version_id == obj.version_id)
+        if values is None:
+            statement = delete(table).where(current)
+        else:
+            changed = {name: value for name, value in values.items()
+                       if getattr(obj, name) != value}
+            if not changed:
+                continue
+            statement = update(table).where(current).values(
+                version_id=obj.version_id + 1, **changed)
+        if session.execute(statement).rowcount != 1:
+            conflicts.append(_conflict(session, model, row_id))
+            continue
+
+        _note_changes(session, obj, values)
+        # Объект сессии приводим к записанному состоянию без лишнего UPDATE
+        if values is None:
+            session.expunge(obj)
+        else:
+            for name, value in changed.items():
+                set_committed_value(obj, name, value)
+            set_committed_value(obj, 'version_id', obj.version_id + 1)
+    return conflicts
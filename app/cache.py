@@ -0,0 +1,94 @@
+"""
+Кэши в памяти процесса.
+
+Каждый кэш регистрируется по имени в CACHES, чтобы его статистика
+(попадания, промахи, размер) была видна на странице /metrics.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+CACHES = {}
+
+
+class TTLCache:
+    """
+    Потокобезопасный кэш с ограничением по размеру (вытесняется самая
+    давно использованная запись) и по времени жизни записи в секундах.
+    ttl=0 отключает кэш.
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=60):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        CACHES[name] = self
+
+    def configure(self, maxsize=None, ttl=None):
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            self._data.clear()
+
+    def get(self, key):
+        """Значение по ключу или None, если его нет или оно устарело."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires, value = item
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        if not self.ttl or not self.maxsize:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def keys(self):
+        """Ключи неустаревших записей (снимок)."""
+        now = time.monotonic()
+        with self._lock:
+            return [key for key, (expires, _) in self._data.items()
+                    if expires > now]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+# Пользователи для Flask-Login: id -> значения колонок User
+user_cache = TTLCache('users', maxsize=1024, ttl=30)
+
+# Сотрудники магазина для выпадающих списков: (shop_id, месяц) -> [(id, name)]
+employee_cache = TTLCache('employees', maxsize=256, ttl=300)
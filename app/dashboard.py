@@ -0,0 +1,147 @@
+"""
+Ряды и итоги главной страницы за период.
+
+Один запрос к daily_shop_totals возвращает по строке на день (GROUP BY date):
+суммы по статьям, производные показатели (всего расходов, чистые продажи,
+маржа) и итоги за весь период оконной суммой SUM(...) OVER (),
+повторённой в каждой строке. Python только раскладывает строки в массивы,
+выровненные по списку дней.
+"""
+from datetime import timedelta
+
+from sqlalchemy import func, select
+
+from app import db
+from app.models import DailyShopTotal, MonthlyPayroll
+from app.money import ZERO, to_money
+from app.rollups import EXPENSE_COLUMNS, SALES_COLUMNS
+
+# Строки таблиц главной страницы в порядке вывода
+EXPENSE_SERIES = EXPENSE_COLUMNS + ('total_expenses_all',)
+SALES_SERIES = SALES_COLUMNS + ('net_sales', 'margin')
+SERIES = EXPENSE_SERIES + SALES_SERIES
+
+# Виды главной страницы: 'shops' — с матрицей прибыли магазин × день
+DASHBOARD_MODES = ('shops', 'total')
+
+
+class ShopRow:
+    """Строка матрицы: магазин, прибыль по дням и за период."""
+
+    def __init__(self, shop, values, total):
+        self.shop = shop
+        self.values = values
+        self.total = total
+
+
+class DashboardSeries:
+    """
+    days   — список дат периода;
+    series — показатель -> список значений по дням (того же размера, что days);
+    totals — показатель -> сумма за период.
+    """
+
+    def __init__(self, days, series, totals):
+        self.days = days
+        self.series = series
+        self.totals = totals
+
+    @property
+    def net_profit(self):
+        return self.totals['net_sales'] - self.totals['total_expenses_all']
+
+
+def _day_expressions():
+    sums = {name: func.coalesce(func.sum(getattr(DailyShopTotal, name)), 0)
+            for name in EXPENSE_COLUMNS + SALES_COLUMNS}
+    expressions = dict(sums)
+    expressions['total_expenses_all'] = sum(
+        (sums[name] for name in EXPENSE_COLUMNS[1:]), sums[EXPENSE_COLUMNS[0]])
+    expressions['net_sales'] = sums['retail_sale_amount'] - sums['return_amount']
+    expressions['margin'] = (sums['retail_sale_amount']
+                             - sums['wholesale_sale_amount'])
+    return expressions
+
+
+def _profit_expression(expressions):
+    return expressions['net_sales'] - expressions['total_expenses_all']
+
+
+def series_query(start_date, end_date, shop_id=None):
+    """SELECT дневных значений и оконных итогов за период."""
+    expressions = _day_expressions()
+    columns = [DailyShopTotal.date]
+    for name in SERIES:
+        columns.append(expressions[name].label(name))
+        columns.append(func.sum(expressions[name]).over().label(f'total_{name}'))
+
+    query = select(*columns).where(DailyShopTotal.date >= start_date,
+                                   DailyShopTotal.date <= end_date)
+    if shop_id is not None:
+        query = query.where(DailyShopTotal.shop_id == shop_id)
+    return query.group_by(DailyShopTotal.date)
+
+
+def dashboard_series(start_date, end_date, shop_id=None):
+    """Ряды по дням и итоги за период [start_date, end_date]."""
+    day_count = (end_date - start_date).days + 1
+    days = [start_date + timedelta(days=offset) for offset in range(day_count)]
+    # Дни без данных — тоже Decimal: в JSON все суммы ряда одного вида ("0.00")
+    series = {name: [ZERO] * day_count for name in SERIES}
+    totals = dict.fromkeys(SERIES, ZERO)
+
+    rows = db.session.execute(series_query(start_date, end_date, shop_id)).all()
+    for row in rows:
+        offset = (row.date - start_date).days
+        for name in SERIES:
+            series[name][offset] = getattr(row, name)
+    if rows:
+        totals = {name: getattr(rows[0], f'total_{name}') for name in SERIES}
+
+    return DashboardSeries(days, series, totals)
+
+
+def shop_matrix_query(start_date, end_date, shop_ids):
+    """SELECT прибыли по (магазин, день) и итогов по магазину за период."""
+    profit = _profit_expression(_day_expressions())
+    return select(
+        DailyShopTotal.shop_id,
+        DailyShopTotal.date,
+        profit.label('profit'),
+        func.sum(profit).over(partition_by=DailyShopTotal.shop_id).label('total'),
+    ).where(
+        DailyShopTotal.date >= start_date,
+        DailyShopTotal.date <= end_date,
+        DailyShopTotal.shop_id.in_(shop_ids),
+    ).group_by(DailyShopTotal.shop_id, DailyShopTotal.date)
+
+
+def shop_profit_matrix(start_date, end_date, shops):
+    """
+    Прибыль (чистые продажи - все расходы) по магазинам shops и дням периода.
+    Возвращает список ShopRow в порядке shops; магазины без данных — нули.
+    """
+    day_count = (end_date - start_date).days + 1
+    rows = {shop.id: ShopRow(shop, [ZERO] * day_count, ZERO) for shop in shops}
+    if not rows:
+        return []
+
+    query = shop_matrix_query(start_date, end_date, list(rows))
+    for item in db.session.execute(query):
+        row = rows[item.shop_id]
+        row.values[(item.date - start_date).days] = item.profit
+        row.total = item.total
+    return list(rows.values())
+
+
+def payroll_total(start_date, end_date, shop_id=None):
+    """
+    Сумма зарплат из monthly_payroll за месяцы, пересекающие период, —
+    Decimal, как остальные суммы главной страницы.
+    """
+    query = select(func.coalesce(func.sum(MonthlyPayroll.total_salary), 0)).where(
+        MonthlyPayroll.month >= start_date.strftime('%Y-%m'),
+        MonthlyPayroll.month <= end_date.strftime('%Y-%m'))
+    if shop_id is not None:
+        query = query.where(MonthlyPayroll.shop_id == shop_id)
+    return to_money(db.session.execute(query).scalar())
@@ -0,0 +1,305 @@
+"""
+Кэш отрисованной главной страницы.
+
+Ключ — область магазинов пользователя (None для администратора) и период.
+После коммита, который затронул ShopExpense, SalesReturn или Employee,
+сбрасываются записи, чей период пересекает даты изменённых строк
+(для Employee — весь месяц), а область включает их магазин.
+
+Хранилище задаётся DASHBOARD_CACHE_URL:
+  пусто       — LRU в памяти процесса;
+  local://    — общий кэш на LocalSharedClient (замена Redis для тестов);
+  redis://... — общий кэш в Redis (нужен пакет redis).
+"""
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+
+from app import db
+from app.cache import CACHES, TTLCache
+from app.models import Employee, SalesReturn, ShopExpense
+from app.replica import using_replica
+
+TRACKED_MODELS = (ShopExpense, SalesReturn, Employee)
+
+SPANS_KEY = 'dashboard_cache_spans'
+
+
+class MemoryBackend(TTLCache):
+    """LRU в памяти процесса; поколение — время последнего сброса."""
+
+    def __init__(self, name, maxsize=256, ttl=300):
+        super().__init__(name, maxsize, ttl)
+        self._generation = 0.0
+
+    def generation(self):
+        return self._generation
+
+    def bump(self):
+        with self._lock:
+            self._generation = time.time()
+
+
+class LocalSharedClient:
+    """
+    Минимальная замена клиента Redis в памяти: get/set/delete и множества.
+    Значения хранятся в bytes, как их возвращает redis-py.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._sets = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires <= time.monotonic():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        expires = time.monotonic() + ex if ex else None
+        with self._lock:
+            self._values[key] = (value, expires)
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys
+                       if self._values.pop(key, None) is not None
+                       or self._sets.pop(key, None) is not None)
+
+    def sadd(self, key, *members):
+        with self._lock:
+            values = self._sets.setdefault(key, set())
+            before = len(values)
+            values.update(member.encode('utf-8') for member in members)
+            return len(values) - before
+
+    def srem(self, key, *members):
+        with self._lock:
+            values = self._sets.get(key, set())
+            before = len(values)
+            values.difference_update(member.encode('utf-8') for member in members)
+            return before - len(values)
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._sets.get(key, ()))
+
+
+class SharedBackend:
+    """Кэш в общем хранилище с интерфейсом Redis; ключи записей — в множестве."""
+
+    def __init__(self, name, client, ttl=300, prefix='dashboard:'):
+        self.name = name
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        CACHES[name] = self
+
+    @property
+    def _index(self):
+        return self.prefix + 'keys'
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value.decode('utf-8')
+
+    def set(self, key, value):
+        if not self.ttl:
+            return
+        self.client.set(self.prefix + key, value.encode('utf-8'), ex=self.ttl)
+        self.client.sadd(self._index, key)
+
+    def invalidate(self, key):
+        self.client.delete(self.prefix + key)
+        self.client.srem(self._index, key)
+
+    def keys(self):
+        return [key.decode('utf-8') for key in self.client.smembers(self._index)]
+
+    def clear(self):
+        keys = self.keys()
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+        self.client.delete(self._index)
+
+    def generation(self):
+        return float(self.client.get(self.prefix + 'generation') or 0)
+
+    def bump(self):
+        self.client.set(self.prefix + 'generation', repr(time.time()))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'shared',
+            'size': len(self.client.smembers(self._index)),
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+def make_backend(url, maxsize, ttl):
+    if not url:
+        return MemoryBackend('dashboard', maxsize=maxsize, ttl=ttl)
+    if url.startswith('local://'):
+        return SharedBackend('dashboard', LocalSharedClient(), ttl=ttl)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError(
+                "Для DASHBOARD_CACHE_URL=redis://... установите пакет redis.")
+        return SharedBackend('dashboard', redis.Redis.from_url(url), ttl=ttl)
+    raise ValueError(f"Неизвестный DASHBOARD_CACHE_URL: {url}")
+
+
+def _backend():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('dashboard_cache')
+
+
+def cache_key(scope, start_date, end_date, *extra):
+    """Ключ записи: [область, начало, конец, ...] в JSON."""
+    return json.dumps([scope, start_date.isoformat(), end_date.isoformat(), *extra],
+                      ensure_ascii=False)
+
+
+def generation():
+    """Поколение кэша; запоминается до расчёта и передаётся в store()."""
+    backend = _backend()
+    return backend.generation() if backend is not None else 0
+
+
+def get(key):
+    backend = _backend()
+    return backend.get(key) if backend is not None else None
+
+
+def store(key, value, started_generation):
+    """
+    Сохраняет страницу, если с начала её расчёта не было сброса:
+    иначе в кэш могли бы попасть данные до чужого коммита. Страницу,
+    прочитанную с реплики вскоре после сброса, тоже не сохраняем —
+    реплика могла ещё не получить этот коммит.
+    """
+    backend = _backend()
+    if backend is None or backend.generation() != started_generation:
+        return
+    if (using_replica() and time.time() - started_generation
+            < current_app.config['REPLICA_STICKY_SECONDS']):
+        return
+    backend.set(key, value)
+
+
+def invalidate(spans):
+    """Сбрасывает записи, пересекающие (shop_id, первый день, последний день)."""
+    backend = _backend()
+    if backend is None or not spans:
+        return
+    backend.bump()
+    for key in backend.keys():
+        try:
+            scope, start, end = json.loads(key)[:3]
+            start, end = date.fromisoformat(start), date.fromisoformat(end)
+        except (ValueError, TypeError):
+            backend.invalidate(key)
+            continue
+        for shop_id, first_day, last_day in spans:
+            if scope in (None, shop_id) and start <= last_day and end >= first_day:
+                backend.invalidate(key)
+                break
+
+
+def note_changes(session, spans):
+    """Запоминает изменённые периоды; кэш сбросится после коммита сессии."""
+    session.info.setdefault(SPANS_KEY, set()).update(spans)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if value:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    return None
+
+
+def _month_span(month):
+    first_day = datetime.strptime(month, '%Y-%m').date()
+    next_month = (first_day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return first_day, next_month - timedelta(days=1)
+
+
+def _values(state, name):
+    # Текущее и прежнее значения поля (при изменении строки важны оба)
+    return {value for value in state.attrs[name].history.sum() if value is not None}
+
+
+def _spans(obj):
+    state = inspect(obj)
+    spans = set()
+    for shop_id in _values(state, 'shop_id'):
+        if isinstance(obj, Employee):
+            days = [_month_span(month) for month in _values(state, 'month')]
+        else:
+            days = [(day, day) for day in map(_as_date, _values(state, 'date'))]
+        spans.update((int(shop_id), first_day, last_day)
+                     for first_day, last_day in days)
+    return spans
+
+
+def _after_flush(session, flush_context):
+    spans = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, TRACKED_MODELS):
+            spans |= _spans(obj)
+    if spans:
+        note_changes(session, spans)
+
+
+def _after_commit(session):
+    # after_commit срабатывает и для SAVEPOINT: сбрасываем только после
+    # коммита внешней транзакции
+    if session.in_nested_transaction():
+        return
+    invalidate(session.info.pop(SPANS_KEY, None))
+
+
+def _after_rollback(session):
+    # Откат SAVEPOINT не отменяет изменений, сохранённых до него
+    if not session.in_nested_transaction():
+        session.info.pop(SPANS_KEY, None)
+
+
+def init_app(app):
+    app.extensions['dashboard_cache'] = make_backend(
+        app.config['DASHBOARD_CACHE_URL'],
+        maxsize=app.config['DASHBOARD_CACHE_SIZE'],
+        ttl=app.config['DASHBOARD_CACHE_TTL'])
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
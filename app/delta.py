@@ -0,0 +1,113 @@
+"""
+Инкрементальное сохранение табличных форм: продажи/возвраты и расходы магазина.
+
+Страница отправляет не всю таблицу месяца, а только изменения:
+
+    {"added":   [{"key": "n1", "date": "2026-10-01", "purchase": "1500.00", ...}],
+     "changed": [{"id": 5, "version": 3, "date": "...", ...все поля строки}],
+     "deleted": [{"id": 7, "version": 1}],
+     "start_date": "2026-10-01", "end_date": "2026-10-31"}
+
+У каждой строки есть version_id (version_id_col модели). Правка или
+удаление с версией, отличной от текущей в базе (строку уже изменил или
+удалил кто-то другой), не применяется — остальные строки пачки
+сохраняются, а клиент получает список конфликтов (app.bulk.apply_versioned).
+"""
+from datetime import datetime
+
+from app import db
+from app.bulk import apply_versioned
+from app.forms import (SALES_RETURN_FIELDS, SHOP_EXPENSE_FIELDS,
+                       parse_sales_return_row, parse_shop_expense_row)
+from app.models import SalesReturn, ShopExpense
+
+# Таблица страницы -> (модель, поля строки, разбор строки)
+DELTA_TABLES = {
+    'sales_returns': (SalesReturn, SALES_RETURN_FIELDS, parse_sales_return_row),
+    'expenses_table': (ShopExpense, SHOP_EXPENSE_FIELDS, parse_shop_expense_row),
+}
+
+
+def _row_values(parse_row, fields, item):
+    """Значения строки из элемента JSON (числа и строки) или ValueError."""
+    return parse_row({name: item.get(name) for name in fields})
+
+
+def _items(delta, name):
+    items = delta.get(name) or []
+    if not isinstance(items, list) or not all(isinstance(item, dict)
+                                              for item in items):
+        raise ValueError(f"Поле {name} должно быть списком объектов.")
+    return items
+
+
+def _versions(items):
+    try:
+        return {int(item['id']): int(item['version']) for item in items}
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("У изменённых и удалённых строк нужны id и version.") from None
+
+
+def apply_delta(table, shop_id, delta):
+    """
+    Применяет изменения delta к строкам магазина shop_id (без коммита).
+    Возвращает {'added': [{key, id, version}], 'changed': [{id, version}],
+    'deleted': [id], 'conflicts': [{id, version, reason}]}. Некорректные
+    данные — ValueError, и тогда не применяется ничего.
+    """
+    model, fields, parse_row = DELTA_TABLES[table]
+    added_items = _items(delta, 'added')
+    changed_items = _items(delta, 'changed')
+    deleted = _versions(_items(delta, 'deleted'))
+    changed = _versions(changed_items)
+
+    # Сначала разбираем всё, чтобы ошибка в данных не оставила пачку наполовину
+    added = [(item.get('key'), _row_values(parse_row, fields, item))
+             for item in added_items]
+    changed_values = {}
+    for item in changed_items:
+        values = _row_values(parse_row, fields, item)
+        if values is None:
+            raise ValueError(f"Строка {item['id']} пуста — удалите её.")
+        changed_values[int(item['id'])] = values
+    if changed.keys() & deleted.keys():
+        raise ValueError("Строка не может быть одновременно изменена и удалена.")
+
+    rows = {}
+    ids = changed.keys() | deleted.keys()
+    if ids:
+        rows = {row.id: row for row in model.query.filter(
+            model.shop_id == shop_id, model.id.in_(ids))}
+
+    changes = []
+    conflicts = [{'id': row_id, 'version': None, 'reason': 'deleted'}
+                 for row_id in sorted(ids - rows.keys())]
+    for row_id in sorted(rows):
+        row = rows[row_id]
+        values = changed_values.get(row_id)
+        # Если дата не указана — оставляем прежнюю
+        if values is not None and values['date'] is None:
+            values['date'] = row.date
+        changes.append((row, changed.get(row_id, deleted.get(row_id)), values))
+    conflicts.extend(apply_versioned(changes))
+    rejected = {conflict['id'] for conflict in conflicts}
+
+    new_rows = []
+    for key, values in added:
+        if values is None:
+            continue
+        if values['date'] is None:
+            values['date'] = datetime.utcnow().date()
+        row = model(shop_id=shop_id, **values)
+        db.session.add(row)
+        new_rows.append((key, row))
+    db.session.flush()
+
+    return {
+        'added': [{'key': key, 'id': row.id, 'version': row.version_id}
+                  for key, row in new_rows],
+        'changed': [{'id': row_id, 'version': rows[row_id].version_id}
+                    for row_id in sorted(changed.keys() - rejected)],
+        'deleted': sorted(deleted.keys() - rejected),
+        'conflicts': sorted(conflicts, key=lambda conflict: conflict['id']),
+    }
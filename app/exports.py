@@ -0,0 +1,272 @@
+"""
+Потоковая выгрузка журналов в CSV и XLSX.
+
+Строки читаются серверным курсором (yield_per) и сразу уходят клиенту
+через генератор, поэтому память не растёт с размером выгрузки, а первые
+байты (заголовок таблицы) отправляются ещё до выполнения запроса.
+"""
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from flask import Blueprint, Response, abort, request, stream_with_context
+from flask_login import current_user, login_required
+from sqlalchemy import select
+
+from app import db
+from app.models import Employee, Expense, Income, Return, SalesReturn, ShopExpense
+
+exports_bp = Blueprint('exports', __name__)
+
+# Сколько строк читать из курсора за раз и сколько строк отдавать одним куском
+YIELD_PER = 1000
+ROWS_PER_CHUNK = 500
+
+# Журнал -> (модель, [(заголовок, колонка)], присоединяемые таблицы)
+LEDGERS = {
+    'incomes': (Income, [
+        ('ID', Income.id),
+        ('Дата', Income.date),
+        ('Магазин', Income.shop_id),
+        ('Тип операции', Income.operation_type),
+        ('Наименование', Income.item_name),
+        ('Сотрудник', Employee.name),
+        ('Сумма', Income.amount),
+        ('Заметки', Income.notes),
+    ], [(Employee, Income.employee_id == Employee.id)]),
+    'returns': (Return, [
+        ('ID', Return.id),
+        ('Дата', Return.date),
+        ('Магазин', Return.shop_id),
+        ('Наименование товара', Return.item_name),
+        ('Сотрудник', Employee.name),
+        ('Сумма', Return.amount),
+        ('Заметки', Return.notes),
+    ], [(Employee, Return.employee_id == Employee.id)]),
+    'expenses': (Expense, [
+        ('ID', Expense.id),
+        ('Дата', Expense.date),
+        ('Магазин', Expense.shop_id),
+        ('Категория расходов', Expense.category),
+        ('Сумма', Expense.amount),
+        ('Заметки', Expense.notes),
+    ], []),
+    'sales_returns': (SalesReturn, [
+        ('ID', SalesReturn.id),
+        ('Дата', SalesReturn.date),
+        ('Магазин', SalesReturn.shop_id),
+        ('Продажа', SalesReturn.sale),
+        ('Возврат', SalesReturn.return_item),
+        ('Сумма продаж в розницу', SalesReturn.retail_sale_amount),
+        ('Сумма продаж по закупке', SalesReturn.wholesale_sale_amount),
+        ('Сумма возвратов', SalesReturn.return_amount),
+    ], []),
+    'expenses_table': (ShopExpense, [
+        ('ID', ShopExpense.id),
+        ('Дата', ShopExpense.date),
+        ('Магазин', ShopExpense.shop_id),
+        ('Закупка', ShopExpense.purchase_desc),
+        ('Сумма закупки', ShopExpense.purchase),
+        ('Нужды магазина', ShopExpense.store_needs_desc),
+        ('Сумма нужд магазина', ShopExpense.store_needs),
+        ('Зарплата', ShopExpense.salary_desc),
+        ('Сумма зарплаты', ShopExpense.salary),
+        ('Аренда', ShopExpense.rent_desc),
+        ('Сумма аренды', ShopExpense.rent),
+        ('Ремонт', ShopExpense.repair_desc),
+        ('Сумма ремонта', ShopExpense.repair),
+        ('Маркетинг', ShopExpense.marketing_desc),
+        ('Сумма маркетинга', ShopExpense.marketing),
+    ], []),
+}
+
+
+def ledger_query(ledger, shop_id=None, start_date=None, end_date=None):
+    """SELECT журнала с фильтром по магазину и периоду, в порядке (date, id)."""
+    model, columns, joins = LEDGERS[ledger]
+    query = select(*[column for _, column in columns]).select_from(model)
+    for target, condition in joins:
+        query = query.outerjoin(target, condition)
+    if shop_id is not None:
+        query = query.where(model.shop_id == shop_id)
+    if start_date:
+        query = query.where(model.date >= start_date)
+    if end_date:
+        query = query.where(model.date <= end_date)
+    return query.order_by(model.date, model.id)
+
+
+def _stream_rows(query):
+    # yield_per включает серверный курсор (stream_results) там, где он есть
+    result = db.session.execute(query.execution_options(yield_per=YIELD_PER))
+    try:
+        for row in result:
+            yield row
+    finally:
+        result.close()
+
+
+def _chunks(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate_csv(headers, rows):
+    """CSV в UTF-8 с BOM (чтобы Excel верно открыл кириллицу)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    writer.writerow(headers)
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+
+    for chunk in _chunks(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ZipStream:
+    """Файлоподобный приёмник для ZipFile: отдаёт записанное кусками."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Лист1" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'),
+}
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def generate_xlsx(headers, rows):
+    """
+    Минимальная книга XLSX с одним листом. Лист пишется в zip потоково
+    (строки — inline-строки, без sharedStrings), архив отдаётся по мере сжатия.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _xlsx_row(headers)).encode('utf-8'))
+            yield stream.pop()
+
+            for chunk in _chunks(rows):
+                sheet.write(''.join(_xlsx_row(row) for row in chunk).encode('utf-8'))
+                yield stream.pop()
+
+            sheet.write(b'</sheetData></worksheet>')
+    yield stream.pop()
+
+
+FORMATS = {
+    'csv': (generate_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (generate_xlsx,
+             'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def _parse_date(value):
+    """Дата ГГГГ-ММ-ДД из строки запроса; пусто — None, иначе 400."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        abort(400, description=f"Некорректная дата: {value}")
+
+
+@exports_bp.route('/export/<ledger>.<fmt>', methods=['GET'])
+@login_required
+def export_ledger(ledger, fmt):
+    """
+    Выгрузка журнала: /export/incomes.csv?shop_id=1&start_date=...&end_date=...
+    Без shop_id — по всем доступным пользователю магазинам.
+    """
+    if ledger not in LEDGERS or fmt not in FORMATS:
+        abort(404)
+
+    shop_id = request.args.get('shop_id', type=int)
+    if current_user.shop_id is not None:
+        # Директор магазина выгружает только свой магазин
+        if shop_id not in (None, current_user.shop_id):
+            abort(403)
+        shop_id = current_user.shop_id
+
+    # Даты проверяем до ответа: после заголовка 200 ошибку уже не вернуть
+    start_date = _parse_date(request.args.get('start_date'))
+    end_date = _parse_date(request.args.get('end_date'))
+    query = ledger_query(ledger, shop_id, start_date, end_date)
+    headers = [header for header, _ in LEDGERS[ledger][1]]
+
+    generate, mimetype = FORMATS[fmt]
+    # Имя файла — только из разобранных дат, не из строки запроса
+    period = [day.isoformat() if day else 'all' for day in (start_date, end_date)]
+    filename = f"{ledger}_{period[0]}_{period[1]}.{fmt}"
+    return Response(
+        stream_with_context(generate(headers, _stream_rows(query))),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
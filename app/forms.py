@@ -1,7 +1,10 @@
 from flask_wtf import FlaskForm
+from datetime import datetime
 from wtforms import StringField, FloatField, SubmitField, DateField, IntegerField, SelectField, HiddenField
 from wtforms.validators import DataRequired
 
+from app.money import to_money
+
 
 class EmployeeForm(FlaskForm):
     name = StringField('Имя', validators=[DataRequired()])
@@ -27,3 +30,83 @@ class IncomeForm(FlaskForm):
     submit = SubmitField('Добавить')
 
 # новое
+
+
+# Разбор строк табличных форм (продажи/возвраты и расходы магазина).
+# Поля строки приходят с суффиксом индекса: sale_0, date_0, purchase_3...
+
+SALES_RETURN_TEXT_FIELDS = ('sale', 'return_item')
+SALES_RETURN_AMOUNT_FIELDS = (
+    'retail_sale_amount', 'wholesale_sale_amount', 'return_amount')
+SALES_RETURN_FIELDS = (
+    ('date',) + SALES_RETURN_TEXT_FIELDS + SALES_RETURN_AMOUNT_FIELDS)
+
+SHOP_EXPENSE_CATEGORIES = (
+    'purchase', 'store_needs', 'salary', 'rent', 'repair', 'marketing')
+SHOP_EXPENSE_FIELDS = ('date',) + tuple(
+    name for category in SHOP_EXPENSE_CATEGORIES
+    for name in (f'{category}_desc', category))
+
+
+def form_row_indexes(data):
+    """Индексы строк, которые пришли в форме (по суффиксу "_число")."""
+    indexes = set()
+    for field_name in data.keys():
+        if '_' in field_name:
+            prefix, idx = field_name.rsplit('_', 1)
+            if idx.isdigit():
+                indexes.add(idx)
+    return sorted(indexes, key=int)
+
+
+def row_fields(data, idx, names):
+    """Значения полей одной строки формы без суффикса индекса."""
+    return {name: data.get(f'{name}_{idx}') for name in names}
+
+
+def _parse_amount(value):
+    return to_money(value)
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    # Строки JSON API приходят не только из формы: число или список — тоже
+    # некорректная дата, а не TypeError из strptime
+    if not isinstance(value, str):
+        raise ValueError(f"Дата должна быть строкой ГГГГ-ММ-ДД: {value!r}")
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def parse_sales_return_row(fields):
+    """
+    Значения строки продаж/возвратов для SalesReturn.
+    Возвращает None, если все поля строки пустые.
+    Некорректные числа и даты вызывают ValueError.
+    """
+    if not any(fields.get(name) for name in
+               SALES_RETURN_TEXT_FIELDS + SALES_RETURN_AMOUNT_FIELDS):
+        return None
+
+    values = {'date': _parse_date(fields.get('date'))}
+    for name in SALES_RETURN_TEXT_FIELDS:
+        values[name] = fields.get(name) or None
+    for name in SALES_RETURN_AMOUNT_FIELDS:
+        values[name] = _parse_amount(fields.get(name))
+    return values
+
+
+def parse_shop_expense_row(fields):
+    """
+    Значения строки расходов магазина для ShopExpense.
+    Возвращает None, если в строке нет ни описаний, ни сумм.
+    Некорректные числа и даты вызывают ValueError.
+    """
+    values = {'date': _parse_date(fields.get('date'))}
+    for category in SHOP_EXPENSE_CATEGORIES:
+        values[f'{category}_desc'] = fields.get(f'{category}_desc') or None
+        values[category] = _parse_amount(fields.get(category))
+
+    if not any(value for name, value in values.items() if name != 'date'):
+        return None
+    return values
@@ -0,0 +1,58 @@
+"""
+Проверка живости для балансировщика и оркестратора: /healthz.
+
+Отвечает 200, если база выполняет SELECT 1, иначе 503. В ответе —
+состояние пула соединений процесса (занято, свободно, сверх пула)
+для основной базы и, если настроена, для реплики.
+"""
+from flask import Blueprint, current_app
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+
+health_bp = Blueprint('health', __name__)
+
+
+def pool_status(engine):
+    """Счётчики пула; у пулов без них (например, SQLite в памяти) — None."""
+    pool = engine.pool
+
+    def count(name):
+        method = getattr(pool, name, None)
+        return method() if method is not None else None
+
+    return {
+        'class': type(pool).__name__,
+        'size': count('size'),
+        'checked_out': count('checkedout'),
+        'idle': count('checkedin'),
+        'overflow': count('overflow'),
+    }
+
+
+def _ping(engine):
+    try:
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+    except SQLAlchemyError as e:
+        current_app.logger.warning("healthz: база %s недоступна: %s",
+                                   engine.url.render_as_string(), e)
+        return False
+    return True
+
+
+@health_bp.route('/healthz', methods=['GET'])
+def healthz():
+    ok = _ping(db.engine)
+    status = {'database': 'ok' if ok else 'unavailable',
+              'pool': pool_status(db.engine)}
+
+    # Реплика не делает сервис нерабочим, но её состояние видно здесь же
+    replica = db.engines.get('replica')
+    if replica is not None:
+        status['replica'] = {
+            'database': 'ok' if _ping(replica) else 'unavailable',
+            'pool': pool_status(replica),
+        }
+    return status, 200 if ok else 503
@@ -0,0 +1,203 @@
+"""
+Массовый импорт продаж/возвратов и расходов магазина из CSV.
+
+Файл читается потоково, каждая строка проверяется теми же правилами,
+что и табличные формы (parse_sales_return_row / parse_shop_expense_row).
+Корректные строки пишутся многострочными INSERT пачками по chunk_size,
+каждая пачка — в своей транзакции вместе с пересчётом дневных итогов.
+
+Повторный импорт того же файла ничего не дублирует: у каждой строки есть
+import_key — хэш её содержимого и номера повтора такой же строки в файле,
+а вставка идёт через INSERT ... ON CONFLICT (shop_id, import_key) DO NOTHING.
+"""
+import codecs
+import csv
+import hashlib
+import json
+from decimal import Decimal
+
+import click
+from flask import Blueprint, render_template, request
+from flask_login import current_user, login_required
+
+from app import dashboard_cache, db
+from app.bulk import upsert
+from app.exports import LEDGERS
+from app.forms import (SALES_RETURN_FIELDS, SHOP_EXPENSE_FIELDS,
+                       parse_sales_return_row, parse_shop_expense_row)
+from app.models import SalesReturn, ShopExpense
+from app.rollups import refresh_daily_totals
+
+imports_bp = Blueprint('imports', __name__)
+
+CHUNK_SIZE = 500
+# Сколько ошибок показывать в ответе страницы загрузки
+MAX_REPORTED_ERRORS = 100
+
+# Вид импорта -> (модель, поля формы, разбор строки)
+IMPORTS = {
+    'sales_returns': (SalesReturn, SALES_RETURN_FIELDS, parse_sales_return_row),
+    'expenses_table': (ShopExpense, SHOP_EXPENSE_FIELDS, parse_shop_expense_row),
+}
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.errors = []
+
+    def as_dict(self, max_errors=None):
+        errors = self.errors[:max_errors] if max_errors else self.errors
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'skipped': self.skipped,
+            'errors': [{'line': line, 'message': message}
+                       for line, message in errors],
+            'error_count': len(self.errors),
+        }
+
+
+def _column_aliases(kind, fields):
+    """Заголовки CSV -> имена полей: сами имена и заголовки нашей выгрузки."""
+    aliases = {name: name for name in fields}
+    aliases['shop_id'] = 'shop_id'
+    for header, column in LEDGERS[kind][1]:
+        if column.key in aliases:
+            aliases[header] = column.key
+    return aliases
+
+
+def _reader(stream):
+    """csv.DictReader с определением разделителя (',', ';' или табуляция)."""
+    header = stream.readline()
+    try:
+        dialect = csv.Sniffer().sniff(header, delimiters=',;\t')
+        delimiter = dialect.delimiter
+    except csv.Error:
+        delimiter = ','
+    fieldnames = next(csv.reader([header], delimiter=delimiter))
+    return csv.DictReader(stream, fieldnames=fieldnames, delimiter=delimiter)
+
+
+def _key_value(value):
+    # Суммы хешируются как float — так же, как до перехода на NUMERIC,
+    # чтобы ключи ранее загруженных файлов не изменились
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def _import_key(shop_id, values, seen):
+    content = json.dumps([shop_id, values], sort_keys=True, default=_key_value)
+    occurrence = seen.get(content, 0)
+    seen[content] = occurrence + 1
+    return hashlib.sha1(f'{content}#{occurrence}'.encode('utf-8')).hexdigest()
+
+
+def import_csv(kind, stream, shop_id=None, chunk_size=CHUNK_SIZE):
+    """
+    Импортирует CSV из текстового потока stream.
+    shop_id задаёт магазин для всех строк, иначе он берётся из колонки shop_id.
+    """
+    model, fields, parse_row = IMPORTS[kind]
+    aliases = _column_aliases(kind, fields)
+    report = ImportReport()
+    seen = {}
+    chunk = []
+
+    def flush():
+        if not chunk:
+            return
+        try:
+            inserted = upsert(model, chunk,
+                              index_elements=['shop_id', 'import_key'],
+                              update_columns=[])
+            keys = {(row['shop_id'], row['date']) for row in chunk}
+            refresh_daily_totals(db.session.connection(), keys)
+            # Вставка идёт мимо ORM, поэтому о затронутых днях сообщаем сами
+            dashboard_cache.note_changes(
+                db.session, {(shop_id, day, day) for shop_id, day in keys})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        report.inserted += inserted
+        report.skipped += len(chunk) - inserted
+        chunk.clear()
+
+    # Строка 1 — заголовок, данные начинаются со 2-й
+    for line, raw in enumerate(_reader(stream), start=2):
+        report.rows += 1
+        row = {aliases[key]: (value or '').strip()
+               for key, value in raw.items() if key in aliases}
+        try:
+            row_shop_id = shop_id or int(row.get('shop_id') or 0)
+            if not row_shop_id:
+                raise ValueError("Не указан магазин (shop_id).")
+            values = parse_row(row)
+            if values is None:
+                raise ValueError("Все поля строки пустые.")
+            if values['date'] is None:
+                raise ValueError("Не указана дата.")
+        except ValueError as e:
+            report.errors.append((line, str(e)))
+            continue
+
+        values['shop_id'] = row_shop_id
+        values['import_key'] = _import_key(row_shop_id, values, seen)
+        chunk.append(values)
+        if len(chunk) >= chunk_size:
+            flush()
+
+    flush()
+    return report
+
+
+@click.command('import-csv')
+@click.argument('kind', type=click.Choice(sorted(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--shop-id', type=int, default=None,
+              help='Магазин для всех строк (иначе колонка shop_id).')
+@click.option('--chunk-size', type=int, default=CHUNK_SIZE, show_default=True)
+def import_csv_command(kind, path, shop_id, chunk_size):
+    """Импорт продаж/возвратов или расходов магазина из CSV."""
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        report = import_csv(kind, stream, shop_id, chunk_size)
+
+    for line, message in report.errors:
+        click.echo(f"Строка {line}: {message}", err=True)
+    click.echo(f"Строк: {report.rows}, добавлено: {report.inserted}, "
+               f"уже было: {report.skipped}, с ошибками: {len(report.errors)}")
+
+
+@imports_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def upload():
+    """Загрузка CSV администратором."""
+    if current_user.access_level != 'admin':
+        return {"message": "Недостаточно прав"}, 403
+
+    if request.method == 'GET':
+        return render_template('import.html', kinds=sorted(IMPORTS))
+
+    kind = request.form.get('kind')
+    upload_file = request.files.get('file')
+    if kind not in IMPORTS or upload_file is None:
+        return {"message": "Укажите вид импорта и файл."}, 400
+
+    shop_id = request.form.get('shop_id', type=int)
+    # Файл декодируется по мере чтения, целиком в память не загружается
+    stream = codecs.getreader('utf-8-sig')(upload_file.stream)
+    try:
+        report = import_csv(kind, stream, shop_id)
+    except UnicodeDecodeError:
+        return {"message": "Файл должен быть в кодировке UTF-8."}, 400
+    return report.as_dict(MAX_REPORTED_ERRORS)
+
+
+def init_app(app):
+    app.register_blueprint(imports_bp)
+    app.cli.add_command(import_csv_command)
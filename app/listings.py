@@ -0,0 +1,66 @@
+"""
+Строки страниц-списков доходов, возвратов и расходов.
+
+Вместо ORM-объектов со связями shop/employee (lazy=True, то есть запрос на
+каждую строку при обращении из шаблона) список выбирает только нужные
+колонки, а названия магазина и имя сотрудника приходят тем же запросом
+через JOIN — полями shop_name и employee_name. Страница стоит одного
+запроса независимо от числа строк, а строки — лёгкие кортежи Row без
+identity map и отслеживания изменений.
+
+Выпадающие списки сотрудников в формах добавления берутся из кэша
+employee_cache: по магазину — только сотрудники текущего месяца.
+"""
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import db
+from app.cache import employee_cache
+from app.models import Employee, Expense, Income, Return, Shop
+
+# Модель -> колонки строки списка (без shop_name/employee_name)
+LISTING_COLUMNS = {
+    Income: (Income.id, Income.date, Income.shop_id, Income.operation_type,
+             Income.item_name, Income.amount, Income.notes),
+    Return: (Return.id, Return.date, Return.shop_id, Return.item_name,
+             Return.amount, Return.notes),
+    Expense: (Expense.id, Expense.date, Expense.shop_id, Expense.category,
+              Expense.amount, Expense.notes),
+}
+
+
+def listing_query(model, *criteria):
+    """
+    Запрос строк списка model с фильтром criteria.
+    Возвращает Query из Row: колонки LISTING_COLUMNS, shop_name и
+    (если у модели есть сотрудник) employee_name. Порядок задаёт вызывающий.
+    """
+    columns = list(LISTING_COLUMNS[model]) + [Shop.name.label('shop_name')]
+    has_employee = hasattr(model, 'employee_id')
+    if has_employee:
+        columns.append(Employee.name.label('employee_name'))
+
+    query = db.session.query(*columns).select_from(model).outerjoin(
+        Shop, model.shop_id == Shop.id)
+    if has_employee:
+        query = query.outerjoin(Employee, model.employee_id == Employee.id)
+    return query.filter(*criteria)
+
+
+def employee_choices(shop_id, month=None):
+    """
+    Сотрудники магазина за месяц (по умолчанию — текущий) для выпадающего
+    списка: [(id, name)] по алфавиту. Запись кэша сбрасывается после коммита,
+    изменившего сотрудников этого магазина и месяца.
+    """
+    month = month or datetime.now().strftime('%Y-%m')
+    key = (shop_id, month)
+    choices = employee_cache.get(key)
+    if choices is None:
+        choices = db.session.execute(
+            select(Employee.id, Employee.name).distinct()
+            .where(Employee.shop_id == shop_id, Employee.month == month)
+            .order_by(Employee.name, Employee.id)).all()
+        employee_cache.set(key, choices)
+    return choices
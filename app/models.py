@@ -15,6 +15,9 @@ class Shop(db.Model):
 
 
 class Employee(db.Model):
+    __table_args__ = (
+        db.Index('ix_employee_month_shop_id', 'month', 'shop_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     shop_id = db.Column(db.Integer, db.ForeignKey('shop.id'), nullable=False)
@@ -29,6 +32,10 @@ class Employee(db.Model):
 # Модель для доходов
 
 class Income(db.Model):
+    __table_args__ = (
+        db.Index('ix_income_shop_id_date', 'shop_id', 'date'),
+        db.Index('ix_income_date', 'date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     shop_id = db.Column(db.Integer, db.ForeignKey(
         'shop.id', ondelete='CASCADE'), nullable=False)
@@ -38,7 +45,7 @@ class Income(db.Model):
     item_name = db.Column(db.String(100), nullable=False)      # Наименование
     employee_id = db.Column(db.Integer, db.ForeignKey(
         'employee.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)               # Сумма
+    amount = db.Column(db.Numeric(12, 2), nullable=False)  # Сумма
     notes = db.Column(db.Text, nullable=True)                  # Заметки
 
     shop = db.relationship('Shop', backref=db.backref(
@@ -51,6 +58,10 @@ class Income(db.Model):
 
 
 class Workday(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'date',
+                            name='uq_workday_employee_id_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey(
         'employee.id'), nullable=False)
@@ -59,13 +70,17 @@ class Workday(db.Model):
 
 
 class Return(db.Model):
+    __table_args__ = (
+        db.Index('ix_return_shop_id_date', 'shop_id', 'date'),
+        db.Index('ix_return_date', 'date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     shop_id = db.Column(db.Integer, db.ForeignKey('shop.id'), nullable=False)
     date = db.Column(db.Date, default=datetime.utcnow, nullable=False)
     item_name = db.Column(db.String(100), nullable=False)
     employee_id = db.Column(db.Integer, db.ForeignKey(
         'employee.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)  # Сумма возврата
+    amount = db.Column(db.Numeric(12, 2), nullable=False)  # Сумма возврата
     notes = db.Column(db.Text, nullable=True)  # Заметки
 
     shop = db.relationship('Shop', backref=db.backref('returns', lazy=True))
@@ -74,11 +89,15 @@ class Return(db.Model):
 
 
 class Expense(db.Model):
+    __table_args__ = (
+        db.Index('ix_expense_shop_id_date', 'shop_id', 'date'),
+        db.Index('ix_expense_date', 'date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     shop_id = db.Column(db.Integer, db.ForeignKey('shop.id'), nullable=False)
     date = db.Column(db.Date, default=datetime.utcnow, nullable=False)
     category = db.Column(db.String(100), nullable=False)  # Категория расходов
-    amount = db.Column(db.Float, nullable=False)  # Сумма расходов
+    amount = db.Column(db.Numeric(12, 2), nullable=False)  # Сумма расходов
     notes = db.Column(db.Text, nullable=True)  # Заметки
 
     shop = db.relationship('Shop', backref=db.backref('expenses', lazy=True))
@@ -89,40 +108,92 @@ class Expense(db.Model):
 
 class SalesReturn(db.Model):
     __tablename__ = 'sales_returns'
+    __table_args__ = (
+        db.Index('ix_sales_returns_shop_id_date', 'shop_id', 'date'),
+        db.UniqueConstraint('shop_id', 'import_key',
+                            name='uq_sales_returns_shop_id_import_key'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     shop_id = db.Column(db.Integer, nullable=False)  # Привязка к магазину
     sale = db.Column(db.String(255), nullable=True)  # Продажа (текст)
     return_item = db.Column(db.String(255), nullable=True)  # Возврат (текст)
     retail_sale_amount = db.Column(
-        db.Float, nullable=True)  # Сумма продаж в розницу
+        db.Numeric(12, 2), nullable=True)  # Сумма продаж в розницу
     # Сумма продаж по закупочной цене
-    wholesale_sale_amount = db.Column(db.Float, nullable=True)
-    return_amount = db.Column(db.Float, nullable=True)  # Сумма возвратов
+    wholesale_sale_amount = db.Column(db.Numeric(12, 2), nullable=True)
+    return_amount = db.Column(db.Numeric(12, 2), nullable=True)  # Сумма возвратов
     date = db.Column(db.Date, default=datetime.utcnow)  # Дата
     created_at = db.Column(
         db.DateTime, default=datetime.utcnow)  # Время создания
+    # Ключ строки импорта из CSV (повторный импорт её пропускает)
+    import_key = db.Column(db.String(40), nullable=True)
+    # Версия строки: SQLAlchemy увеличивает её при каждом UPDATE и проверяет
+    # в WHERE, поэтому правка поверх чужого изменения даёт StaleDataError
+    version_id = db.Column(db.Integer, nullable=False, default=1,
+                           server_default='1')
+
+    __mapper_args__ = {'version_id_col': version_id}
 
 
 class ShopExpense(db.Model):
     __tablename__ = 'shop_expenses'
+    __table_args__ = (
+        db.Index('ix_shop_expenses_shop_id_date', 'shop_id', 'date'),
+        db.UniqueConstraint('shop_id', 'import_key',
+                            name='uq_shop_expenses_shop_id_import_key'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     shop_id = db.Column(db.Integer, nullable=False)  # Привязка к магазину
     purchase_desc = db.Column(
         db.String(255), nullable=True)  # Описание закупки
-    purchase = db.Column(db.Float, nullable=True)  # Сумма закупки
+    purchase = db.Column(db.Numeric(12, 2), nullable=True)  # Сумма закупки
     store_needs_desc = db.Column(
         db.String(255), nullable=True)  # Описание нужд магазина
-    store_needs = db.Column(db.Float, nullable=True)  # Сумма нужд магазина
+    store_needs = db.Column(db.Numeric(12, 2), nullable=True)  # Сумма нужд магазина
     salary_desc = db.Column(db.String(255), nullable=True)  # Описание зарплаты
-    salary = db.Column(db.Float, nullable=True)  # Сумма зарплаты
+    salary = db.Column(db.Numeric(12, 2), nullable=True)  # Сумма зарплаты
     rent_desc = db.Column(db.String(255), nullable=True)  # Описание аренды
-    rent = db.Column(db.Float, nullable=True)  # Сумма аренды
+    rent = db.Column(db.Numeric(12, 2), nullable=True)  # Сумма аренды
     repair_desc = db.Column(db.String(255), nullable=True)  # Описание ремонта
-    repair = db.Column(db.Float, nullable=True)  # Сумма ремонта
+    repair = db.Column(db.Numeric(12, 2), nullable=True)  # Сумма ремонта
     marketing_desc = db.Column(
         db.String(255), nullable=True)  # Описание маркетинга
-    marketing = db.Column(db.Float, nullable=True)  # Сумма маркетинга
+    marketing = db.Column(db.Numeric(12, 2), nullable=True)  # Сумма маркетинга
     date = db.Column(db.Date, default=datetime.utcnow)  # Дата
+    # Ключ строки импорта из CSV (повторный импорт её пропускает)
+    import_key = db.Column(db.String(40), nullable=True)
+    # Версия строки: SQLAlchemy увеличивает её при каждом UPDATE и проверяет
+    # в WHERE, поэтому правка поверх чужого изменения даёт StaleDataError
+    version_id = db.Column(db.Integer, nullable=False, default=1,
+                           server_default='1')
+
+    __mapper_args__ = {'version_id_col': version_id}
+
+
+# Дневные итоги по магазину (обновляются вместе с ShopExpense и SalesReturn)
+
+class DailyShopTotal(db.Model):
+    __tablename__ = 'daily_shop_totals'
+    shop_id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, primary_key=True, index=True)
+    purchase = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    store_needs = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    salary = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    rent = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    repair = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    marketing = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    retail_sale_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    wholesale_sale_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    return_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+
+# Зарплаты сотрудников по магазину за месяц (обновляются вместе с Employee)
+class MonthlyPayroll(db.Model):
+    __tablename__ = 'monthly_payroll'
+    shop_id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # 'YYYY-MM'
+    total_salary = db.Column(db.Integer, nullable=False, default=0)
+    employee_count = db.Column(db.Integer, nullable=False, default=0)
 
 
 # авторизация
@@ -0,0 +1,51 @@
+"""
+Денежные суммы.
+
+Суммы хранятся в колонках NUMERIC(12, 2) (тип MONEY) и приходят из базы
+как Decimal с точностью до копейки. Итоги считает база одним SELECT SUM(...)
+по нужным колонкам (column_totals), а не Python по атрибутам загруженных
+ORM-объектов: сложение NUMERIC точное, и строки не приходится
+превращать в объекты ради одной суммы.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from sqlalchemy import Numeric, func, select
+
+from app import db
+
+MONEY = Numeric(12, 2)
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def to_money(value):
+    """
+    Сумма из строки/числа формы, округлённая до копейки.
+    Пустое значение -> None; некорректное -> ValueError.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, float):
+        # repr, а не двоичное значение: 0.1 -> Decimal('0.10')
+        value = repr(value)
+    try:
+        amount = Decimal(str(value).strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"Некорректная сумма: {value}") from None
+    if not amount.is_finite():
+        raise ValueError(f"Некорректная сумма: {value}")
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def column_totals(model, names, *criteria):
+    """
+    Суммы колонок names модели по строкам, подходящим под criteria,
+    одним запросом. Возвращает {колонка: Decimal}; пустая выборка — нули.
+    """
+    query = select(*[func.coalesce(func.sum(getattr(model, name)), 0)
+                     .label(name) for name in names])
+    if criteria:
+        query = query.where(*criteria)
+    row = db.session.execute(query).one()
+    return {name: ZERO if value is None else Decimal(value).quantize(CENT)
+            for name, value in zip(names, row)}
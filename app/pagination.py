@@ -0,0 +1,67 @@
+"""
+Постраничный вывод журналов по ключу (date, id).
+
+Вместо OFFSET следующая страница начинается строго после последней
+показанной строки: WHERE (date, id) > (:date, :id) ORDER BY date, id.
+Такой запрос идёт по индексу и не замедляется на дальних страницах.
+"""
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class KeysetPage:
+    """Строки страницы и курсор следующей страницы (None — страница последняя)."""
+
+    def __init__(self, items, next_cursor, cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(row_date, row_id):
+    return f"{row_date.strftime('%Y-%m-%d')}_{row_id}"
+
+
+def decode_cursor(cursor):
+    """Курсор 'YYYY-MM-DD_id' -> (date, id); None при пустом или битом курсоре."""
+    if not cursor:
+        return None
+    try:
+        day, row_id = cursor.split('_', 1)
+        return datetime.strptime(day, '%Y-%m-%d').date(), int(row_id)
+    except ValueError:
+        return None
+
+
+def page_size():
+    """Размер страницы из ?per_page= или LEDGER_PAGE_SIZE."""
+    default = current_app.config.get('LEDGER_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    size = request.args.get('per_page', default, type=int)
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_page(query, date_column, id_column, cursor=None, size=None):
+    """Одна страница запроса query в порядке (date, id)."""
+    size = size or page_size()
+    position = decode_cursor(cursor)
+    if position is not None:
+        query = query.filter(tuple_(date_column, id_column) > tuple_(*position))
+
+    rows = query.order_by(date_column, id_column).limit(size + 1).all()
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.date, last.id)
+    return KeysetPage(rows, next_cursor, cursor if position else None)
@@ -0,0 +1,88 @@
+"""
+Параллельное выполнение независимых запросов к базе.
+
+Каждая задача выполняется в потоке из общего пула со своим контекстом
+приложения, а значит — со своей сессией db.session и своим соединением из
+пула SQLAlchemy. Общее время равно самой долгой задаче, а не сумме.
+Перед запуском задач сессия запроса закрывается и её соединение
+возвращается в пул: иначе каждый запрос держал бы одно соединение, ожидая
+ещё до PARALLEL_WORKERS, и при нескольких одновременных запросах пул
+исчерпывался бы (ожидание pool_timeout).
+Запросы задач и их время в базе добавляются к счётчикам исходного
+запроса (X-SQL-Statements, PROFILE_REQUESTS), как при выполнении по очереди.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g
+
+from app import db
+from app.profiling import (collect_task_counters, merge_task_counters,
+                           task_counters)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='parallel')
+        return _executor
+
+
+def _run_task(app, use_replica, profiled, task):
+    # Контекст приложения даёт задаче отдельную сессию; по выходу из него
+    # Flask-SQLAlchemy закрывает сессию и возвращает соединение в пул
+    with app.app_context():
+        g.use_replica = use_replica
+        task_counters(profiled)
+        started = time.perf_counter()
+        result = task()
+        duration = (time.perf_counter() - started) * 1000
+        return result, duration, collect_task_counters()
+
+
+def _run_sequential(tasks):
+    results, timings = {}, {}
+    for name, task in tasks.items():
+        started = time.perf_counter()
+        results[name] = task()
+        timings[name] = (time.perf_counter() - started) * 1000
+    return results, timings
+
+
+def run_parallel(tasks, sequential=False):
+    """
+    Выполняет задачи {имя: функция без аргументов} параллельно
+    (при sequential=True — по очереди в текущем контексте).
+    Возвращает ({имя: результат}, {имя: время в мс}); исключение задачи
+    пробрасывается вызывающему.
+
+    Параллельный запуск закрывает сессию запроса, поэтому вызывать его можно
+    только без несохранённых изменений. Загруженные объекты остаются с
+    данными (close() не просрочивает их, в отличие от commit()).
+    """
+    if sequential:
+        return _run_sequential(tasks)
+
+    session = db.session()
+    if session.new or session.dirty or session.deleted:
+        raise RuntimeError("run_parallel: в сессии запроса есть несохранённые изменения.")
+    session.close()
+
+    app = current_app._get_current_object()
+    executor = _get_executor(app.config['PARALLEL_WORKERS'])
+    use_replica = g.get('use_replica', False)
+    profiled = g.get('profile') is not None
+
+    futures = {name: executor.submit(_run_task, app, use_replica, profiled, task)
+               for name, task in tasks.items()}
+    results, timings = {}, {}
+    for name, future in futures.items():
+        results[name], timings[name], counters = future.result()
+        merge_task_counters(*counters)
+    return results, timings
@@ -0,0 +1,185 @@
+"""
+Счётчик SQL-запросов и профилирование запросов Flask.
+
+Счётчик запросов работает всегда. В режиме PROFILE_REQUESTS для каждого
+запроса дополнительно собираются: суммарное время в базе, самый медленный
+SQL-запрос и время рендеринга шаблонов. Результат отдаётся в заголовке
+Server-Timing и пишется строкой JSON в PROFILE_LOG (или в лог `profiling`).
+
+Отрезки, отмеченные record_timing (например, шаги главной страницы),
+попадают в Server-Timing всегда.
+"""
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from flask import (before_render_template, current_app, g, has_app_context,
+                   request, template_rendered)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('profiling')
+logger.setLevel(logging.INFO)
+
+# Длина SQL-текста самого медленного запроса в журнале
+STATEMENT_PREVIEW = 500
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.sql_statement_count = g.get('sql_statement_count', 0) + 1
+        if g.get('profile') is not None:
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_app_context():
+        return
+    profile = g.get('profile')
+    started = conn.info.get('query_started')
+    if profile is None or not started:
+        return
+    duration = time.perf_counter() - started.pop()
+    profile['db'] += duration
+    if duration > profile['slowest']:
+        profile['slowest'] = duration
+        profile['slowest_statement'] = statement
+
+
+def _handle_error(exception_context):
+    # Запрос упал — after_cursor_execute не будет, убираем его отметку времени
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
+
+
+def _before_render_template(sender, template, context, **extra):
+    profile = g.get('profile')
+    if profile is not None:
+        profile['template_started'] = time.perf_counter()
+
+
+def _template_rendered(sender, template, context, **extra):
+    profile = g.get('profile')
+    if profile is not None and profile.get('template_started'):
+        profile['template'] += time.perf_counter() - profile.pop('template_started')
+
+
+def record_timing(name, duration_ms, description=None):
+    """
+    Добавляет отрезок времени к ответу: заголовок Server-Timing (всегда)
+    и поле timings записи журнала (в режиме PROFILE_REQUESTS).
+    """
+    g.setdefault('timings', []).append((name, duration_ms, description))
+
+
+def statement_count():
+    """Сколько SQL-запросов выполнено в текущем контексте приложения."""
+    return g.get('sql_statement_count', 0)
+
+
+def task_counters(profiled):
+    """
+    Пустые счётчики задачи app.parallel: у неё свой контекст приложения,
+    а значит свой g. profiled — профилируется ли исходный запрос.
+    """
+    g.sql_statement_count = 0
+    if profiled:
+        g.profile = {'db': 0.0, 'slowest': 0.0, 'slowest_statement': None}
+
+
+def collect_task_counters():
+    """Счётчики задачи для merge_task_counters: (число запросов, профиль)."""
+    return g.get('sql_statement_count', 0), g.get('profile')
+
+
+def merge_task_counters(statements, profile):
+    """Добавляет запросы и время в базе задачи к текущему запросу."""
+    g.sql_statement_count = statement_count() + statements
+    parent = g.get('profile')
+    if parent is None or profile is None:
+        return
+    parent['db'] += profile['db']
+    if profile['slowest'] > parent['slowest']:
+        parent['slowest'] = profile['slowest']
+        parent['slowest_statement'] = profile['slowest_statement']
+
+
+def _start_profile():
+    if current_app.config.get('PROFILE_REQUESTS'):
+        g.profile = {
+            'started': time.perf_counter(),
+            'db': 0.0,
+            'template': 0.0,
+            'slowest': 0.0,
+            'slowest_statement': None,
+            'queries_before': statement_count(),
+        }
+
+
+def _finish_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+
+    total = time.perf_counter() - profile['started']
+    queries = statement_count() - profile['queries_before']
+    record = {
+        'ts': datetime.now(timezone.utc).isoformat(),
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'total_ms': round(total * 1000, 3),
+        'queries': queries,
+        'db_ms': round(profile['db'] * 1000, 3),
+        'slowest_ms': round(profile['slowest'] * 1000, 3),
+        'slowest_statement': (profile['slowest_statement'] or '')[:STATEMENT_PREVIEW],
+        'template_ms': round(profile['template'] * 1000, 3),
+        'timings': {name: round(duration, 3)
+                    for name, duration, _ in g.get('timings', ())},
+    }
+
+    response.headers.add('Server-Timing', ', '.join([
+        f'db;dur={record["db_ms"]};desc="{queries} queries"',
+        f'db-slowest;dur={record["slowest_ms"]}',
+        f'tpl;dur={record["template_ms"]}',
+        f'total;dur={record["total_ms"]}',
+    ]))
+    _write_record(record)
+    return response
+
+
+def _add_timings(response):
+    timings = g.pop('timings', None)
+    if timings:
+        response.headers.add('Server-Timing', ', '.join(
+            f'{name};dur={round(duration, 3)}'
+            + (f';desc="{description}"' if description else '')
+            for name, duration, description in timings))
+    return response
+
+
+def _write_record(record):
+    line = json.dumps(record, ensure_ascii=False)
+    path = current_app.config.get('PROFILE_LOG')
+    if path:
+        with open(path, 'a', encoding='utf-8') as log_file:
+            log_file.write(line + '\n')
+    else:
+        logger.info(line)
+
+
+def init_app(app):
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+    app.before_request(_start_profile)
+    # after_request выполняются в обратном порядке: журнал видит timings
+    app.after_request(_add_timings)
+    app.after_request(_finish_profile)
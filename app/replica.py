@@ -0,0 +1,65 @@
+"""
+Чтение отчётных страниц с реплики базы.
+
+GET-обработчики, помеченные @reporting, выполняют запросы на движке
+SQLALCHEMY_BINDS['replica'] (DATABASE_REPLICA_URL). Всё остальное, в том
+числе любой flush, идёт на основную базу.
+
+Чтобы пользователь сразу видел свои изменения, после его POST в сессии
+запоминается время записи, и следующие REPLICA_STICKY_SECONDS секунд его
+отчёты читаются с основной базы, пока реплика догоняет.
+"""
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request, session
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class RoutingSession(Session):
+    """Сессия, отдающая реплику для запросов отчётных страниц."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and using_replica():
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def using_replica():
+    # Флаг живёт в g, поэтому его видят и задачи app.parallel
+    return has_app_context() and g.get('use_replica', False)
+
+
+def _recently_wrote():
+    last_write = session.get('last_write_at')
+    if last_write is None:
+        return False
+    return time.time() - last_write < current_app.config['REPLICA_STICKY_SECONDS']
+
+
+def reporting(view):
+    """
+    Отчётный обработчик: GET-запросы читают с реплики.
+    Ставится под @login_required, чтобы пользователь загружался с основной базы.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method == 'GET' and not _recently_wrote():
+            g.use_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _remember_write(response):
+    if request.method in WRITE_METHODS and response.status_code < 400:
+        session['last_write_at'] = time.time()
+    return response
+
+
+def init_app(app):
+    app.after_request(_remember_write)
@@ -0,0 +1,354 @@
+"""
+Дневные итоги по магазинам (таблица daily_shop_totals) и месячные
+зарплаты по магазинам (таблица monthly_payroll).
+
+Главная страница читает только эти таблицы, а не сырые ShopExpense,
+SalesReturn и Employee. Затронутые пары (магазин, дата) и (магазин, месяц)
+собираются на каждом flush сессии, а итоги по ним пересчитываются один раз
+перед коммитом транзакции, поэтому их не нужно поддерживать вручную в каждом
+маршруте. Изменения мимо ORM передаются через note_changes.
+"""
+import zlib
+from datetime import date, datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import (and_, cast, delete, event, func, insert, inspect,
+                        literal, null, or_, select, text, union_all)
+
+from app import db
+from app.models import (DailyShopTotal, Employee, MonthlyPayroll, SalesReturn,
+                        ShopExpense)
+from app.money import MONEY
+
+EXPENSE_COLUMNS = ('purchase', 'store_needs', 'salary',
+                   'rent', 'repair', 'marketing')
+SALES_COLUMNS = ('retail_sale_amount', 'wholesale_sale_amount', 'return_amount')
+TOTAL_COLUMNS = EXPENSE_COLUMNS + SALES_COLUMNS
+
+TRACKED_MODELS = (ShopExpense, SalesReturn)
+
+# Пространства advisory-блокировок PostgreSQL для пересчёта итогов
+DAILY_LOCK_SPACE = 1
+PAYROLL_LOCK_SPACE = 2
+
+# Ключи session.info: пары, итоги которых пересчитываются перед коммитом
+ROLLUP_KEYS = 'rollup_keys'
+PAYROLL_KEYS = 'payroll_keys'
+
+
+def _as_date(value):
+    """Приводит значение поля date (строка, datetime, date) к date."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def _key(shop_id, value):
+    day = _as_date(value)
+    if shop_id is None or day is None:
+        return None
+    return int(shop_id), day
+
+
+def _aggregate_select(keys=None):
+    """
+    SELECT с итогами по (shop_id, date) из сырых таблиц.
+    Если keys задан, считаются только указанные пары (магазин, дата).
+    """
+    def source(model, columns):
+        row = [model.shop_id.label('shop_id'), model.date.label('date')]
+        for name in TOTAL_COLUMNS:
+            # Типизированный NULL: у колонки UNION тип MONEY, итоги — Decimal
+            value = (getattr(model, name) if name in columns
+                     else cast(null(), MONEY))
+            row.append(value.label(name))
+        query = select(*row).where(model.date.isnot(None))
+        if keys is not None:
+            query = query.where(_keys_filter(model, keys))
+        return query
+
+    union = union_all(
+        source(ShopExpense, EXPENSE_COLUMNS),
+        source(SalesReturn, SALES_COLUMNS),
+    ).subquery()
+
+    return select(
+        union.c.shop_id,
+        union.c.date,
+        *[func.coalesce(func.sum(union.c[name]), literal(0)).label(name)
+          for name in TOTAL_COLUMNS]
+    ).group_by(union.c.shop_id, union.c.date)
+
+
+def _keys_filter(model, keys):
+    by_shop = {}
+    for shop_id, day in keys:
+        by_shop.setdefault(shop_id, set()).add(day)
+    return or_(*[
+        and_(model.shop_id == shop_id, model.date.in_(sorted(days)))
+        for shop_id, days in by_shop.items()
+    ])
+
+
+def _lock_keys(connection, space, keys):
+    """
+    На PostgreSQL берёт транзакционные advisory-блокировки ключей итогов.
+
+    Без них две транзакции, изменившие строки одного (магазин, дата),
+    пересчитывают итог каждая по своему снимку: вторая либо падает на
+    первичном ключе, либо записывает итог без строк первой. С блокировкой
+    вторая ждёт коммита первой, и её DELETE/INSERT ... SELECT (новый снимок
+    в READ COMMITTED) уже видит чужие строки. Все ключи транзакции берутся
+    одним вызовом перед коммитом (_before_commit: дневные, затем зарплатные)
+    по возрастанию, поэтому транзакции не блокируют друг друга взаимно.
+    """
+    if connection.dialect.name != 'postgresql':
+        return
+    lock_ids = sorted({(space << 32) | zlib.crc32(repr(key).encode())
+                       for key in keys})
+    connection.execute(
+        text("SELECT pg_advisory_xact_lock(lock_id) "
+             "FROM unnest(CAST(:lock_ids AS bigint[])) AS lock_id"),
+        {'lock_ids': lock_ids})
+
+
+def refresh_daily_totals(connection, keys):
+    """
+    Пересчитывает итоги для набора пар (shop_id, date) из сырых таблиц.
+    Используется событиями сессии и массовыми вставками мимо ORM.
+    """
+    keys = {key for key in keys if key is not None}
+    if not keys:
+        return
+    _lock_keys(connection, DAILY_LOCK_SPACE, keys)
+    connection.execute(
+        delete(DailyShopTotal).where(_keys_filter(DailyShopTotal, keys)))
+    aggregated = _aggregate_select(keys)
+    connection.execute(insert(DailyShopTotal).from_select(
+        ['shop_id', 'date', *TOTAL_COLUMNS], aggregated))
+
+
+def rebuild_daily_totals(connection):
+    """Полностью перестраивает daily_shop_totals по сырым таблицам."""
+    connection.execute(delete(DailyShopTotal))
+    connection.execute(insert(DailyShopTotal).from_select(
+        ['shop_id', 'date', *TOTAL_COLUMNS], _aggregate_select()))
+
+
+def check_daily_totals(connection):
+    """
+    Сверяет daily_shop_totals с сырыми таблицами.
+    Возвращает список расхождений (shop_id, date, колонка, ожидание, факт).
+    """
+    expected = {
+        (row.shop_id, _as_date(row.date)): row
+        for row in connection.execute(_aggregate_select())
+    }
+    actual = {
+        (row.shop_id, _as_date(row.date)): row
+        for row in connection.execute(select(DailyShopTotal.__table__))
+    }
+
+    mismatches = []
+    for key in sorted(expected.keys() | actual.keys()):
+        for name in TOTAL_COLUMNS:
+            want = getattr(expected.get(key), name, 0) or 0
+            got = getattr(actual.get(key), name, 0) or 0
+            if want != got:
+                mismatches.append((key[0], key[1], name, want, got))
+    return mismatches
+
+
+def _payroll_filter(model, keys):
+    by_shop = {}
+    for shop_id, month in keys:
+        by_shop.setdefault(shop_id, set()).add(month)
+    return or_(*[
+        and_(model.shop_id == shop_id, model.month.in_(sorted(months)))
+        for shop_id, months in by_shop.items()
+    ])
+
+
+def _payroll_select(keys=None):
+    """SELECT зарплат по (shop_id, month) из Employee."""
+    query = select(
+        Employee.shop_id,
+        Employee.month,
+        func.coalesce(func.sum(Employee.total_salary), literal(0)).label(
+            'total_salary'),
+        func.count().label('employee_count'),
+    )
+    if keys is not None:
+        query = query.where(_payroll_filter(Employee, keys))
+    return query.group_by(Employee.shop_id, Employee.month)
+
+
+def refresh_monthly_payroll(connection, keys):
+    """Пересчитывает monthly_payroll для набора пар (shop_id, month)."""
+    keys = {key for key in keys if None not in key}
+    if not keys:
+        return
+    _lock_keys(connection, PAYROLL_LOCK_SPACE, keys)
+    connection.execute(
+        delete(MonthlyPayroll).where(_payroll_filter(MonthlyPayroll, keys)))
+    connection.execute(insert(MonthlyPayroll).from_select(
+        ['shop_id', 'month', 'total_salary', 'employee_count'],
+        _payroll_select(keys)))
+
+
+def rebuild_monthly_payroll(connection):
+    """Полностью перестраивает monthly_payroll по таблице employee."""
+    connection.execute(delete(MonthlyPayroll))
+    connection.execute(insert(MonthlyPayroll).from_select(
+        ['shop_id', 'month', 'total_salary', 'employee_count'],
+        _payroll_select()))
+
+
+def check_monthly_payroll(connection):
+    """
+    Сверяет monthly_payroll с таблицей employee.
+    Возвращает список расхождений (shop_id, month, колонка, ожидание, факт).
+    """
+    expected = {(row.shop_id, row.month): row
+                for row in connection.execute(_payroll_select())}
+    actual = {(row.shop_id, row.month): row
+              for row in connection.execute(select(MonthlyPayroll.__table__))}
+
+    mismatches = []
+    for key in sorted(expected.keys() | actual.keys()):
+        for name in ('total_salary', 'employee_count'):
+            want = getattr(expected.get(key), name, 0) or 0
+            got = getattr(actual.get(key), name, 0) or 0
+            if want != got:
+                mismatches.append((key[0], key[1], name, want, got))
+    return mismatches
+
+
+def _collect_keys(obj):
+    """Пары (магазин, дата) объекта: текущая и до изменения."""
+    state = inspect(obj)
+    shop_ids = {obj.shop_id}
+    days = {obj.date}
+    shop_ids.update(state.attrs.shop_id.history.deleted or ())
+    days.update(state.attrs.date.history.deleted or ())
+    return {_key(shop_id, day) for shop_id in shop_ids for day in days}
+
+
+def _collect_payroll_keys(obj):
+    """Пары (магазин, месяц) сотрудника: текущая и до изменения."""
+    state = inspect(obj)
+    shop_ids = {obj.shop_id}
+    months = {obj.month}
+    shop_ids.update(state.attrs.shop_id.history.deleted or ())
+    months.update(state.attrs.month.history.deleted or ())
+    return {(shop_id, month) for shop_id in shop_ids for month in months}
+
+
+def _load_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+def note_changes(session, keys):
+    """
+    Запоминает пары (магазин, дата), изменённые мимо ORM (Core UPDATE или
+    DELETE): итоги по ним пересчитаются перед коммитом сессии.
+    """
+    session.info.setdefault(ROLLUP_KEYS, set()).update(keys)
+
+
+def _before_flush(session, flush_context, instances):
+    # Изменённые и удаляемые строки собираем до flush, пока доступна
+    # история атрибутов и их можно подгрузить из базы
+    pending = session.info.setdefault(ROLLUP_KEYS, set())
+    payroll = session.info.setdefault(PAYROLL_KEYS, set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, TRACKED_MODELS):
+            pending.update(_collect_keys(obj))
+        elif isinstance(obj, Employee):
+            payroll.update(_collect_payroll_keys(obj))
+
+
+def _after_flush(session, flush_context):
+    # Новые строки — после flush, когда применены значения по умолчанию
+    pending = session.info.setdefault(ROLLUP_KEYS, set())
+    payroll = session.info.setdefault(PAYROLL_KEYS, set())
+    for obj in session.new:
+        if isinstance(obj, TRACKED_MODELS):
+            pending.add(_key(obj.shop_id, obj.date))
+        elif isinstance(obj, Employee):
+            payroll.add((obj.shop_id, obj.month))
+
+
+def _before_commit(session):
+    # Пересчёт один раз на транзакцию: ключи всех её flush сразу, блокировки
+    # по возрастанию. before_commit срабатывает и для SAVEPOINT — ждём внешнюю
+    if session.in_nested_transaction():
+        return
+    # Изменения, ещё не отправленные в базу, — их ключи соберёт flush
+    session.flush()
+    pending = session.info.pop(ROLLUP_KEYS, None)
+    payroll = session.info.pop(PAYROLL_KEYS, None)
+    if pending:
+        refresh_daily_totals(session.connection(), pending)
+    if payroll:
+        refresh_monthly_payroll(session.connection(), payroll)
+
+
+def _after_soft_rollback(session, previous_transaction):
+    # Откат SAVEPOINT не отменяет изменений, сделанных до него
+    if previous_transaction.parent is None:
+        session.info.pop(ROLLUP_KEYS, None)
+        session.info.pop(PAYROLL_KEYS, None)
+
+
+rollups_cli = AppGroup('rollups',
+                       help='Дневные итоги и месячные зарплаты по магазинам.')
+
+
+@rollups_cli.command('rebuild')
+def rebuild_command():
+    """Перестроить daily_shop_totals и monthly_payroll с нуля."""
+    with db.engine.begin() as connection:
+        rebuild_daily_totals(connection)
+        rebuild_monthly_payroll(connection)
+        count = connection.execute(
+            select(func.count()).select_from(DailyShopTotal)).scalar()
+        payroll_count = connection.execute(
+            select(func.count()).select_from(MonthlyPayroll)).scalar()
+    click.echo(f"Итоги перестроены: {count} строк, "
+               f"зарплаты по месяцам: {payroll_count} строк.")
+
+
+@rollups_cli.command('check')
+def check_command():
+    """Сверить daily_shop_totals и monthly_payroll с сырыми таблицами."""
+    with db.engine.connect() as connection:
+        mismatches = (check_daily_totals(connection)
+                      + check_monthly_payroll(connection))
+    for shop_id, day, name, want, got in mismatches:
+        click.echo(f"Магазин {shop_id}, {day}, {name}: "
+                   f"ожидалось {want}, в итогах {got}")
+    if mismatches:
+        raise click.ClickException(f"Найдено расхождений: {len(mismatches)}")
+    click.echo("Итоги совпадают с исходными таблицами.")
+
+
+def init_app(app):
+    # При присваивании ключевых полей прежнее значение подгружается из базы:
+    # у просроченного (например, после commit) объекта иначе пустая история
+    for attribute in (ShopExpense.shop_id, ShopExpense.date,
+                      SalesReturn.shop_id, SalesReturn.date,
+                      Employee.shop_id, Employee.month):
+        if not event.contains(attribute, 'set', _load_old_value):
+            event.listen(attribute, 'set', _load_old_value, active_history=True)
+    if not event.contains(db.session, 'before_flush', _before_flush):
+        event.listen(db.session, 'before_flush', _before_flush)
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'before_commit', _before_commit)
+        event.listen(db.session, 'after_soft_rollback', _after_soft_rollback)
+    app.cli.add_command(rollups_cli)
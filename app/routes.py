@@ -1,12 +1,31 @@
 from flask import Flask, render_template, redirect, url_for, request, flash
-from app.models import db, Shop, Employee, Income, Expense, Workday, Return, SalesReturn, ShopExpense
-from app.forms import EmployeeForm
+from app.models import db, Shop, Employee, Income, Expense, Workday, Return, SalesReturn, ShopExpense, DailyShopTotal
+from app.forms import (EmployeeForm, SALES_RETURN_FIELDS, SHOP_EXPENSE_FIELDS,
+                       SALES_RETURN_AMOUNT_FIELDS, SHOP_EXPENSE_CATEGORIES,
+                       form_row_indexes, row_fields, parse_sales_return_row,
+                       parse_shop_expense_row)
+from app.money import column_totals, to_money
+from app.listings import employee_choices, listing_query
+from app.bulk import upsert, apply_versioned
+from app.profiling import record_timing, statement_count
+from app.parallel import run_parallel
+from app.cache import CACHES
+from app import dashboard_cache
+from app.pagination import keyset_page
+from app.replica import reporting
+from app.dashboard import (DASHBOARD_MODES, dashboard_series, payroll_total,
+                           shop_profit_matrix)
 from datetime import datetime, date, timedelta
 from calendar import monthrange
-from sqlalchemy import text, func, asc, desc
+from sqlalchemy import text, asc, desc
+from sqlalchemy.orm import joinedload
 from flask_login import login_required, current_user
 from .auth import auth_bp
+from .exports import exports_bp
+from .health import health_bp
+from .api import api_bp
 import calendar
+import time
 
 
 def has_access_to_shop(shop_id):
@@ -16,6 +35,30 @@ def has_access_to_shop(shop_id):
     return current_user.shop_id is None or current_user.shop_id == shop_id
 
 
+def workday_rows(employee_id, year, month, submitted_days):
+    """
+    Строки Workday за весь месяц: worked=True для дней из submitted_days
+    (строки вида 'YYYY-MM-DD'), для остальных — False.
+    """
+    submitted = set(submitted_days)
+    rows = []
+    for day in range(1, monthrange(year, month)[1] + 1):
+        current = date(year, month, day)
+        rows.append({
+            'employee_id': employee_id,
+            'date': current,
+            'worked': current.strftime('%Y-%m-%d') in submitted,
+        })
+    return rows
+
+
+def conflict_message(conflicts):
+    """Сообщение о строках, которые не сохранены из-за чужих изменений."""
+    ids = ', '.join(str(conflict['id']) for conflict in conflicts)
+    return (f"Строки с ID {ids} изменены или удалены другим пользователем — "
+            "ваши правки в них не сохранены. Остальные изменения сохранены.")
+
+
 shops = [
     {"id": 1, "address": "Пр. Строителей 132", "name": "Магазин № 1"},
     {"id": 2, "address": "Пр. Ленина 66/39", "name": "Магазин № 2"},
@@ -26,11 +69,22 @@ shops = [
 
 def init_routes(app: Flask):
     app.register_blueprint(auth_bp)
+    app.register_blueprint(exports_bp)
+    app.register_blueprint(health_bp)
+    app.register_blueprint(api_bp)
 
     @app.errorhandler(404)
     def not_found(error):
         return 'Oops! Ты зашёл куда-то не туда =(\n', 404
 
+    @app.route('/metrics', methods=['GET'])
+    @login_required
+    def metrics():
+        """Статистика кэшей процесса (только для администратора)."""
+        if current_user.access_level != 'admin':
+            return {"message": "Недостаточно прав"}, 403
+        return {name: cache.stats() for name, cache in CACHES.items()}
+
     @app.route('/add_employee', methods=['GET', 'POST'])
     @login_required
     def add_employee():
@@ -88,6 +142,7 @@ def init_routes(app: Flask):
     # ---------------------------------------------
     @app.route('/', methods=['GET'])
     @login_required
+    @reporting
     def index():
         """
         Главная страница: выводит магазины, форму для фильтра,
@@ -118,191 +173,99 @@ def init_routes(app: Flask):
             end_date = date.today()
             start_date = end_date - timedelta(days=6)
 
-        # 2. Формируем список дней (для динамических столбцов в таблицах)
-        days_range = []
-        current_day = start_date
-        while current_day <= end_date:
-            days_range.append(current_day)
-            current_day += timedelta(days=1)
-
-        # 3. Запрашиваем из БД суммарные расходы за период по дням
-        expenses_query = db.session.query(
-            ShopExpense.date,
-            func.sum(ShopExpense.purchase).label('total_purchase'),
-            func.sum(ShopExpense.store_needs).label('total_store_needs'),
-            func.sum(ShopExpense.salary).label('total_salary'),
-            func.sum(ShopExpense.rent).label('total_rent'),
-            func.sum(ShopExpense.repair).label('total_repair'),
-            func.sum(ShopExpense.marketing).label('total_marketing'),
-        ).filter(
-            ShopExpense.date >= start_date,
-            ShopExpense.date <= end_date
-        ).group_by(ShopExpense.date).all()
-
-        # Инициализируем словари для расходов
-        expenses = {
-            'purchase': {},
-            'store_needs': {},
-            'salary': {},
-            'rent': {},
-            'repair': {},
-            'marketing': {},
-            'total_expenses_all': {}
+        # Вид: прибыль по магазинам (по умолчанию) или только общие таблицы
+        mode = request.args.get('mode')
+        if mode not in DASHBOARD_MODES:
+            mode = DASHBOARD_MODES[0]
+
+        # Готовая страница из кэша (ключ — магазины пользователя и период)
+        cache_key = dashboard_cache.cache_key(
+            current_user.shop_id, start_date, end_date,
+            start_date_str, end_date_str, mode)
+        html = dashboard_cache.get(cache_key)
+        if html is not None:
+            return html
+        cache_generation = dashboard_cache.generation()
+
+        # 2. Магазины, доступные пользователю (директору — только его)
+        shops_query = Shop.query.order_by(Shop.id)
+        if current_user.shop_id is not None:
+            shops_query = shops_query.filter(Shop.id == current_user.shop_id)
+        shops = shops_query.all()
+
+        # 3. Независимые запросы — параллельно на отдельных соединениях пула:
+        # ряды по дням и итоги за период (daily_shop_totals), матрица прибыли
+        # магазин × день (GROUP BY shop_id, date) и зарплаты за месяцы периода
+        scope = current_user.shop_id
+        tasks = {
+            'series': lambda: dashboard_series(start_date, end_date, shop_id=scope),
+            'payroll': lambda: payroll_total(start_date, end_date, shop_id=scope),
         }
-
-        # Заполняем словари данными
-        for row in expenses_query:
-            expenses['purchase'][row.date] = row.total_purchase or 0
-            expenses['store_needs'][row.date] = row.total_store_needs or 0
-            expenses['salary'][row.date] = row.total_salary or 0
-            expenses['rent'][row.date] = row.total_rent or 0
-            expenses['repair'][row.date] = row.total_repair or 0
-            expenses['marketing'][row.date] = row.total_marketing or 0
-            expenses['total_expenses_all'][row.date] = (
-                (row.total_purchase or 0) +
-                (row.total_store_needs or 0) +
-                (row.total_salary or 0) +
-                (row.total_rent or 0) +
-                (row.total_repair or 0) +
-                (row.total_marketing or 0)
-            )
-
-        # Инициализируем итоговые суммы
-        expenses_totals = {
-            'purchase': 0,
-            'store_needs': 0,
-            'salary': 0,
-            'rent': 0,
-            'repair': 0,
-            'marketing': 0,
-            'total_expenses_all': 0
-        }
-
-        # Вычисляем итоговые суммы
-        for day in days_range:
-            expenses_totals['purchase'] += expenses['purchase'].get(day, 0)
-            expenses_totals['store_needs'] += expenses['store_needs'].get(
-                day, 0)
-            expenses_totals['salary'] += expenses['salary'].get(day, 0)
-            expenses_totals['rent'] += expenses['rent'].get(day, 0)
-            expenses_totals['repair'] += expenses['repair'].get(day, 0)
-            expenses_totals['marketing'] += expenses['marketing'].get(day, 0)
-            expenses_totals['total_expenses_all'] += expenses['total_expenses_all'].get(
-                day, 0)
-
-        # 4. Запрашиваем из БД суммарные продажи/возвраты за период по дням
-        sales_query = db.session.query(
-            SalesReturn.date,
-            func.sum(SalesReturn.retail_sale_amount).label(
-                'total_retail_sale'),
-            func.sum(SalesReturn.wholesale_sale_amount).label(
-                'total_wholesale_sale'),
-            func.sum(SalesReturn.return_amount).label('total_return_amount'),
-        ).filter(
-            SalesReturn.date >= start_date,
-            SalesReturn.date <= end_date
-        ).group_by(SalesReturn.date).all()
-
-        # Инициализируем словари для продаж и возвратов
-        sales_returns = {
-            'retail_sale_amount': {},
-            'wholesale_sale_amount': {},
-            'return_amount': {},
-            'net_sales': {},
-            'margin': {}
-        }
-
-        # Заполняем словари данными
-        for row in sales_query:
-            sales_returns['retail_sale_amount'][row.date] = row.total_retail_sale or 0
-            sales_returns['wholesale_sale_amount'][row.date] = row.total_wholesale_sale or 0
-            sales_returns['return_amount'][row.date] = row.total_return_amount or 0
-            sales_returns['net_sales'][row.date] = (
-                row.total_retail_sale or 0) - (row.total_return_amount or 0)
-            sales_returns['margin'][row.date] = (
-                row.total_retail_sale or 0) - (row.total_wholesale_sale or 0)
-
-        # Инициализируем итоговые суммы для продаж и возвратов
-        sales_returns_totals = {
-            'retail_sale_amount': 0,
-            'wholesale_sale_amount': 0,
-            'return_amount': 0,
-            'net_sales': 0,
-            'margin': 0
-        }
-
-        # Вычисляем итоговые суммы
-        for day in days_range:
-            sales_returns_totals['retail_sale_amount'] += sales_returns['retail_sale_amount'].get(
-                day, 0)
-            sales_returns_totals['wholesale_sale_amount'] += sales_returns['wholesale_sale_amount'].get(
-                day, 0)
-            sales_returns_totals['return_amount'] += sales_returns['return_amount'].get(
-                day, 0)
-            sales_returns_totals['net_sales'] += sales_returns['net_sales'].get(
-                day, 0)
-            sales_returns_totals['margin'] += sales_returns['margin'].get(
-                day, 0)
-
-        # 5. Считаем итоговую чистую прибыль
-        net_profit = sales_returns_totals['net_sales'] - \
-            expenses_totals['total_expenses_all']
-
-        # 6. Список магазинов (замените на ваш источник данных)
-        shops = [
-            {"id": 1, "address": "Пр. Строителей 132", "name": "Магазин № 1"},
-            {"id": 2, "address": "Пр. Ленина 66/39", "name": "Магазин № 2"},
-            {"id": 3, "address": "Пр. Строителей, 100", "name": "Магазин № 3"},
-            {"id": 4, "address": "Пр. Строителей", "name": "Магазин № 4"},
-        ]
-
-        # 7. Сумма зарплат из Employee
-        employee_query = db.session.query(
-            func.sum(Employee.total_salary).label('emp_salary_sum')
-        ).filter(
-            Employee.id != None  # Добавьте условия фильтрации, если необходимо
-        ).one()
-        employee_salary_sum = employee_query.emp_salary_sum or 0
-
-        # 8. Передаём всё в шаблон
-        return render_template(
+        if mode == 'shops':
+            tasks['shops'] = lambda: shop_profit_matrix(start_date, end_date, shops)
+
+        started = time.perf_counter()
+        results, timings = run_parallel(
+            tasks, sequential=not app.config['DASHBOARD_PARALLEL'])
+        elapsed = (time.perf_counter() - started) * 1000
+
+        # 4. Время каждого запроса и выигрыш от параллельности (Server-Timing)
+        for name, duration in timings.items():
+            record_timing(f'dash-{name}', duration)
+        record_timing('dash-queries', elapsed,
+                      'parallel' if app.config['DASHBOARD_PARALLEL'] else 'sequential')
+        record_timing('dash-saved', max(sum(timings.values()) - elapsed, 0))
+
+        dashboard = results['series']
+        shop_rows = results.get('shops')
+        employee_salary_sum = results['payroll']
+
+        # 5. Передаём всё в шаблон
+        html = render_template(
             'index.html',
             start_date=start_date_str,
             end_date=end_date_str,
+            mode=mode,
             shops=shops,
-            expenses=expenses,
-            expenses_totals=expenses_totals,
-            sales_returns=sales_returns,
-            sales_returns_totals=sales_returns_totals,
-            net_profit=net_profit,
-            days_range=days_range,
+            shop_rows=shop_rows,
+            days=dashboard.days,
+            series=dashboard.series,
+            totals=dashboard.totals,
+            net_profit=dashboard.net_profit,
             employee_salary_sum=employee_salary_sum,
         )
+        dashboard_cache.store(cache_key, html, cache_generation)
+        return html
 # ОБЩАЯ ТАБЛИЦА ВСЕХ ПОКУПОК
 
     @app.route('/incomes', methods=['GET'])
     @login_required
+    @reporting
     def all_incomes():
         # Фильтрация по месяцу или диапазону дат
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
 
-        if start_date and end_date:
-            incomes = Income.query.filter(
-                Income.date.between(start_date, end_date)).all()
-        elif start_date:
-            incomes = Income.query.filter(Income.date >= start_date).all()
-        elif end_date:
-            incomes = Income.query.filter(Income.date <= end_date).all()
-        else:
-            incomes = Income.query.all()
+        filters = []
+        if start_date:
+            filters.append(Income.date >= start_date)
+        if end_date:
+            filters.append(Income.date <= end_date)
+
+        # Страница по ключу (date, id) и итог отдельным SUM по всему периоду
+        incomes = keyset_page(listing_query(Income, *filters),
+                              Income.date, Income.id,
+                              cursor=request.args.get('after'))
+        total_amount = column_totals(Income, ('amount',), *filters)['amount']
 
-        return render_template('incomes.html', incomes=incomes)
+        return render_template('incomes.html', incomes=incomes,
+                               total_amount=total_amount)
 
 # ОБЩАЯ ТАБЛИЦА ВСЕХ сотрудников
 
     @app.route('/employees', methods=['GET'])
     @login_required
+    @reporting
     def employees():
         # Получаем текущий месяц
         current_month = datetime.now().strftime('%Y-%m')
@@ -333,8 +296,9 @@ def init_routes(app: Flask):
         else:
             order_by = desc(sort_column)
 
-        # Запрос с сортировкой
-        employees_query = Employee.query.filter_by(
+        # Запрос с сортировкой; магазин приходит тем же запросом (JOIN)
+        employees_query = Employee.query.options(
+            joinedload(Employee.shop)).filter_by(
             month=selected_month).order_by(order_by)
         employees = employees_query.all()
 
@@ -467,30 +431,27 @@ def init_routes(app: Flask):
         days = [
             f"{year}-{month:02d}-{day:02d}" for day in range(1, days_in_month + 1)]
 
-        # Получаем рабочие дни из базы
-        workdays = {
-            w.date.strftime('%Y-%m-%d'): w.worked
-            for w in Workday.query.filter_by(employee_id=employee.id)
-            .filter(db.extract('year', Workday.date) == year,
-                    db.extract('month', Workday.date) == month).all()
-        }
-
         if request.method == 'POST':
             submitted_workdays = request.form.getlist('workdays')
-            for day in days:
-                worked = day in submitted_workdays
-                workday = Workday.query.filter_by(
-                    employee_id=employee.id, date=day).first()
-                if not workday:
-                    workday = Workday(employee_id=employee.id, date=day)
-                    db.session.add(workday)
-                workday.worked = worked
-
+            # Весь месяц сохраняется одним INSERT ... ON CONFLICT DO UPDATE
+            upsert(Workday,
+                   workday_rows(employee.id, year, month, submitted_workdays),
+                   index_elements=['employee_id', 'date'],
+                   update_columns=['worked'])
             db.session.commit()
             return redirect(url_for('employee_workdays',
                                     employee_id=employee.id,
                                     month=selected_month))
 
+        # Получаем рабочие дни из базы
+        workdays = {
+            w.date.strftime('%Y-%m-%d'): w.worked
+            for w in Workday.query.filter(
+                Workday.employee_id == employee.id,
+                Workday.date.between(date(year, month, 1),
+                                     date(year, month, days_in_month))).all()
+        }
+
         # ВАЖНО: передаём shop_id в контекст шаблона
         return render_template(
             'employee_workdays.html',
@@ -501,6 +462,49 @@ def init_routes(app: Flask):
             shop_id=shop_id
         )
 
+    @app.route('/shop/<int:shop_id>/workdays', methods=['POST'])
+    @login_required
+    def shop_workdays(shop_id):
+        """
+        Сохраняет календарь рабочих дней всех сотрудников магазина за месяц
+        одним запросом. Отметки приходят в полях workdays_<employee_id>.
+        """
+        if not has_access_to_shop(shop_id):
+            flash('У вас нет доступа к этому магазину.', 'danger')
+            return redirect(url_for('index'))
+
+        selected_month = request.args.get(
+            'month', datetime.now().strftime('%Y-%m'))
+        try:
+            year, month = map(int, selected_month.split('-'))
+            monthrange(year, month)
+        except ValueError:
+            return {"message": "Неверный формат месяца."}, 400
+
+        employee_ids = [
+            employee_id for (employee_id,) in db.session.query(Employee.id)
+            .filter_by(shop_id=shop_id, month=selected_month)
+        ]
+
+        rows = []
+        for employee_id in employee_ids:
+            rows.extend(workday_rows(
+                employee_id, year, month,
+                request.form.getlist(f'workdays_{employee_id}')))
+
+        try:
+            upsert(Workday, rows,
+                   index_elements=['employee_id', 'date'],
+                   update_columns=['worked'])
+            db.session.commit()
+        except Exception:
+            app.logger.exception("Ошибка при сохранении рабочих дней")
+            db.session.rollback()
+            return {"message": "Ошибка при сохранении рабочих дней"}, 500
+
+        return redirect(url_for('shop_employees', shop_id=shop_id,
+                                month=selected_month))
+
     @app.route('/shop/<int:shop_id>/incomes', methods=['GET', 'POST'])
     @login_required
     def shop_incomes(shop_id):
@@ -508,7 +512,7 @@ def init_routes(app: Flask):
         current_date = datetime.now().strftime('%Y-%m-%d')
         if request.method == 'POST':
             data = request.form
-            print("Полученные данные:", data)
+            app.logger.debug("Полученные данные: %s", data)
 
             # Если это добавление новой записи
             if 'new_record' in data:
@@ -541,7 +545,7 @@ def init_routes(app: Flask):
                         operation_type=operation_type,
                         item_name=item_name,
                         employee_id=int(employee_id),
-                        amount=float(amount),
+                        amount=to_money(amount),
                         notes=data.get('new_notes')
                     )
                     db.session.add(new_income)
@@ -561,26 +565,22 @@ def init_routes(app: Flask):
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
 
-        if start_date and end_date:
-            incomes = Income.query.filter(
-                Income.shop_id == shop_id, Income.date.between(start_date, end_date)).all()
-        elif start_date:
-            incomes = Income.query.filter(
-                Income.shop_id == shop_id, Income.date >= start_date).all()
-        elif end_date:
-            incomes = Income.query.filter(
-                Income.shop_id == shop_id, Income.date <= end_date).all()
-        else:
-            incomes = Income.query.filter_by(shop_id=shop_id).all()
+        filters = [Income.shop_id == shop_id]
+        if start_date:
+            filters.append(Income.date >= start_date)
+        if end_date:
+            filters.append(Income.date <= end_date)
+        incomes = listing_query(Income, *filters).order_by(
+            Income.date, Income.id).all()
 
-        # Общая сумма доходов
-        total_amount = sum(income.amount for income in incomes)
+        # Общая сумма доходов — SUM в базе, а не по загруженным объектам
+        total_amount = column_totals(Income, ('amount',), *filters)['amount']
 
         return render_template(
             'shop_incomes.html',
             shop=shop,
             incomes=incomes,
-            employees=Employee.query.filter_by(shop_id=shop_id).all(),
+            employees=employee_choices(shop_id),
             total_amount=total_amount,
             current_date=current_date
         )
@@ -596,11 +596,6 @@ def init_routes(app: Flask):
         end_date = request.args.get(
             'end_date', datetime.now().strftime('%Y-%m-%d'))
 
-        returns = Return.query.filter(
-            Return.shop_id == shop_id,
-            Return.date.between(start_date, end_date)
-        ).all()
-
         if request.method == 'POST':
             data = request.form
             if 'new_record' in data:
@@ -625,7 +620,7 @@ def init_routes(app: Flask):
                         date=date,
                         item_name=item_name,
                         employee_id=int(employee_id),
-                        amount=float(amount),
+                        amount=to_money(amount),
                         notes=notes
                     )
                     db.session.add(new_return)
@@ -638,7 +633,11 @@ def init_routes(app: Flask):
 
                 return redirect(url_for('shop_returns', shop_id=shop_id))
 
-        employees = Employee.query.filter_by(shop_id=shop_id).all()
+        returns = listing_query(
+            Return, Return.shop_id == shop_id,
+            Return.date.between(start_date, end_date)
+        ).order_by(Return.date, Return.id).all()
+        employees = employee_choices(shop_id)
         return render_template(
             'shop_returns.html',
             shop=shop,
@@ -669,6 +668,7 @@ def init_routes(app: Flask):
 
     @app.route('/returns', methods=['GET'])
     @login_required
+    @reporting
     def all_returns():
 
         # Фильтрация по датам
@@ -680,9 +680,11 @@ def init_routes(app: Flask):
         if not end_date:
             end_date = datetime.now().strftime('%Y-%m-%d')  # Текущая дата
 
-        returns = Return.query.filter(
-            Return.date.between(start_date, end_date)).all()
-        total_amount = sum(return_record.amount for return_record in returns)
+        period = Return.date.between(start_date, end_date)
+        returns = keyset_page(listing_query(Return, period),
+                              Return.date, Return.id,
+                              cursor=request.args.get('after'))
+        total_amount = column_totals(Return, ('amount',), period)['amount']
         return render_template('all_returns.html', returns=returns, start_date=start_date, end_date=end_date, total_amount=total_amount)
 
     @app.route('/shop/<int:shop_id>/expenses', methods=['GET', 'POST'])
@@ -696,14 +698,9 @@ def init_routes(app: Flask):
         end_date = request.args.get(
             'end_date', datetime.now().strftime('%Y-%m-%d'))  # Текущая дата
 
-        expenses = Expense.query.filter(
-            Expense.shop_id == shop_id,
-            Expense.date.between(start_date, end_date)
-        ).all()
-
         if request.method == 'POST':
             data = request.form
-            print("Полученные данные:", data)
+            app.logger.debug("Полученные данные: %s", data)
 
             if 'new_record' in data:  # Добавление новой записи
                 try:
@@ -724,7 +721,7 @@ def init_routes(app: Flask):
                         shop_id=shop_id,
                         date=date,
                         category=category,
-                        amount=float(amount),
+                        amount=to_money(amount),
                         notes=notes
                     )
                     db.session.add(new_expense)
@@ -740,7 +737,11 @@ def init_routes(app: Flask):
 
                 return redirect(url_for('shop_expenses', shop_id=shop_id))
 
-        total_amount = sum(expense.amount for expense in expenses)
+        period = (Expense.shop_id == shop_id,
+                  Expense.date.between(start_date, end_date))
+        expenses = listing_query(Expense, *period).order_by(
+            Expense.date, Expense.id).all()
+        total_amount = column_totals(Expense, ('amount',), *period)['amount']
         return render_template(
             'shop_expenses.html',
             shop=shop,
@@ -775,6 +776,7 @@ def init_routes(app: Flask):
 
     @app.route('/expenses', methods=['GET'])
     @login_required
+    @reporting
     def all_expenses():
         # Фильтрация по датам
         start_date = request.args.get('start_date')
@@ -785,11 +787,13 @@ def init_routes(app: Flask):
         if not end_date:
             end_date = datetime.now().strftime('%Y-%m-%d')  # Текущая дата
 
-        expenses = Expense.query.filter(
-            Expense.date.between(start_date, end_date)).all()
+        period = Expense.date.between(start_date, end_date)
+        expenses = keyset_page(listing_query(Expense, period),
+                               Expense.date, Expense.id,
+                               cursor=request.args.get('after'))
 
-        # Рассчитываем общую сумму расходов
-        total_amount = sum(expense.amount for expense in expenses)
+        # Рассчитываем общую сумму расходов за весь период, а не страницу
+        total_amount = column_totals(Expense, ('amount',), period)['amount']
         return render_template(
             'all_expenses.html',
             expenses=expenses,
@@ -837,82 +841,78 @@ def init_routes(app: Flask):
         end_date = request.args.get(
             'end_date', datetime.now().strftime('%Y-%m-%d'))
 
-        # Фильтруем данные по дате
-        records = SalesReturn.query.filter(
-            SalesReturn.shop_id == shop_id,
-            SalesReturn.date.between(start_date, end_date)
-        ).all()
-
         if request.method == 'POST':
             data = request.form
-            print("Полученные данные:", data)  # Логируем входные данные
+            statements_before = statement_count()
             try:
-                for key in data.keys():
-                    if key.startswith('sale_') or key.startswith('is_new_'):
-                        # Пример ключа: sale_0, return_item_0, date_0...
-                        # Индекс -- это часть после "_"
-                        index = key.split('_')[1]
-
-                        sale = data.get(f'sale_{index}')
-                        return_item = data.get(f'return_item_{index}')
-                        date_str = data.get(f'date_{index}')
-                        retail = data.get(f'retail_sale_amount_{index}')
-                        wholesale = data.get(f'wholesale_sale_amount_{index}')
-                        ret = data.get(f'return_amount_{index}')
-                        record_id = data.get(f'id_{index}')
-
-                        # Если все поля в строке пустые — пропускаем
-                        if not any([sale, return_item, retail, wholesale, ret]):
-                            print(
-                                f"Пропущена строка {index}: все поля пустые.")
-                            continue
-
-                        # Если отметка, что это новая запись
-                        if data.get(f'is_new_{index}') == 'true':
-                            new_record = SalesReturn(
-                                shop_id=shop_id,
-                                # Если дата не указана — подставим текущую
-                                date=datetime.strptime(
-                                    date_str, '%Y-%m-%d') if date_str else datetime.utcnow(),
-                                sale=sale or None,
-                                return_item=return_item or None,
-                                retail_sale_amount=float(
-                                    retail) if retail else None,
-                                wholesale_sale_amount=float(
-                                    wholesale) if wholesale else None,
-                                return_amount=float(ret) if ret else None
-                            )
-                            db.session.add(new_record)
-                        # Иначе обновляем существующую запись (если есть ID)
-                        elif record_id:
-                            record = SalesReturn.query.get(int(record_id))
-                            if record:
-                                record.date = (datetime.strptime(date_str, '%Y-%m-%d')
-                                               if date_str else record.date)
-                                record.sale = sale or None
-                                record.return_item = return_item or None
-                                record.retail_sale_amount = float(
-                                    retail) if retail else None
-                                record.wholesale_sale_amount = float(
-                                    wholesale) if wholesale else None
-                                record.return_amount = float(
-                                    ret) if ret else None
+                new_rows = []
+                updated_rows = {}
+                for idx in form_row_indexes(data):
+                    values = parse_sales_return_row(
+                        row_fields(data, idx, SALES_RETURN_FIELDS))
+
+                    # Если все поля в строке пустые — пропускаем
+                    if values is None:
+                        print(f"Пропущена строка {idx}: все поля пустые.")
+                        continue
+
+                    record_id = data.get(f'id_{idx}')
+                    version = data.get(f'version_{idx}')
+                    # Если отметка, что это новая запись
+                    if data.get(f'is_new_{idx}') == 'true':
+                        new_rows.append(values)
+                    # Иначе обновляем существующую запись (если есть ID)
+                    elif record_id:
+                        updated_rows[int(record_id)] = (
+                            int(version) if version else None, values)
+
+                # Существующие записи загружаем одним запросом IN (...)
+                records_by_id = {}
+                if updated_rows:
+                    records_by_id = {
+                        record.id: record for record in SalesReturn.query.filter(
+                            SalesReturn.shop_id == shop_id,
+                            SalesReturn.id.in_(updated_rows.keys()))
+                    }
+
+                changes = []
+                for record_id, (version, values) in updated_rows.items():
+                    record = records_by_id.get(record_id)
+                    if record:
+                        # Если дата не указана — оставляем прежнюю
+                        if values['date'] is None:
+                            values['date'] = record.date
+                        changes.append((record, version, values))
+                # Строки, изменённые другим пользователем, не перезаписываем
+                conflicts = apply_versioned(changes)
+
+                for values in new_rows:
+                    # Если дата не указана — подставим текущую
+                    if values['date'] is None:
+                        values['date'] = datetime.utcnow().date()
+                    db.session.add(SalesReturn(shop_id=shop_id, **values))
 
                 db.session.commit()
-                print("Изменения успешно сохранены.")
             except Exception as e:
                 db.session.rollback()
                 print(f"Ошибка сохранения данных: {e}")
                 return "Ошибка сохранения данных", 500
 
-            return redirect(url_for('shop_sales_returns', shop_id=shop_id))
+            if conflicts:
+                flash(conflict_message(conflicts), 'warning')
+            statements = statement_count() - statements_before
+            print(f"Изменения успешно сохранены. SQL-запросов: {statements}")
+            response = redirect(url_for('shop_sales_returns', shop_id=shop_id))
+            response.headers['X-SQL-Statements'] = str(statements)
+            return response
+
+        # Фильтруем данные по дате
+        period = (SalesReturn.shop_id == shop_id,
+                  SalesReturn.date.between(start_date, end_date))
+        records = SalesReturn.query.filter(*period).all()
 
         # Подсчет итогов
-        totals = {
-            "retail_sale_amount": sum(r.retail_sale_amount or 0 for r in records),
-            "wholesale_sale_amount": sum(r.wholesale_sale_amount or 0 for r in records),
-            "return_amount": sum(r.return_amount or 0 for r in records),
-        }
+        totals = column_totals(SalesReturn, SALES_RETURN_AMOUNT_FIELDS, *period)
 
         return render_template(
             'shop_sales_returns.html',
@@ -935,127 +935,75 @@ def init_routes(app: Flask):
         end_date = request.args.get(
             'end_date', datetime.now().strftime('%Y-%m-%d'))
 
-        # Получаем текущие расходы из базы
-        expenses = ShopExpense.query.filter(
-            ShopExpense.shop_id == shop_id,
-            ShopExpense.date.between(start_date, end_date)
-        ).all()
-
         # Обработка формы (POST)
         if request.method == 'POST':
             data = request.form
-            print("Полученные данные из формы:", data)
-
-            # Собираем все индексы строк, которые пришли в форме
-            # (любое поле, у которого есть суффикс "_число")
-            indexes = set()
-            for field_name in data.keys():
-                if '_' in field_name:
-                    # Разбиваем, берём последний кусок как индекс
-                    prefix, idx = field_name.rsplit('_', 1)
-                    if idx.isdigit():  # Убедимся, что это действительно число
-                        indexes.add(idx)
+            statements_before = statement_count()
 
             try:
-                # Перебираем все индексы (строки), которые нашли
-                for idx in sorted(indexes, key=int):
-                    # Считываем значения из формы
-                    expense_id = data.get(f'id_{idx}')
-                    date_str = data.get(
-                        f'date_{idx}', datetime.utcnow().strftime('%Y-%m-%d'))
-
-                    purchase_desc = data.get(f'purchase_desc_{idx}')
-                    purchase = data.get(f'purchase_{idx}')
-                    store_needs_desc = data.get(f'store_needs_desc_{idx}')
-                    store_needs = data.get(f'store_needs_{idx}')
-                    salary_desc = data.get(f'salary_desc_{idx}')
-                    salary = data.get(f'salary_{idx}')
-                    rent_desc = data.get(f'rent_desc_{idx}')
-                    rent = data.get(f'rent_{idx}')
-                    repair_desc = data.get(f'repair_desc_{idx}')
-                    repair = data.get(f'repair_{idx}')
-                    marketing_desc = data.get(f'marketing_desc_{idx}')
-                    marketing = data.get(f'marketing_{idx}')
-
-                    # Преобразуем суммы в float (если заполнены)
-                    purchase_val = float(purchase) if purchase else None
-                    store_needs_val = float(
-                        store_needs) if store_needs else None
-                    salary_val = float(salary) if salary else None
-                    rent_val = float(rent) if rent else None
-                    repair_val = float(repair) if repair else None
-                    marketing_val = float(marketing) if marketing else None
-
-                    # --- Логика пропуска пустых строк (необязательно) ---
+                new_rows = []
+                updated_rows = {}
+                # Перебираем все строки (индексы), которые пришли в форме
+                for idx in form_row_indexes(data):
+                    values = parse_shop_expense_row(
+                        row_fields(data, idx, SHOP_EXPENSE_FIELDS))
+
                     # Если все поля (и описания, и суммы) пусты, то не сохраняем эту строку
-                    if not any([
-                        purchase_desc, store_needs_desc, salary_desc,
-                        rent_desc, repair_desc, marketing_desc,
-                        purchase_val, store_needs_val, salary_val,
-                        rent_val, repair_val, marketing_val
-                    ]):
+                    if values is None:
                         print(f"Пропущена строка {idx}: нет данных.")
                         continue
 
-                    # Если есть хотя бы что-то, добавляем или обновляем запись
+                    if values['date'] is None:
+                        values['date'] = datetime.utcnow().date()
+
+                    expense_id = data.get(f'id_{idx}')
+                    version = data.get(f'version_{idx}')
                     if expense_id:
-                        # Пытаемся обновить существующую запись
-                        expense = ShopExpense.query.get(expense_id)
-                        if expense:
-                            expense.date = date_str
-                            expense.purchase_desc = purchase_desc or None
-                            expense.purchase = purchase_val
-                            expense.store_needs_desc = store_needs_desc or None
-                            expense.store_needs = store_needs_val
-                            expense.salary_desc = salary_desc or None
-                            expense.salary = salary_val
-                            expense.rent_desc = rent_desc or None
-                            expense.rent = rent_val
-                            expense.repair_desc = repair_desc or None
-                            expense.repair = repair_val
-                            expense.marketing_desc = marketing_desc or None
-                            expense.marketing = marketing_val
+                        updated_rows[int(expense_id)] = (
+                            int(version) if version else None, values)
                     else:
-                        # Создаём новую запись
-                        new_expense = ShopExpense(
-                            shop_id=shop_id,
-                            date=date_str,
-                            purchase_desc=purchase_desc or None,
-                            purchase=purchase_val,
-                            store_needs_desc=store_needs_desc or None,
-                            store_needs=store_needs_val,
-                            salary_desc=salary_desc or None,
-                            salary=salary_val,
-                            rent_desc=rent_desc or None,
-                            rent=rent_val,
-                            repair_desc=repair_desc or None,
-                            repair=repair_val,
-                            marketing_desc=marketing_desc or None,
-                            marketing=marketing_val
-                        )
-                        db.session.add(new_expense)
+                        new_rows.append(values)
+
+                # Существующие записи загружаем одним запросом IN (...)
+                # и обновляем только те, что действительно изменились;
+                # строки, изменённые другим пользователем, не перезаписываем
+                conflicts = []
+                if updated_rows:
+                    conflicts = apply_versioned([
+                        (expense,) + updated_rows[expense.id]
+                        for expense in ShopExpense.query.filter(
+                            ShopExpense.shop_id == shop_id,
+                            ShopExpense.id.in_(updated_rows.keys()))])
+
+                # Создаём новые записи
+                for values in new_rows:
+                    db.session.add(ShopExpense(shop_id=shop_id, **values))
 
                 # Сохраняем все изменения
                 db.session.commit()
-                print("Изменения сохранены успешно!")
 
             except Exception as e:
                 db.session.rollback()
                 print(f"Ошибка сохранения данных: {e}")
                 return "Ошибка сохранения данных", 500
 
+            if conflicts:
+                flash(conflict_message(conflicts), 'warning')
+            statements = statement_count() - statements_before
+            print(f"Изменения сохранены успешно! SQL-запросов: {statements}")
+
             # После POST-запроса делаем редирект, чтобы избежать повторной отправки формы
-            return redirect(url_for('shop_expenses_table', shop_id=shop_id))
+            response = redirect(url_for('shop_expenses_table', shop_id=shop_id))
+            response.headers['X-SQL-Statements'] = str(statements)
+            return response
+
+        # Получаем текущие расходы из базы
+        period = (ShopExpense.shop_id == shop_id,
+                  ShopExpense.date.between(start_date, end_date))
+        expenses = ShopExpense.query.filter(*period).all()
 
         # Если это просто GET, считаем итоги
-        totals = {
-            "purchase": sum(e.purchase or 0 for e in expenses),
-            "store_needs": sum(e.store_needs or 0 for e in expenses),
-            "salary": sum(e.salary or 0 for e in expenses),
-            "rent": sum(e.rent or 0 for e in expenses),
-            "repair": sum(e.repair or 0 for e in expenses),
-            "marketing": sum(e.marketing or 0 for e in expenses),
-        }
+        totals = column_totals(ShopExpense, SHOP_EXPENSE_CATEGORIES, *period)
 
         return render_template(
             'shop_expenses_table.html',
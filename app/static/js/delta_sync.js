@@ -0,0 +1,205 @@
+/*
+ * Инкрементальное сохранение табличных форм (продажи/возвраты, расходы).
+ *
+ * Форма с атрибутом data-delta-url отправляется не целиком: при сохранении
+ * собираются только добавленные строки, изменённые (значения отличаются от
+ * снимка при загрузке) и удалённые, и уходят JSON-запросом в
+ * POST /api/shops/<id>/<таблица>/delta. Ответ содержит id и версии строк,
+ * конфликты версий и итоги за период — страница обновляется без
+ * перезагрузки. Строки, которые тем временем изменил или удалил другой
+ * пользователь, не сохраняются; об этом сообщается списком.
+ *
+ * Разметка: существующие строки — <tr data-id data-version>, поля строки —
+ * <input name="<поле>_<N>">, итоги — элементы с data-total="<колонка>"
+ * (data-total="income" — доход: розница − закупка − возвраты).
+ */
+(function () {
+    const FIELD_NAME = /^(.*)_(\d+)$/;
+    const SERVICE_FIELDS = ['id', 'version', 'is_new'];
+
+    let form = null;
+    let deleted = [];
+    const snapshots = new WeakMap();
+
+    // Поля строки: {имя: значение} и номер строки из имён input
+    function rowFields(row) {
+        const values = {};
+        let index = null;
+        row.querySelectorAll('input[name]').forEach(input => {
+            const match = FIELD_NAME.exec(input.name);
+            if (!match || SERVICE_FIELDS.includes(match[1])) {
+                return;
+            }
+            values[match[1]] = input.value;
+            index = match[2];
+        });
+        return { values, index };
+    }
+
+    function snapshot(row) {
+        snapshots.set(row, JSON.stringify(rowFields(row).values));
+    }
+
+    function collectDelta() {
+        const delta = {
+            added: [],
+            changed: [],
+            deleted: deleted,
+            start_date: form.dataset.startDate,
+            end_date: form.dataset.endDate,
+        };
+        form.querySelectorAll('tbody tr').forEach(row => {
+            const { values, index } = rowFields(row);
+            if (!row.dataset.id) {
+                delta.added.push(Object.assign({ key: index }, values));
+            } else if (JSON.stringify(values) !== snapshots.get(row)) {
+                delta.changed.push(Object.assign({
+                    id: Number(row.dataset.id),
+                    version: Number(row.dataset.version),
+                }, values));
+            }
+        });
+        return delta;
+    }
+
+    function hiddenInput(name, value) {
+        const input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = name;
+        input.value = value;
+        return input;
+    }
+
+    function setVersion(row, version) {
+        row.dataset.version = version;
+        const input = row.querySelector('input[name^="version_"]');
+        if (input) {
+            input.value = version;
+        }
+    }
+
+    // Новая строка получила id: переносим его в разметку строки
+    function markSaved(row, id, version) {
+        const { index } = rowFields(row);
+        row.dataset.id = id;
+        row.dataset.version = version;
+        row.querySelectorAll('input[name^="is_new_"], input[name^="id_"]')
+            .forEach(input => input.remove());
+        const cell = row.cells[0];
+        cell.textContent = id;
+        cell.appendChild(hiddenInput('id_' + index, id));
+        cell.appendChild(hiddenInput('version_' + index, version));
+    }
+
+    function toCents(value) {
+        return Math.round(parseFloat(value || '0') * 100);
+    }
+
+    function showTotals(totals) {
+        document.querySelectorAll('[data-total]').forEach(element => {
+            const name = element.dataset.total;
+            if (name === 'income') {
+                const cents = toCents(totals.retail_sale_amount)
+                    - toCents(totals.wholesale_sale_amount)
+                    - toCents(totals.return_amount);
+                element.textContent = (cents / 100).toFixed(2);
+            } else if (name in totals) {
+                element.textContent = totals[name];
+            }
+        });
+    }
+
+    function applyResult(result) {
+        const rows = Array.from(form.querySelectorAll('tbody tr'));
+        const byKey = {};
+        rows.forEach(row => {
+            if (!row.dataset.id) {
+                byKey[rowFields(row).index] = row;
+            }
+        });
+        result.added.forEach(item => {
+            if (byKey[item.key]) {
+                markSaved(byKey[item.key], item.id, item.version);
+            }
+        });
+        result.changed.forEach(item => {
+            const row = form.querySelector(`tbody tr[data-id="${item.id}"]`);
+            if (row) {
+                setVersion(row, item.version);
+            }
+        });
+        // Конфликтные строки не снимаем заново — они остаются изменёнными
+        const rejected = new Set(result.conflicts.map(item => String(item.id)));
+        deleted = [];
+        form.querySelectorAll('tbody tr[data-id]').forEach(row => {
+            if (!rejected.has(row.dataset.id)) {
+                snapshot(row);
+            }
+        });
+        showTotals(result.totals);
+        if (result.conflicts.length) {
+            reportConflicts(result.conflicts);
+        }
+    }
+
+    function reportConflicts(conflicts) {
+        const lines = conflicts.map(item => item.reason === 'deleted'
+            ? `строка ${item.id} удалена`
+            : `строка ${item.id} изменена (версия ${item.version})`);
+        const message = 'Эти строки изменил другой пользователь, ваши правки '
+            + 'в них не сохранены (остальные изменения сохранены):';
+        if (confirm(`${message}\n\n${lines.join('\n')}\n\nОбновить страницу?`)) {
+            window.location.reload();
+        }
+    }
+
+    function save(event) {
+        event.preventDefault();
+        const delta = collectDelta();
+        if (!delta.added.length && !delta.changed.length && !delta.deleted.length) {
+            return;
+        }
+        fetch(form.dataset.deltaUrl, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(delta),
+        })
+            .then(response => response.json().then(body => ({ response, body })))
+            .then(({ response, body }) => {
+                if (response.ok) {
+                    applyResult(body);
+                } else {
+                    alert('Ошибка сохранения: ' + (body.message || response.status));
+                }
+            })
+            .catch(error => {
+                console.error('Ошибка сохранения:', error);
+                alert('Ошибка сохранения: ' + error);
+            });
+    }
+
+    // Кнопка «Удалить»: новая строка просто убирается, сохранённая —
+    // попадает в список удалённых и удаляется при сохранении
+    window.deltaDeleteRow = function (button) {
+        const row = button.closest('tr');
+        if (row.dataset.id) {
+            if (!confirm(`Удалить запись с ID ${row.dataset.id}?`)) {
+                return;
+            }
+            deleted.push({
+                id: Number(row.dataset.id),
+                version: Number(row.dataset.version),
+            });
+        }
+        row.remove();
+    };
+
+    document.addEventListener('DOMContentLoaded', () => {
+        form = document.querySelector('form[data-delta-url]');
+        if (!form) {
+            return;
+        }
+        form.querySelectorAll('tbody tr[data-id]').forEach(snapshot);
+        form.addEventListener('submit', save);
+    });
+})();
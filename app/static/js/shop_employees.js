@@ -0,0 +1,4 @@
+// Функция для автоматической отправки формы при изменении месяца
+function applyMonthSelection() {
+    document.getElementById('monthForm').submit();
+}
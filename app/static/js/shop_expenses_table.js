@@ -0,0 +1,34 @@
+function addRow() {
+    const tableBody = document.getElementById('expenses-table-body');
+    const rowCountInput = document.getElementById('row_count');
+
+    let currentCount = parseInt(rowCountInput.value, 10);
+    let newIndex = currentCount;
+    rowCountInput.value = currentCount + 1;
+
+    const today = new Date().toISOString().split('T')[0];
+    const newRow = document.createElement('tr');
+    newRow.innerHTML = `
+        <td>
+            — 
+            <input type="hidden" name="id_${newIndex}" value="">
+        </td>
+        <td><input type="date" name="date_${newIndex}" value="${today}"></td>
+        <td><input type="text" name="purchase_desc_${newIndex}" placeholder="Описание закупки"></td>
+        <td><input type="number" name="purchase_${newIndex}" placeholder="Сумма закупки"></td>
+        <td><input type="text" name="store_needs_desc_${newIndex}" placeholder="Описание нужд магазина"></td>
+        <td><input type="number" name="store_needs_${newIndex}" placeholder="Сумма нужд магазина"></td>
+        <td><input type="text" name="salary_desc_${newIndex}" placeholder="Описание зарплаты"></td>
+        <td><input type="number" name="salary_${newIndex}" placeholder="Сумма зарплаты"></td>
+        <td><input type="text" name="rent_desc_${newIndex}" placeholder="Описание аренды"></td>
+        <td><input type="number" name="rent_${newIndex}" placeholder="Сумма аренды"></td>
+        <td><input type="text" name="repair_desc_${newIndex}" placeholder="Описание ремонта"></td>
+        <td><input type="number" name="repair_${newIndex}" placeholder="Сумма ремонта"></td>
+        <td><input type="text" name="marketing_desc_${newIndex}" placeholder="Описание маркетинга"></td>
+        <td><input type="number" name="marketing_${newIndex}" placeholder="Сумма маркетинга"></td>
+        <td>
+            <button type="button" style="background-color: red; color: white;" onclick="deltaDeleteRow(this)">Удалить</button>
+        </td>
+    `;
+    tableBody.appendChild(newRow);
+}
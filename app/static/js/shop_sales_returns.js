@@ -0,0 +1,53 @@
+// Номер следующей строки: не совпадает с номерами уже удалённых
+let nextRowIndex = null;
+
+// Наибольший суффикс "_N" полей таблицы + 1: после удаления строки число
+// строк меньше наибольшего номера, и номер занятой строки повторился бы
+function firstFreeRowIndex(tableBody) {
+    let highest = -1;
+    tableBody.querySelectorAll('[name]').forEach((field) => {
+        const match = /_(\d+)$/.exec(field.name);
+        if (match) {
+            highest = Math.max(highest, Number(match[1]));
+        }
+    });
+    return highest + 1;
+}
+
+// Добавление новой строки (без ID)
+function addRow() {
+    const tableBody = document.getElementById('sales-returns-table-body');
+    if (nextRowIndex === null) {
+        nextRowIndex = firstFreeRowIndex(tableBody);
+    }
+    const newRowIndex = nextRowIndex++;
+    const today = new Date().toISOString().split('T')[0];
+
+    const newRow = document.createElement('tr');
+    newRow.innerHTML = `
+        <td>—</td>
+        <td>
+            <input type="date" name="date_${newRowIndex}" value="${today}">
+        </td>
+        <td>
+            <input type="text" name="sale_${newRowIndex}" placeholder="Наименование">
+        </td>
+        <td>
+            <input type="text" name="return_item_${newRowIndex}" placeholder="Наименование">
+        </td>
+        <td>
+            <input type="number" step="0.01" name="retail_sale_amount_${newRowIndex}" placeholder="Сумма продаж в розницу">
+        </td>
+        <td>
+            <input type="number" step="0.01" name="wholesale_sale_amount_${newRowIndex}" placeholder="Сумма продаж по закупке">
+        </td>
+        <td>
+            <input type="number" step="0.01" name="return_amount_${newRowIndex}" placeholder="Сумма возвратов">
+        </td>
+        <td>
+            <button type="button" style="background-color: red; color: white;" onclick="deltaDeleteRow(this)">Удалить</button>
+        </td>
+        <input type="hidden" name="is_new_${newRowIndex}" value="true">
+    `;
+    tableBody.appendChild(newRow);
+}
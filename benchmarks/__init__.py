@@ -0,0 +1,7 @@
+"""
+Нагрузочные замеры приложения.
+
+Скрипты запускаются как модули из корня репозитория, например
+`python -m benchmarks.indexes`, и работают с базой из DATABASE_URL.
+Не запускайте их на рабочей базе: они наполняют её синтетическими данными.
+"""
@@ -0,0 +1,89 @@
+"""
+Замер главной страницы для периодов в 7, 90 и 365 дней.
+
+    python -m benchmarks.dashboard --rows 1000000
+
+Для каждого периода измеряется полный ответ маршрута index (кэш главной
+страницы выключен) с параллельными и последовательными запросами
+(DASHBOARD_PARALLEL), а отдельно — запрос рядов и итогов (dashboard_series).
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import timedelta
+
+from app import create_app, db
+from app.dashboard import dashboard_series
+from benchmarks.indexes import measure
+from benchmarks.seed import (BENCH_PASSWORD, BENCH_USER, default_period,
+                             row_count, seed)
+
+PERIODS = (7, 90, 365)
+
+
+def measure_query(start_date, end_date, repeat):
+    """Медиана времени dashboard_series (мс)."""
+    dashboard_series(start_date, end_date)  # прогрев
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        dashboard_series(start_date, end_date)
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', action='store_true',
+                        help='вывести результат в JSON')
+    args = parser.parse_args()
+
+    # Кэш главной страницы выключен до create_app: у общего хранилища
+    # (SharedBackend) TTL задаётся только при создании
+    os.environ['DASHBOARD_CACHE_TTL'] = '0'
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        start, end = default_period(args.years)
+        if row_count() == 0:
+            seed(args.rows, start, end)
+        else:
+            print("База уже содержит данные — наполнение пропущено.")
+
+        urls = {
+            days: f'/?start_date={end - timedelta(days=days - 1)}&end_date={end}'
+            for days in PERIODS
+        }
+        client = app.test_client()
+        client.post('/login', data={'username': BENCH_USER,
+                                    'password': BENCH_PASSWORD})
+        pages = measure(client, urls, args.repeat)
+        app.config['DASHBOARD_PARALLEL'] = False
+        sequential = measure(client, urls, args.repeat)
+
+        report = {}
+        for days in PERIODS:
+            report[days] = dict(
+                pages[days],
+                sequential_ms=sequential[days]['median_ms'],
+                query_ms=measure_query(end - timedelta(days=days - 1), end,
+                                       args.repeat))
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'период, дн.':<14}{'страница, мс':>14}{'p95, мс':>10}"
+          f"{'по очереди, мс':>16}{'запрос, мс':>12}")
+    for days, item in report.items():
+        print(f"{days:<14}{item['median_ms']:>14}{item['p95_ms']:>10}"
+              f"{item['sequential_ms']:>16}{item['query_ms']:>12}")
+
+
+if __name__ == '__main__':
+    main()
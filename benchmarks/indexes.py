@@ -0,0 +1,136 @@
+"""
+Замер списков по магазину до и после миграции с индексами (shop_id, date).
+
+    python -m benchmarks.indexes --rows 1000000
+
+Скрипт наполняет пустую базу из DATABASE_URL, снимает индексы
+(downgrade миграции 3f88356f1046), замеряет маршруты, накатывает
+индексы обратно (upgrade) и замеряет ещё раз.
+"""
+import argparse
+import importlib.util
+import json
+import statistics
+import time
+from pathlib import Path
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from app import create_app, db
+from benchmarks.seed import (BENCH_PASSWORD, BENCH_USER, default_period,
+                             row_count, seed)
+
+MIGRATION = (Path(__file__).resolve().parent.parent / 'migrations' / 'versions'
+             / '3f88356f1046_add_shop_date_indexes.py')
+
+LISTING_ROUTES = [
+    'shop_incomes',
+    'shop_returns',
+    'shop_expenses',
+    'shop_sales_returns',
+    'shop_expenses_table',
+]
+
+
+def _load_migration():
+    spec = importlib.util.spec_from_file_location('index_migration', MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_migration(step):
+    """Выполняет upgrade/downgrade миграции с индексами на текущей базе."""
+    migration = _load_migration()
+    # Индексы, которые следующие миграции заменили (например, уникальным
+    # ограничением на workday), в текущей схеме уже не существуют
+    declared = {index.name for table in db.metadata.tables.values()
+                for index in table.indexes}
+    migration.INDEXES = [item for item in migration.INDEXES
+                         if item[1] in declared]
+    with db.engine.begin() as connection:
+        context = MigrationContext.configure(connection)
+        with Operations.context(context):
+            getattr(migration, step)()
+
+
+def measure(client, urls, repeat):
+    """Медиана и p95 времени ответа (мс) для каждого URL."""
+    results = {}
+    for name, url in urls.items():
+        client.get(url)  # прогрев
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results[name] = {
+            'status': response.status_code,
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--shop-id', type=int, default=1)
+    parser.add_argument('--json', action='store_true',
+                        help='вывести результат в JSON')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if row_count() == 0:
+            start, end = default_period(args.years)
+            seed(args.rows, start, end)
+        else:
+            start, end = default_period(args.years)
+            print("База уже содержит данные — наполнение пропущено.")
+
+        # Месяц в середине истории — типичный фильтр на страницах магазина
+        middle = start + (end - start) / 2
+        month_start = middle.replace(day=1)
+        month_end = month_start.replace(day=28)
+        query = f'?start_date={month_start}&end_date={month_end}'
+        with app.test_request_context():
+            from flask import url_for
+            urls = {name: url_for(name, shop_id=args.shop_id) + query
+                    for name in LISTING_ROUTES}
+
+        client = app.test_client()
+        client.post('/login', data={'username': BENCH_USER,
+                                    'password': BENCH_PASSWORD})
+
+        run_migration('downgrade')
+        before = measure(client, urls, args.repeat)
+        run_migration('upgrade')
+        after = measure(client, urls, args.repeat)
+
+    report = {
+        name: {
+            'before': before[name],
+            'after': after[name],
+            'speedup': round(before[name]['median_ms'] /
+                             max(after[name]['median_ms'], 0.001), 1),
+        }
+        for name in LISTING_ROUTES
+    }
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'маршрут':<22}{'до, мс':>10}{'после, мс':>12}{'ускорение':>12}")
+    for name, item in report.items():
+        print(f"{name:<22}{item['before']['median_ms']:>10}"
+              f"{item['after']['median_ms']:>12}{item['speedup']:>11}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,474 @@
+"""
+Нагрузочный прогон против запущенного сервера: директора магазинов
+правят таблицы в конце месяца, владелец обновляет дашборд.
+
+    python -m benchmarks.load --setup            # пользователи для прогона
+    flask --app main run --port 5000 --with-threads   # в другом терминале
+    python -m benchmarks.load --url http://127.0.0.1:5000 --rps 20 --duration 60
+
+Каждый директор (shop_manager своего магазина) и администратор входят
+под своей сессией. Запросы отправляются с постоянной частотой --rps
+(открытая модель: новые запросы не ждут медленных) в смеси MIX:
+GET таблиц расходов и продаж, их сохранение и главная страница / JSON
+дашборда у администратора. Сохранение идёт, как его делает страница
+(static/delta_sync.js): в POST /api/shops/<id>/<таблица>/delta уходят
+только новые строки и строки с изменёнными суммами вместе с версиями,
+прочитанными со страницы, — каждая изменённая строка записывается одним
+UPDATE с проверкой версии. С --full-form вместо этого отправляется форма целиком.
+
+Отчёт: пропускная способность, доля ошибок, гистограммы задержек по
+сценариям и ожидания блокировок в базе. Блокировки снимаются отдельным
+соединением к той же базе (DATABASE_URL): в PostgreSQL — число
+негрантованных блокировок в pg_locks и прирост deadlocks, в SQLite —
+доля замеров, когда файл базы был занят пишущей транзакцией.
+Сервер и база — локальные; скрипт использует только стандартную
+библиотеку и SQLAlchemy.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from html.parser import HTMLParser
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from sqlalchemy import create_engine, text
+
+LOAD_PASSWORD = 'load-test'
+ADMIN_USER = 'load_admin'
+
+# Сценарий -> (кто выполняет, вес в смеси)
+MIX = {
+    'expenses_table_get': ('manager', 25),
+    'expenses_table_save': ('manager', 15),
+    'sales_returns_get': ('manager', 25),
+    'sales_returns_save': ('manager', 15),
+    'dashboard': ('admin', 12),
+    'api_dashboard': ('admin', 8),
+}
+
+# Границы корзин гистограммы задержек, мс
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Сколько новых строк добавляет одно сохранение и какую долю сумм правит
+NEW_ROWS = 5
+EDIT_SHARE = 0.2
+TIMEOUT = 30
+# Поля сумм в формах таблиц (как SHOP_EXPENSE_CATEGORIES и
+# SALES_RETURN_AMOUNT_FIELDS в app.forms)
+AMOUNT_FIELDS = {'purchase', 'store_needs', 'salary', 'rent', 'repair',
+                 'marketing', 'retail_sale_amount', 'wholesale_sale_amount',
+                 'return_amount'}
+
+
+def manager_name(shop_id):
+    return f'load_manager_{shop_id}'
+
+
+def setup_users(shop_count):
+    """Магазины, директора и администратор прогона в базе DATABASE_URL."""
+    from app import create_app, db
+    from app.models import Shop, User, bcrypt
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        password_hash = bcrypt.generate_password_hash(LOAD_PASSWORD).decode('utf-8')
+        accounts = [(manager_name(shop_id), 'shop_manager', shop_id)
+                    for shop_id in range(1, shop_count + 1)]
+        accounts.append((ADMIN_USER, 'admin', None))
+        for shop_id in range(1, shop_count + 1):
+            if not db.session.get(Shop, shop_id):
+                db.session.add(Shop(id=shop_id, name=f'Магазин № {shop_id}',
+                                    location=''))
+        for username, access_level, shop_id in accounts:
+            if not User.query.filter_by(username=username).first():
+                db.session.add(User(username=username, password_hash=password_hash,
+                                    access_level=access_level, shop_id=shop_id))
+        db.session.commit()
+        print(f"Пользователи прогона: {', '.join(name for name, _, _ in accounts)}"
+              f" (пароль {LOAD_PASSWORD})")
+
+
+class PostFormParser(HTMLParser):
+    """Поля <input> первой формы method=POST на странице."""
+
+    def __init__(self):
+        super().__init__()
+        self.fields = []
+        self._in_form = False
+        self._done = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form' and not self._done:
+            self._in_form = (attrs.get('method') or '').upper() == 'POST'
+        elif tag == 'input' and self._in_form and attrs.get('name'):
+            if attrs.get('type') not in ('submit', 'button'):
+                self.fields.append((attrs['name'], attrs.get('value') or ''))
+
+    def handle_endtag(self, tag):
+        if tag == 'form' and self._in_form:
+            self._in_form = False
+            self._done = True
+
+
+class Session:
+    """Пользователь с собственными cookie."""
+
+    def __init__(self, base_url, username, shop_id=None):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.shop_id = shop_id
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()))
+
+    def request(self, path, data=None, payload=None):
+        """
+        (статус, тело) ответа; ошибки HTTP возвращаются как статус.
+        data — поля формы, payload — тело JSON.
+        """
+        body, headers = None, {}
+        if data is not None:
+            body = urlencode(data).encode('utf-8')
+        elif payload is not None:
+            body = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        try:
+            with self.opener.open(Request(self.base_url + path, body, headers),
+                                  timeout=TIMEOUT) as response:
+                return response.status, response.read()
+        except HTTPError as error:
+            return error.code, error.read()
+
+    def login(self):
+        status, body = self.request('/login', {'username': self.username,
+                                               'password': LOAD_PASSWORD})
+        # После входа сервер перенаправляет на главную; неудача — снова форма входа
+        if status != 200 or 'name="password"'.encode() in body:
+            raise RuntimeError(f"Не удалось войти как {self.username}")
+
+
+def _month_period():
+    today = date.today()
+    return {'start_date': today.replace(day=1).isoformat(),
+            'end_date': today.isoformat()}
+
+
+def _edited_form(html, rng, new_row):
+    """Поля формы страницы с правкой части сумм и NEW_ROWS новыми строками."""
+    parser = PostFormParser()
+    parser.feed(html.decode('utf-8', errors='replace'))
+    data = dict(parser.fields)
+    indexes = {int(name.rsplit('_', 1)[1]) for name in data
+               if name.rsplit('_', 1)[-1].isdigit()}
+    for name, value in data.items():
+        if value and name.rsplit('_', 1)[0] in AMOUNT_FIELDS \
+                and rng.random() < EDIT_SHARE:
+            data[name] = f'{rng.uniform(100, 50000):.2f}'
+
+    start = max(indexes, default=-1) + 1
+    for idx in range(start, start + NEW_ROWS):
+        for name, value in new_row(rng).items():
+            data[f'{name}_{idx}'] = value
+    data['row_count'] = str(start + NEW_ROWS)
+    return data
+
+
+def _form_rows(html):
+    """Строки таблицы страницы: {индекс: {поле: значение}} из полей формы."""
+    parser = PostFormParser()
+    parser.feed(html.decode('utf-8', errors='replace'))
+    rows = {}
+    for name, value in parser.fields:
+        field, _, index = name.rpartition('_')
+        if field and index.isdigit():
+            rows.setdefault(int(index), {})[field] = value
+    return rows
+
+
+def _edited_delta(html, rng, new_row):
+    """
+    Тело запроса delta: строки страницы с правкой части сумм (с их id и
+    версиями со страницы) и NEW_ROWS новых строк.
+    """
+    changed = []
+    for values in _form_rows(html).values():
+        if not values.get('id'):
+            continue
+        edited = {name: f'{rng.uniform(100, 50000):.2f}' for name, value
+                  in values.items()
+                  if value and name in AMOUNT_FIELDS and rng.random() < EDIT_SHARE}
+        if edited:
+            changed.append(dict(values, **edited))
+    added = [dict(new_row(rng), key=f'n{number}') for number in range(NEW_ROWS)]
+    return dict(_month_period(), added=added, changed=changed, deleted=[])
+
+
+def _new_expense_row(rng):
+    return {'date': date.today().isoformat(), 'purchase_desc': 'Закупка',
+            'purchase': f'{rng.uniform(1000, 50000):.2f}',
+            'store_needs': f'{rng.uniform(0, 2000):.2f}'}
+
+
+def _new_sales_row(rng):
+    retail = rng.uniform(1000, 100000)
+    return {'date': date.today().isoformat(), 'sale': 'Продажа',
+            'retail_sale_amount': f'{retail:.2f}',
+            'wholesale_sale_amount': f'{retail * rng.uniform(0.5, 0.8):.2f}',
+            'return_amount': f'{rng.uniform(0, 2000):.2f}', 'is_new': 'true'}
+
+
+def _save(session, page, new_row, rng, full_form=False):
+    path = f'/shop/{session.shop_id}/{page}?' + urlencode(_month_period())
+    status, html = session.request(path)
+    if status != 200:
+        return status
+    if full_form:
+        status, _ = session.request(f'/shop/{session.shop_id}/{page}',
+                                    _edited_form(html, rng, new_row))
+    else:
+        status, _ = session.request(
+            f'/api/shops/{session.shop_id}/{page}/delta',
+            payload=_edited_delta(html, rng, new_row))
+    return status
+
+
+def run_scenario(name, session, rng, full_form=False):
+    """
+    Выполняет сценарий и возвращает код ответа (последнего запроса).
+    full_form — сохранять таблицы отправкой формы целиком, а не delta.
+    """
+    period = urlencode(_month_period())
+    if name == 'expenses_table_get':
+        return session.request(f'/shop/{session.shop_id}/expenses_table?{period}')[0]
+    if name == 'sales_returns_get':
+        return session.request(f'/shop/{session.shop_id}/sales_returns?{period}')[0]
+    if name == 'expenses_table_save':
+        return _save(session, 'expenses_table', _new_expense_row, rng, full_form)
+    if name == 'sales_returns_save':
+        return _save(session, 'sales_returns', _new_sales_row, rng, full_form)
+    if name == 'dashboard':
+        return session.request(f'/?{period}&mode=shops')[0]
+    if name == 'api_dashboard':
+        return session.request(f'/api/dashboard?{period}')[0]
+    raise ValueError(name)
+
+
+class LockSampler(threading.Thread):
+    """Периодически замеряет ожидания блокировок в базе."""
+
+    def __init__(self, database_url, interval=0.25):
+        super().__init__(daemon=True)
+        self.engine = create_engine(database_url)
+        self.dialect = self.engine.dialect.name
+        self.interval = interval
+        self.samples = []
+        self.deadlocks = None
+        self._stop_event = threading.Event()
+
+    def _deadlocks(self, connection):
+        return connection.execute(text(
+            "SELECT deadlocks FROM pg_stat_database "
+            "WHERE datname = current_database()")).scalar()
+
+    def _sample(self, connection):
+        if self.dialect == 'postgresql':
+            return connection.execute(text(
+                "SELECT count(*) FROM pg_locks WHERE NOT granted")).scalar()
+        if self.dialect == 'sqlite':
+            # Занята ли база пишущей транзакцией: BEGIN IMMEDIATE без ожидания
+            raw = connection.connection.driver_connection
+            try:
+                raw.execute('BEGIN IMMEDIATE')
+                raw.execute('ROLLBACK')
+                return 0
+            except Exception:
+                return 1
+        return 0
+
+    def run(self):
+        with self.engine.connect() as connection:
+            if self.dialect == 'sqlite':
+                connection.connection.driver_connection.execute(
+                    'PRAGMA busy_timeout = 0')
+            if self.dialect == 'postgresql':
+                started = self._deadlocks(connection)
+                connection.commit()
+            while not self._stop_event.is_set():
+                self.samples.append(self._sample(connection))
+                connection.commit()
+                self._stop_event.wait(self.interval)
+            if self.dialect == 'postgresql':
+                self.deadlocks = self._deadlocks(connection) - started
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.engine.dispose()
+
+    def report(self):
+        samples = self.samples or [0]
+        if self.dialect == 'sqlite':
+            return {'dialect': 'sqlite', 'samples': len(self.samples),
+                    'write_lock_held_share': round(sum(samples) / len(samples), 3)}
+        return {'dialect': self.dialect, 'samples': len(self.samples),
+                'waiting_locks_max': max(samples),
+                'waiting_locks_mean': round(statistics.mean(samples), 2),
+                'deadlocks': self.deadlocks}
+
+
+def histogram(latencies):
+    counts = Counter()
+    for value in latencies:
+        bucket = next((f'<={edge}' for edge in BUCKETS_MS if value <= edge),
+                      f'>{BUCKETS_MS[-1]}')
+        counts[bucket] += 1
+    order = [f'<={edge}' for edge in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}']
+    return {bucket: counts[bucket] for bucket in order if counts[bucket]}
+
+
+def summarize(results, elapsed, late):
+    """results: [(сценарий, статус, мс)]."""
+    by_scenario = defaultdict(list)
+    for name, status, duration in results:
+        by_scenario[name].append((status, duration))
+
+    def stats(items):
+        latencies = sorted(duration for _, duration in items)
+        errors = sum(1 for status, _ in items if status is None or status >= 400)
+        return {
+            'requests': len(items),
+            'errors': errors,
+            'error_rate': round(errors / len(items), 4) if items else 0,
+            'p50_ms': round(statistics.median(latencies), 1) if latencies else None,
+            'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 1)
+            if latencies else None,
+            'max_ms': round(latencies[-1], 1) if latencies else None,
+            'histogram_ms': histogram(latencies),
+            'statuses': dict(Counter(str(status) for status, _ in items)),
+        }
+
+    total = stats([item for items in by_scenario.values() for item in items])
+    total['throughput_rps'] = round(len(results) / elapsed, 2) if elapsed else 0
+    total['late_dispatches'] = late
+    return {'total': total,
+            'scenarios': {name: stats(items)
+                          for name, items in sorted(by_scenario.items())}}
+
+
+def print_report(report):
+    total = report['total']
+    print(f"Запросов: {total['requests']} за {report['elapsed_s']} с, "
+          f"{total['throughput_rps']} в секунду (цель {report['target_rps']}), "
+          f"ошибок {total['error_rate']:.1%}, с опозданием {total['late_dispatches']}")
+    print(f"Блокировки: {json.dumps(report['locks'], ensure_ascii=False)}")
+    print(f"{'сценарий':<22}{'запросов':>10}{'ошибок':>8}{'p50, мс':>10}"
+          f"{'p95, мс':>10}{'max, мс':>10}")
+    for name, item in report['scenarios'].items():
+        print(f"{name:<22}{item['requests']:>10}{item['errors']:>8}"
+              f"{item['p50_ms']:>10}{item['p95_ms']:>10}{item['max_ms']:>10}")
+    print("Гистограмма задержек (все запросы):")
+    widest = max(total['histogram_ms'].values(), default=1)
+    for bucket, count in total['histogram_ms'].items():
+        print(f"  {bucket + ' мс':<12}{count:>7} {'#' * max(1, 50 * count // widest)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--rps', type=float, default=20)
+    parser.add_argument('--duration', type=float, default=60, help='секунд')
+    parser.add_argument('--shops', type=int, default=4,
+                        help='число директоров магазинов')
+    parser.add_argument('--concurrency', type=int, default=32,
+                        help='максимум одновременных запросов')
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'),
+                        help='база сервера для замера блокировок')
+    parser.add_argument('--full-form', action='store_true',
+                        help='сохранять таблицы отправкой формы целиком, '
+                             'а не изменений в /api/.../delta')
+    parser.add_argument('--setup', action='store_true',
+                        help='создать пользователей прогона и выйти')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true',
+                        help='вывести отчёт в JSON')
+    args = parser.parse_args()
+
+    if args.setup:
+        setup_users(args.shops)
+        return
+
+    managers = [Session(args.url, manager_name(shop_id), shop_id)
+                for shop_id in range(1, args.shops + 1)]
+    admin = Session(args.url, ADMIN_USER)
+    try:
+        for session in managers + [admin]:
+            session.login()
+    except URLError as error:
+        raise SystemExit(f"Сервер {args.url} недоступен: {error.reason}")
+
+    rng = random.Random(args.seed)
+    names = list(MIX)
+    weights = [weight for _, weight in MIX.values()]
+    results = []
+    results_lock = threading.Lock()
+
+    def task(name, session, task_seed):
+        started = time.perf_counter()
+        try:
+            status = run_scenario(name, session, random.Random(task_seed),
+                                  args.full_form)
+        except (URLError, OSError):
+            status = None
+        duration = (time.perf_counter() - started) * 1000
+        with results_lock:
+            results.append((name, status, duration))
+
+    sampler = LockSampler(args.database_url) if args.database_url else None
+    if sampler:
+        sampler.start()
+
+    interval = 1 / args.rps
+    late = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        dispatched = 0
+        while True:
+            due = started + dispatched * interval
+            if due - started >= args.duration:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -interval:
+                late += 1
+            name = rng.choices(names, weights)[0]
+            session = admin if MIX[name][0] == 'admin' else rng.choice(managers)
+            executor.submit(task, name, session, rng.random())
+            dispatched += 1
+    elapsed = time.perf_counter() - started
+
+    if sampler:
+        sampler.stop()
+
+    report = summarize(results, elapsed, late)
+    report.update({
+        'target_rps': args.rps,
+        'elapsed_s': round(elapsed, 1),
+        'locks': sampler.report() if sampler else None,
+    })
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Пропускная способность при разных размерах пула соединений.
+
+    python -m benchmarks.pool --sizes 2 5 10 20 --threads 32 --duration 10
+
+Для каждого размера пула создаётся приложение с DB_POOL_SIZE=N, и
+--threads потоков в течение --duration секунд запрашивают маршруты через
+тестовый клиент. Имеет смысл на PostgreSQL: для SQLite пул не настраивается.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+from app import create_app, db
+from benchmarks.seed import (BENCH_PASSWORD, BENCH_USER, default_period,
+                             row_count, seed)
+
+URLS = ['/incomes', '/returns', '/expenses', '/healthz']
+
+
+def _percentile(timings, share):
+    return round(timings[max(int(len(timings) * share) - 1, 0)], 2)
+
+
+def run(app, threads, duration):
+    """Запросы из threads потоков в течение duration секунд."""
+    deadline = time.monotonic() + duration
+    timings = []
+    errors = []
+    peak = {'checked_out': 0}
+    lock = threading.Lock()
+
+    def worker(offset):
+        client = app.test_client()
+        client.post('/login', data={'username': BENCH_USER,
+                                    'password': BENCH_PASSWORD})
+        local, failed = [], 0
+        step = offset
+        while time.monotonic() < deadline:
+            url = URLS[step % len(URLS)]
+            step += 1
+            started = time.perf_counter()
+            try:
+                status = client.get(url).status_code
+            except Exception:
+                status = None
+            local.append((time.perf_counter() - started) * 1000)
+            if status != 200:
+                failed += 1
+            with app.app_context():
+                checked_out = getattr(db.engine.pool, 'checkedout', lambda: 0)()
+            with lock:
+                peak['checked_out'] = max(peak['checked_out'], checked_out)
+        with lock:
+            timings.extend(local)
+            errors.append(failed)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.monotonic()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    timings.sort()
+    return {
+        'requests': len(timings),
+        'rps': round(len(timings) / elapsed, 1),
+        'errors': sum(errors),
+        'p50_ms': _percentile(timings, 0.5) if timings else None,
+        'p95_ms': _percentile(timings, 0.95) if timings else None,
+        'peak_checked_out': peak['checked_out'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2, 5, 10, 20])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--json', action='store_true',
+                        help='вывести результат в JSON')
+    args = parser.parse_args()
+
+    report = {}
+    for size in args.sizes:
+        os.environ['DB_POOL_SIZE'] = str(size)
+        os.environ.setdefault('DB_MAX_OVERFLOW', '0')
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            if row_count() == 0:
+                seed(args.rows, *default_period(1))
+        report[size] = run(app, args.threads, args.duration)
+        with app.app_context():
+            db.engine.dispose()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'пул':<6}{'запросов/с':>12}{'p50, мс':>10}{'p95, мс':>10}"
+          f"{'ошибок':>9}{'занято max':>12}")
+    for size, item in report.items():
+        print(f"{size:<6}{item['rps']:>12}{item['p50_ms']:>10}{item['p95_ms']:>10}"
+              f"{item['errors']:>9}{item['peak_checked_out']:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Проверка: число SQL-запросов страниц-списков не зависит от числа строк.
+
+    python -m benchmarks.queries --rows 100000
+
+Каждый список открывается дважды — на коротком периоде (или маленькой
+странице) и на длинном, где строк в десятки раз больше. Если шаблон
+где-то обращается к ленивой связи (N+1), второй замер покажет больше
+запросов. При расхождении скрипт завершается с кодом 1.
+"""
+import argparse
+import json
+import sys
+import threading
+from datetime import timedelta
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import create_app, db
+from benchmarks.seed import (BENCH_PASSWORD, BENCH_USER, default_period,
+                             row_count, seed)
+
+SHOP_ID = 1
+
+_counter = threading.local()
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    _counter.value = getattr(_counter, 'value', 0) + 1
+
+
+def count_queries(client, url):
+    """(число SQL-запросов, число строк таблицы) для GET url."""
+    _counter.value = 0
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"{url}: HTTP {response.status_code}")
+    return _counter.value, response.get_data(as_text=True).count('<tr>')
+
+
+def listing_urls(start, end):
+    """Страница -> (URL с малым числом строк, URL с большим)."""
+    week = f'start_date={end - timedelta(days=6)}&end_date={end}'
+    full = f'start_date={start}&end_date={end}'
+    return {
+        'all_incomes': (f'/incomes?{week}&per_page=10',
+                        f'/incomes?{full}&per_page=1000'),
+        'all_returns': (f'/returns?{week}&per_page=10',
+                        f'/returns?{full}&per_page=1000'),
+        'all_expenses': (f'/expenses?{week}&per_page=10',
+                         f'/expenses?{full}&per_page=1000'),
+        'shop_incomes': (f'/shop/{SHOP_ID}/incomes?{week}',
+                         f'/shop/{SHOP_ID}/incomes?{full}'),
+        'shop_returns': (f'/shop/{SHOP_ID}/returns?{week}',
+                         f'/shop/{SHOP_ID}/returns?{full}'),
+        'shop_expenses': (f'/shop/{SHOP_ID}/expenses?{week}',
+                          f'/shop/{SHOP_ID}/expenses?{full}'),
+        'employees': (f'/employees?month={end:%Y-%m}',
+                      f'/employees?month={end:%Y-%m}&sort=name'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--years', type=int, default=1)
+    parser.add_argument('--json', action='store_true',
+                        help='вывести результат в JSON')
+    args = parser.parse_args()
+
+    app = create_app()
+    report = {}
+    with app.app_context():
+        db.create_all()
+        start, end = default_period(args.years)
+        if row_count() == 0:
+            seed(args.rows, start, end)
+        else:
+            print("База уже содержит данные — наполнение пропущено.")
+
+    client = app.test_client()
+    client.post('/login', data={'username': BENCH_USER,
+                                'password': BENCH_PASSWORD})
+    event.listen(Engine, 'before_cursor_execute', _count_statement)
+    try:
+        for name, (small_url, large_url) in listing_urls(start, end).items():
+            client.get(small_url)  # прогрев: разовые запросы первого обращения
+            small_queries, small_rows = count_queries(client, small_url)
+            large_queries, large_rows = count_queries(client, large_url)
+            report[name] = {
+                'rows': [small_rows, large_rows],
+                'queries': [small_queries, large_queries],
+                'constant': small_queries == large_queries,
+            }
+    finally:
+        event.remove(Engine, 'before_cursor_execute', _count_statement)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"{'страница':<16}{'строк':>14}{'запросов':>12}")
+        for name, item in report.items():
+            rows = '/'.join(map(str, item['rows']))
+            queries = '/'.join(map(str, item['queries']))
+            print(f"{name:<16}{rows:>14}{queries:>12}"
+                  f"{'ok' if item['constant'] else 'N+1':>6}")
+
+    if not all(item['constant'] for item in report.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
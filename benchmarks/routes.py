@@ -0,0 +1,211 @@
+"""
+Замер всех GET-маршрутов приложения: задержка, SQL-запросы, пик памяти.
+
+    python -m benchmarks.routes --rows 1000000 --output run.json
+    python -m benchmarks.routes --compare run.json
+
+Маршруты берутся из app.url_map — всё, что зарегистрировал init_routes,
+включая blueprints. Параметры пути подставляются из базы (первый магазин,
+сотрудник текущего месяца), списки открываются за последние --days дней.
+Для каждого маршрута считаются p50/p95 времени ответа (вместе с чтением
+тела, в том числе потоковых выгрузок), число SQL-запросов одного ответа
+и пик памяти Python (tracemalloc, отдельным проходом, чтобы трассировка
+не искажала время). Отчёт — JSON; --compare печатает изменение p50
+относительно прошлого прогона.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+from flask import url_for
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+
+from app import create_app, db
+from app.models import Employee
+from benchmarks.seed import (BENCH_PASSWORD, BENCH_USER, default_period,
+                             row_count, seed)
+
+# Эндпоинты, которые не замеряются: статика и выход (разлогинил бы клиента)
+EXCLUDED_ENDPOINTS = {'static', 'auth.logout'}
+# Эндпоинты, которым магазин передаётся в строке запроса (?shop_id=)
+SHOP_QUERY_ENDPOINTS = {'add_employee', 'exports.export_ledger'}
+
+_statements = 0
+_statements_lock = threading.Lock()
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    # Задачи app.parallel выполняют запросы в других потоках — счётчик общий
+    global _statements
+    with _statements_lock:
+        _statements += 1
+
+
+def _percentile(sorted_values, share):
+    index = max(int(round(len(sorted_values) * share)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def route_params(shop_id):
+    """Значения параметров пути для url_for."""
+    employee_id = db.session.execute(
+        select(Employee.id).where(
+            Employee.shop_id == shop_id,
+            Employee.month == date.today().strftime('%Y-%m'))
+        .order_by(Employee.id).limit(1)).scalar()
+    return {
+        'shop_id': shop_id,
+        'employee_id': employee_id,
+        'ledger': 'incomes',
+        'fmt': 'csv',
+    }
+
+
+def get_routes(app, shop_id, days):
+    """
+    {эндпоинт: URL} для всех GET-маршрутов и {эндпоинт: причина} пропущенных.
+    """
+    end = date.today()
+    period = {'start_date': (end - timedelta(days=days - 1)).isoformat(),
+              'end_date': end.isoformat()}
+    params = route_params(shop_id)
+
+    urls, skipped = {}, {}
+    with app.test_request_context():
+        for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.endpoint):
+            if rule.endpoint in EXCLUDED_ENDPOINTS:
+                continue
+            if 'GET' not in rule.methods:
+                skipped[rule.endpoint] = 'только POST'
+                continue
+            values = {name: params.get(name) for name in rule.arguments}
+            if None in values.values():
+                skipped[rule.endpoint] = 'нет данных для параметров пути'
+                continue
+            if rule.endpoint in SHOP_QUERY_ENDPOINTS:
+                values['shop_id'] = shop_id
+            urls[rule.endpoint] = url_for(rule.endpoint, **values, **period)
+    return urls, skipped
+
+
+def measure_route(client, url, repeat):
+    """Задержки, число запросов и пик памяти одного URL."""
+    global _statements
+    response = client.get(url)  # прогрев
+    response.get_data()
+
+    timings, queries = [], []
+    for _ in range(repeat):
+        with _statements_lock:
+            _statements = 0
+        started = time.perf_counter()
+        response = client.get(url)
+        response.get_data()
+        timings.append((time.perf_counter() - started) * 1000)
+        queries.append(_statements)
+
+    tracemalloc.start()
+    try:
+        client.get(url).get_data()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'status': response.status_code,
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(_percentile(timings, 0.95), 2),
+        'max_ms': round(timings[-1], 2),
+        'queries': max(queries),
+        'peak_kb': round(peak / 1024, 1),
+        'bytes': len(response.get_data()),
+    }
+
+
+def compare(report, previous):
+    """Изменение p50 и запросов относительно прошлого отчёта."""
+    print(f"{'маршрут':<32}{'p50 было':>10}{'p50 стало':>11}{'изм.':>8}"
+          f"{'запросы':>12}")
+    for endpoint, item in report['routes'].items():
+        before = previous.get('routes', {}).get(endpoint)
+        if before is None:
+            print(f"{endpoint:<32}{'—':>10}{item['p50_ms']:>11}")
+            continue
+        change = (item['p50_ms'] - before['p50_ms']) / max(before['p50_ms'], 0.001)
+        print(f"{endpoint:<32}{before['p50_ms']:>10}{item['p50_ms']:>11}"
+              f"{change:>+8.0%}{before['queries']:>6} → {item['queries']:<3}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000,
+                        help='сколько строк создать, если база пуста')
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--days', type=int, default=30,
+                        help='период списков и выгрузок, дней')
+    parser.add_argument('--shop-id', type=int, default=1)
+    parser.add_argument('--cache', action='store_true',
+                        help='не выключать кэш главной страницы')
+    parser.add_argument('--output', help='записать отчёт JSON в файл')
+    parser.add_argument('--compare', help='отчёт прошлого прогона для сравнения')
+    args = parser.parse_args()
+
+    if not args.cache:
+        # Хранилище кэша создаётся в create_app: у общего (SharedBackend)
+        # TTL задаётся только при создании
+        os.environ['DASHBOARD_CACHE_TTL'] = '0'
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        if row_count() == 0:
+            start, end = default_period(args.years)
+            seed(args.rows, start, end)
+        rows = row_count()
+        dialect = db.engine.dialect.name
+        urls, skipped = get_routes(app, args.shop_id, args.days)
+
+    client = app.test_client()
+    client.post('/login', data={'username': BENCH_USER,
+                                'password': BENCH_PASSWORD})
+
+    event.listen(Engine, 'before_cursor_execute', _count_statement)
+    try:
+        routes = {endpoint: dict(measure_route(client, url, args.repeat), url=url)
+                  for endpoint, url in urls.items()}
+    finally:
+        event.remove(Engine, 'before_cursor_execute', _count_statement)
+
+    report = {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'database': dialect,
+        'rows': rows,
+        'repeat': args.repeat,
+        'days': args.days,
+        'routes': routes,
+        'skipped': skipped,
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            output.write(text + '\n')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as previous:
+            compare(report, json.load(previous))
+    elif not args.output:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Генерация синтетических данных для замеров.
+
+    python -m benchmarks.seed --rows 1000000 --years 3 --table income=500000
+
+Вставка идёт пачками через Core (executemany) в обход ORM, после чего
+дневные итоги и месячные зарплаты для дашборда перестраиваются целиком.
+
+Даты распределены неравномерно, как в живом магазине: строк тем больше,
+чем ближе день к концу периода (бизнес растёт), в пятницу-субботу и в
+последние дни месяца — больше, чем в будни. Отметок о рабочих днях не
+больше, чем пар (сотрудник, день) за период.
+"""
+import argparse
+import heapq
+import math
+import random
+from itertools import islice
+from datetime import date, timedelta
+
+from sqlalchemy import func, insert, select
+
+from app import db
+from app.models import (Employee, Expense, Income, Return, SalesReturn, Shop,
+                        ShopExpense, User, Workday, bcrypt)
+from app.rollups import rebuild_daily_totals, rebuild_monthly_payroll
+
+BENCH_USER = 'bench_admin'
+BENCH_PASSWORD = 'bench'
+
+# Доли строк по таблицам
+DISTRIBUTION = {
+    Income: 0.30,
+    Return: 0.10,
+    Expense: 0.10,
+    SalesReturn: 0.20,
+    ShopExpense: 0.20,
+    Workday: 0.10,
+}
+
+CHUNK_SIZE = 10000
+
+# Относительная нагрузка по дням недели (пн..вс) и в последние три дня месяца
+WEEKDAY_WEIGHTS = (1.0, 0.9, 0.9, 1.0, 1.2, 1.5, 1.3)
+MONTH_END_WEIGHT = 1.3
+MAX_DAY_WEIGHT = max(WEEKDAY_WEIGHTS) * MONTH_END_WEIGHT
+
+
+def _months(start, end):
+    months = []
+    current = start.replace(day=1)
+    while current <= end:
+        months.append(current.strftime('%Y-%m'))
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def _day_weight(day):
+    weight = WEEKDAY_WEIGHTS[day.weekday()]
+    if (day + timedelta(days=3)).month != day.month:
+        weight *= MONTH_END_WEIGHT
+    return weight
+
+
+def _random_day(rng, start, days, skew=True):
+    if not skew:
+        return start + timedelta(days=rng.randrange(days))
+    while True:
+        # sqrt даёт плотность, линейно растущую к концу периода
+        day = start + timedelta(days=int(days * math.sqrt(rng.random())))
+        if rng.random() * MAX_DAY_WEIGHT < _day_weight(day):
+            return day
+
+
+def _income(rng, shop_id, day, employee_id):
+    return {'shop_id': shop_id, 'date': day, 'operation_type': 'продажа',
+            'item_name': f'Товар {rng.randrange(1000)}',
+            'employee_id': employee_id,
+            'amount': round(rng.uniform(100, 20000), 2), 'notes': None}
+
+
+def _return(rng, shop_id, day, employee_id):
+    return {'shop_id': shop_id, 'date': day,
+            'item_name': f'Товар {rng.randrange(1000)}',
+            'employee_id': employee_id,
+            'amount': round(rng.uniform(100, 5000), 2), 'notes': None}
+
+
+def _expense(rng, shop_id, day, employee_id):
+    return {'shop_id': shop_id, 'date': day,
+            'category': rng.choice(['Закупка', 'Аренда', 'Ремонт']),
+            'amount': round(rng.uniform(100, 50000), 2), 'notes': None}
+
+
+def _sales_return(rng, shop_id, day, employee_id):
+    retail = round(rng.uniform(1000, 100000), 2)
+    return {'shop_id': shop_id, 'date': day, 'sale': 'Продажа',
+            'return_item': None, 'retail_sale_amount': retail,
+            'wholesale_sale_amount': round(retail * rng.uniform(0.5, 0.8), 2),
+            'return_amount': round(rng.uniform(0, 2000), 2)}
+
+
+def _shop_expense(rng, shop_id, day, employee_id):
+    return {'shop_id': shop_id, 'date': day,
+            'purchase_desc': 'Закупка',
+            'purchase': round(rng.uniform(1000, 50000), 2),
+            'store_needs': round(rng.uniform(0, 2000), 2),
+            'salary': None, 'rent': None, 'repair': None,
+            'marketing': round(rng.uniform(0, 1000), 2)}
+
+
+def _workday(rng, shop_id, day, employee_id):
+    return {'employee_id': employee_id, 'date': day,
+            'worked': rng.random() < 0.7}
+
+
+ROW_FACTORIES = {
+    Income: _income,
+    Return: _return,
+    Expense: _expense,
+    SalesReturn: _sales_return,
+    ShopExpense: _shop_expense,
+    Workday: _workday,
+}
+
+
+def _random_rows(rng, factory, total, employee_ids, shop_count, start, days,
+                 skew):
+    for _ in range(total):
+        shop_id = rng.randint(1, shop_count)
+        day = _random_day(rng, start, days, skew)
+        yield factory(rng, shop_id, day, rng.choice(
+            employee_ids[shop_id, day.strftime('%Y-%m')]))
+
+
+def _workday_rows(rng, total, employee_ids, shop_count, start, days, skew):
+    """
+    Отметки о рабочих днях — не больше одной на сотрудника и дату, поэтому
+    их не больше числа пар (сотрудник, день). Пары перебираются все и
+    выбираются без повторов с весом дня (ключ random ** (1 / вес)), так что
+    перекос дат тот же, что у остальных таблиц.
+    """
+    pairs = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        weight = (offset + 1) * _day_weight(day) if skew else 1.0
+        month = day.strftime('%Y-%m')
+        for shop_id in range(1, shop_count + 1):
+            for employee_id in employee_ids[shop_id, month]:
+                pairs.append((rng.random() ** (1 / weight), employee_id, day))
+    for _, employee_id, day in heapq.nlargest(total, pairs):
+        yield _workday(rng, None, day, employee_id)
+
+
+def ensure_shops_and_user(shop_count=4):
+    """Магазины и администратор для входа через тестовый клиент."""
+    for shop_id in range(1, shop_count + 1):
+        if not db.session.get(Shop, shop_id):
+            db.session.add(Shop(id=shop_id, name=f'Магазин № {shop_id}',
+                                location=''))
+    if not User.query.filter_by(username=BENCH_USER).first():
+        db.session.add(User(
+            username=BENCH_USER,
+            password_hash=bcrypt.generate_password_hash(
+                BENCH_PASSWORD).decode('utf-8'),
+            access_level='admin',
+            shop_id=None))
+    db.session.commit()
+
+
+def seed(rows, start, end, shop_count=4, employees_per_shop=5, seed_value=42,
+         echo=print, volumes=None, skew=True):
+    """
+    Наполняет базу примерно `rows` строками за период [start, end].
+    volumes — {имя таблицы: строк} вместо доли из DISTRIBUTION для этих таблиц;
+    skew=False — даты распределены равномерно.
+    Возвращает словарь {имя таблицы: количество вставленных строк}.
+    """
+    volumes = volumes or {}
+    rng = random.Random(seed_value)
+    ensure_shops_and_user(shop_count)
+
+    # Сотрудники хранятся помесячно — по employees_per_shop на магазин
+    employees = []
+    for month in _months(start, end):
+        for shop_id in range(1, shop_count + 1):
+            for number in range(employees_per_shop):
+                employees.append({
+                    'name': f'Сотрудник {shop_id}-{number}', 'shop_id': shop_id,
+                    'hours_worked': 160, 'salary': 30000, 'motivation': 0,
+                    'total_salary': 30000, 'month': month})
+    db.session.execute(insert(Employee), employees)
+    db.session.commit()
+    echo(f"employee: {len(employees)} строк")
+
+    # Строку записывает сотрудник того же магазина и того же месяца
+    employee_ids = {}
+    for employee_id, shop_id, month in db.session.execute(
+            select(Employee.id, Employee.shop_id, Employee.month)):
+        employee_ids.setdefault((shop_id, month), []).append(employee_id)
+
+    days = (end - start).days + 1
+    counts = {'employee': len(employees)}
+    for model, share in DISTRIBUTION.items():
+        total = volumes.get(model.__tablename__, int(rows * share))
+        if model is Workday:
+            generated = _workday_rows(rng, total, employee_ids, shop_count,
+                                      start, days, skew)
+        else:
+            generated = _random_rows(rng, ROW_FACTORIES[model], total,
+                                     employee_ids, shop_count, start, days, skew)
+        inserted = 0
+        while batch := list(islice(generated, CHUNK_SIZE)):
+            db.session.execute(insert(model), batch)
+            db.session.commit()
+            inserted += len(batch)
+        counts[model.__tablename__] = inserted
+        echo(f"{model.__tablename__}: {inserted} строк")
+
+    with db.engine.begin() as connection:
+        rebuild_daily_totals(connection)
+        rebuild_monthly_payroll(connection)
+    return counts
+
+
+def row_count():
+    """Общее число строк в таблицах журнала."""
+    return sum(db.session.execute(select(func.count()).select_from(model)).scalar()
+               for model in DISTRIBUTION)
+
+
+def default_period(years=3):
+    end = date.today()
+    return end - timedelta(days=365 * years), end
+
+
+def _volume(value):
+    table, _, rows = value.partition('=')
+    if table not in {model.__tablename__ for model in DISTRIBUTION}:
+        raise argparse.ArgumentTypeError(f"неизвестная таблица: {table}")
+    return table, int(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000,
+                        help='всего строк журналов (по долям DISTRIBUTION)')
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--shops', type=int, default=4)
+    parser.add_argument('--employees-per-shop', type=int, default=5)
+    parser.add_argument('--table', type=_volume, action='append', default=[],
+                        metavar='ТАБЛИЦА=СТРОК',
+                        help='число строк отдельной таблицы, например income=500000')
+    parser.add_argument('--uniform', action='store_true',
+                        help='равномерные даты без перекоса')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if row_count():
+            print("База уже содержит данные — наполнение пропущено.")
+            return
+        start, end = default_period(args.years)
+        seed(args.rows, start, end, shop_count=args.shops,
+             employees_per_shop=args.employees_per_shop, seed_value=args.seed,
+             volumes=dict(args.table), skew=not args.uniform)
+
+
+if __name__ == '__main__':
+    main()
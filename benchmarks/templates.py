@@ -0,0 +1,75 @@
+"""
+Загрузка всех шаблонов новым процессом: без кэша байт-кода и с ним.
+
+    python -m benchmarks.templates
+
+Каждый замер — отдельный интерпретатор (как новый воркер): создаётся
+приложение и загружаются все шаблоны app/templates. Без кэша Jinja
+разбирает и компилирует каждый шаблон, с кэшем (FileSystemBytecodeCache,
+заполненный `flask assets build`) — читает готовый байт-код.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Код замера в дочернем процессе: время create_app и загрузки шаблонов, мс
+CHILD = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+from app.assets import compile_templates
+app = create_app()
+created = time.perf_counter()
+count = compile_templates(app)
+done = time.perf_counter()
+print(json.dumps({'templates': count, 'startup_ms': (created - started) * 1000,
+                  'compile_ms': (done - created) * 1000}))
+"""
+
+
+def measure(env):
+    output = subprocess.run([sys.executable, '-c', CHILD], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true',
+                        help='вывести результат в JSON')
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        modes = {
+            'без кэша': dict(os.environ, JINJA_BYTECODE_CACHE='0'),
+            'кэш байт-кода': dict(os.environ, JINJA_BYTECODE_CACHE='1',
+                                  JINJA_CACHE_DIR=cache_dir),
+        }
+        measure(modes['кэш байт-кода'])  # заполняем кэш, как сборка
+        for name, env in modes.items():
+            runs = [measure(env) for _ in range(args.repeat)]
+            report[name] = {
+                'templates': runs[0]['templates'],
+                'startup_ms': round(statistics.median(
+                    run['startup_ms'] for run in runs), 1),
+                'compile_ms': round(statistics.median(
+                    run['compile_ms'] for run in runs), 1),
+            }
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    print(f"{'режим':<16}{'шаблонов':>10}{'create_app, мс':>16}{'шаблоны, мс':>14}")
+    for name, item in report.items():
+        print(f"{name:<16}{item['templates']:>10}{item['startup_ms']:>16}"
+              f"{item['compile_ms']:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Итоги журналов магазина: сумма по загруженным ORM-объектам против SELECT SUM.
+
+    python -m benchmarks.totals --rows 1000000
+
+Для периодов в 30, 90 и 365 дней по магазину 1 считаются итоги колонок
+продаж/возвратов и расходов двумя способами: как раньше считали маршруты
+(загрузка строк и sum(... or 0 for r in records)) и через
+app.money.column_totals. Результаты сверяются: сумма Decimal по объектам
+и SUM по NUMERIC должны совпасть до копейки.
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from app import create_app, db
+from app.forms import SALES_RETURN_AMOUNT_FIELDS, SHOP_EXPENSE_CATEGORIES
+from app.models import SalesReturn, ShopExpense
+from app.money import ZERO, column_totals
+from benchmarks.seed import default_period, row_count, seed
+
+PERIODS = (30, 90, 365)
+SHOP_ID = 1
+LEDGERS = (
+    (SalesReturn, SALES_RETURN_AMOUNT_FIELDS),
+    (ShopExpense, SHOP_EXPENSE_CATEGORIES),
+)
+
+
+def orm_totals(model, names, *criteria):
+    records = model.query.filter(*criteria).all()
+    return {name: sum((getattr(record, name) or ZERO for record in records),
+                      ZERO)
+            for name in names}
+
+
+def _median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, round(statistics.median(timings), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true',
+                        help='вывести результат в JSON')
+    args = parser.parse_args()
+
+    app = create_app()
+    report = {}
+    with app.app_context():
+        db.create_all()
+        start, end = default_period(args.years)
+        if row_count() == 0:
+            seed(args.rows, start, end)
+        else:
+            print("База уже содержит данные — наполнение пропущено.")
+
+        for days in PERIODS:
+            first = end - timedelta(days=days - 1)
+            for model, names in LEDGERS:
+                criteria = (model.shop_id == SHOP_ID,
+                            model.date.between(first, end))
+                expected, orm_ms = _median_ms(
+                    lambda: orm_totals(model, names, *criteria), args.repeat)
+                actual, sql_ms = _median_ms(
+                    lambda: column_totals(model, names, *criteria), args.repeat)
+                report[f'{model.__tablename__}/{days}'] = {
+                    'orm_ms': orm_ms,
+                    'sql_ms': sql_ms,
+                    'equal': expected == actual,
+                }
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'журнал/период':<24}{'объекты, мс':>14}{'SUM, мс':>10}{'совпало':>10}")
+    for name, item in report.items():
+        print(f"{name:<24}{item['orm_ms']:>14}{item['sql_ms']:>10}"
+              f"{'да' if item['equal'] else 'нет':>10}")
+
+
+if __name__ == '__main__':
+    main()
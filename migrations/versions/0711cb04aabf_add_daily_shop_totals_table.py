@@ -0,0 +1,69 @@
+"""Add daily_shop_totals table
+
+Revision ID: 0711cb04aabf
+Revises: 3ab78aeb4f70
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0711cb04aabf'
+down_revision = '3ab78aeb4f70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_shop_totals',
+    sa.Column('shop_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('purchase', sa.Float(), nullable=False),
+    sa.Column('store_needs', sa.Float(), nullable=False),
+    sa.Column('salary', sa.Float(), nullable=False),
+    sa.Column('rent', sa.Float(), nullable=False),
+    sa.Column('repair', sa.Float(), nullable=False),
+    sa.Column('marketing', sa.Float(), nullable=False),
+    sa.Column('retail_sale_amount', sa.Float(), nullable=False),
+    sa.Column('wholesale_sale_amount', sa.Float(), nullable=False),
+    sa.Column('return_amount', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('shop_id', 'date')
+    )
+    with op.batch_alter_table('daily_shop_totals', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_daily_shop_totals_date'), ['date'], unique=False)
+
+    # Первичное заполнение итогов по уже накопленным данным
+    # (то же самое делает `flask rollups rebuild`)
+    op.execute("""
+        INSERT INTO daily_shop_totals (
+            shop_id, date, purchase, store_needs, salary, rent, repair,
+            marketing, retail_sale_amount, wholesale_sale_amount, return_amount
+        )
+        SELECT shop_id, date,
+               COALESCE(SUM(purchase), 0), COALESCE(SUM(store_needs), 0),
+               COALESCE(SUM(salary), 0), COALESCE(SUM(rent), 0),
+               COALESCE(SUM(repair), 0), COALESCE(SUM(marketing), 0),
+               COALESCE(SUM(retail_sale_amount), 0),
+               COALESCE(SUM(wholesale_sale_amount), 0),
+               COALESCE(SUM(return_amount), 0)
+        FROM (
+            SELECT shop_id, date, purchase, store_needs, salary, rent, repair,
+                   marketing, NULL AS retail_sale_amount,
+                   NULL AS wholesale_sale_amount, NULL AS return_amount
+            FROM shop_expenses WHERE date IS NOT NULL
+            UNION ALL
+            SELECT shop_id, date, NULL, NULL, NULL, NULL, NULL, NULL,
+                   retail_sale_amount, wholesale_sale_amount, return_amount
+            FROM sales_returns WHERE date IS NOT NULL
+        ) AS raw
+        GROUP BY shop_id, date
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('daily_shop_totals', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_daily_shop_totals_date'))
+
+    op.drop_table('daily_shop_totals')
@@ -0,0 +1,35 @@
+"""Add version_id to sales_returns and shop_expenses
+
+Revision ID: 31fe6dde131c
+Revises: bd22b4f37b08
+Create Date: 2026-10-18 19:12:08.604415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '31fe6dde131c'
+down_revision = 'bd22b4f37b08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # server_default заполняет существующие строки и вставки мимо ORM (импорт)
+    with op.batch_alter_table('sales_returns', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version_id', sa.Integer(), nullable=False,
+                                      server_default='1'))
+
+    with op.batch_alter_table('shop_expenses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version_id', sa.Integer(), nullable=False,
+                                      server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('shop_expenses', schema=None) as batch_op:
+        batch_op.drop_column('version_id')
+
+    with op.batch_alter_table('sales_returns', schema=None) as batch_op:
+        batch_op.drop_column('version_id')
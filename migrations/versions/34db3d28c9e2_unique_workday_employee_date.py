@@ -0,0 +1,42 @@
+"""Unique (employee_id, date) on workday
+
+Revision ID: 34db3d28c9e2
+Revises: 3f88356f1046
+Create Date: 2026-10-18 12:31:07.804126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '34db3d28c9e2'
+down_revision = '3f88356f1046'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Оставляем по одной (последней) отметке на сотрудника и дату
+    op.execute("""
+        DELETE FROM workday
+        WHERE id NOT IN (
+            SELECT max_id FROM (
+                SELECT MAX(id) AS max_id FROM workday
+                GROUP BY employee_id, date
+            ) AS latest
+        )
+    """)
+
+    # Уникальное ограничение само создаёт индекс по (employee_id, date)
+    with op.batch_alter_table('workday', schema=None) as batch_op:
+        batch_op.drop_index('ix_workday_employee_id_date')
+        batch_op.create_unique_constraint(
+            'uq_workday_employee_id_date', ['employee_id', 'date'])
+
+
+def downgrade():
+    with op.batch_alter_table('workday', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_workday_employee_id_date', type_='unique')
+        batch_op.create_index('ix_workday_employee_id_date',
+                              ['employee_id', 'date'], unique=False)
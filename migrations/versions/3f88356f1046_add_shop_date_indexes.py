@@ -0,0 +1,43 @@
+"""Add (shop_id, date) indexes to ledger tables
+
+Revision ID: 3f88356f1046
+Revises: 0711cb04aabf
+Create Date: 2026-10-18 11:04:19.552310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f88356f1046'
+down_revision = '0711cb04aabf'
+branch_labels = None
+depends_on = None
+
+
+# (таблица, имя индекса, колонки)
+INDEXES = [
+    ('income', 'ix_income_shop_id_date', ['shop_id', 'date']),
+    ('income', 'ix_income_date', ['date']),
+    ('return', 'ix_return_shop_id_date', ['shop_id', 'date']),
+    ('return', 'ix_return_date', ['date']),
+    ('expense', 'ix_expense_shop_id_date', ['shop_id', 'date']),
+    ('expense', 'ix_expense_date', ['date']),
+    ('sales_returns', 'ix_sales_returns_shop_id_date', ['shop_id', 'date']),
+    ('shop_expenses', 'ix_shop_expenses_shop_id_date', ['shop_id', 'date']),
+    ('workday', 'ix_workday_employee_id_date', ['employee_id', 'date']),
+    ('employee', 'ix_employee_month_shop_id', ['month', 'shop_id']),
+]
+
+
+def upgrade():
+    for table, name, columns in INDEXES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade():
+    for table, name, columns in reversed(INDEXES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(name)
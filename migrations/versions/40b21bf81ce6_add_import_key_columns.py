@@ -0,0 +1,38 @@
+"""Add import_key to sales_returns and shop_expenses
+
+Revision ID: 40b21bf81ce6
+Revises: 34db3d28c9e2
+Create Date: 2026-10-18 14:02:55.163927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '40b21bf81ce6'
+down_revision = '34db3d28c9e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sales_returns', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('import_key', sa.String(length=40), nullable=True))
+        batch_op.create_unique_constraint(
+            'uq_sales_returns_shop_id_import_key', ['shop_id', 'import_key'])
+
+    with op.batch_alter_table('shop_expenses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('import_key', sa.String(length=40), nullable=True))
+        batch_op.create_unique_constraint(
+            'uq_shop_expenses_shop_id_import_key', ['shop_id', 'import_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('shop_expenses', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_shop_expenses_shop_id_import_key', type_='unique')
+        batch_op.drop_column('import_key')
+
+    with op.batch_alter_table('sales_returns', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_sales_returns_shop_id_import_key', type_='unique')
+        batch_op.drop_column('import_key')
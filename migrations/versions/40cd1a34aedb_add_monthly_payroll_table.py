@@ -0,0 +1,39 @@
+"""Add monthly_payroll table
+
+Revision ID: 40cd1a34aedb
+Revises: 40b21bf81ce6
+Create Date: 2026-10-18 16:20:11.482035
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '40cd1a34aedb'
+down_revision = '40b21bf81ce6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('monthly_payroll',
+    sa.Column('shop_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.String(length=7), nullable=False),
+    sa.Column('total_salary', sa.Integer(), nullable=False),
+    sa.Column('employee_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('shop_id', 'month')
+    )
+
+    # Первичное заполнение по уже внесённым сотрудникам
+    # (то же самое делает `flask rollups rebuild`)
+    op.execute("""
+        INSERT INTO monthly_payroll (shop_id, month, total_salary, employee_count)
+        SELECT shop_id, month, COALESCE(SUM(total_salary), 0), COUNT(*)
+        FROM employee
+        GROUP BY shop_id, month
+    """)
+
+
+def downgrade():
+    op.drop_table('monthly_payroll')
@@ -0,0 +1,57 @@
+"""Money columns to NUMERIC(12, 2)
+
+Revision ID: bd22b4f37b08
+Revises: 40cd1a34aedb
+Create Date: 2026-10-18 18:05:42.317904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bd22b4f37b08'
+down_revision = '40cd1a34aedb'
+branch_labels = None
+depends_on = None
+
+# Таблица -> (колонка, nullable)
+MONEY_COLUMNS = {
+    'income': (('amount', False),),
+    'return': (('amount', False),),
+    'expense': (('amount', False),),
+    'sales_returns': (('retail_sale_amount', True),
+                      ('wholesale_sale_amount', True),
+                      ('return_amount', True)),
+    'shop_expenses': (('purchase', True), ('store_needs', True),
+                      ('salary', True), ('rent', True),
+                      ('repair', True), ('marketing', True)),
+    'daily_shop_totals': (('purchase', False), ('store_needs', False),
+                          ('salary', False), ('rent', False),
+                          ('repair', False), ('marketing', False),
+                          ('retail_sale_amount', False),
+                          ('wholesale_sale_amount', False),
+                          ('return_amount', False)),
+}
+
+
+def _alter(from_type, to_type, using):
+    for table, columns in MONEY_COLUMNS.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for name, nullable in columns:
+                batch_op.alter_column(name,
+                                      existing_type=from_type,
+                                      type_=to_type,
+                                      existing_nullable=nullable,
+                                      postgresql_using=using.format(name))
+
+
+def upgrade():
+    # Значения округляются до копейки: накопленный хвост Float отбрасывается
+    _alter(sa.Float(), sa.Numeric(precision=12, scale=2),
+           'round("{0}"::numeric, 2)')
+
+
+def downgrade():
+    _alter(sa.Numeric(precision=12, scale=2), sa.Float(),
+           '"{0}"::double precision')
@@ -0,0 +1,65 @@
+"""
+Общая заготовка тестов: приложение на временной базе SQLite.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+os.environ.setdefault('SECRET_KEY', 'test')
+
+from app import create_app, db  # noqa: E402
+from app.models import Shop, User, bcrypt  # noqa: E402
+
+PASSWORD = 'test-password'
+
+
+class AppTestCase(unittest.TestCase):
+    """Приложение с пустой базой, магазинами 1–2 и пользователями admin и m1."""
+
+    # Переменные окружения приложения теста (поверх общих)
+    environ = {}
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        environ = {'DATABASE_URL': 'sqlite:///' + os.path.join(self.tmpdir, 'test.db'),
+                   'JINJA_BYTECODE_CACHE': '0', **self.environ}
+        saved = {name: os.environ.get(name) for name in environ}
+        os.environ.update(environ)
+        try:
+            self.app = create_app()
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+        self.app.config['WTF_CSRF_ENABLED'] = False
+
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        password_hash = bcrypt.generate_password_hash(PASSWORD).decode()
+        db.session.add_all([
+            Shop(id=1, name='Магазин 1', location='—'),
+            Shop(id=2, name='Магазин 2', location='—'),
+            User(username='admin', password_hash=password_hash,
+                 access_level='admin', shop_id=None),
+            User(username='m1', password_hash=password_hash,
+                 access_level='shop_manager', shop_id=1),
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        self.context.pop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def client(self, username='admin'):
+        """Тестовый клиент, вошедший под пользователем username."""
+        client = self.app.test_client()
+        response = client.post('/login', data={'username': username,
+                                               'password': PASSWORD})
+        self.assertEqual(response.status_code, 302)
+        return client
@@ -0,0 +1,80 @@
+import re
+import unittest
+from datetime import date
+
+from app import db
+from app.models import ShopExpense
+from tests.helpers import AppTestCase
+
+MONEY_JSON = re.compile(r'^-?\d+\.\d{2}$')
+
+
+class ApiErrorsTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.http = self.client()
+
+    def assertJsonError(self, response, status):
+        self.assertEqual(response.status_code, status)
+        self.assertTrue(response.is_json)
+        self.assertTrue(response.get_json()['message'])
+
+    def test_bad_date_in_query(self):
+        self.assertJsonError(
+            self.http.get('/api/shops/1/incomes?start_date=2026-13-01'), 400)
+
+    def test_bad_date_in_delta(self):
+        self.assertJsonError(self.http.post(
+            '/api/shops/1/expenses_table/delta',
+            json={'start_date': '01.10.2026'}), 400)
+
+    def test_non_string_date_in_delta(self):
+        for value in (20261001, ['2026-10-01'], {'day': 1}):
+            with self.subTest(value=value):
+                self.assertJsonError(self.http.post(
+                    '/api/shops/1/expenses_table/delta',
+                    json={'end_date': value}), 400)
+
+    def test_non_string_row_date_in_delta(self):
+        for value in (20261002, ['2026-10-02'], {'day': 2}):
+            with self.subTest(value=value):
+                self.assertJsonError(self.http.post(
+                    '/api/shops/1/expenses_table/delta',
+                    json={'added': [{'key': 'n1', 'date': value,
+                                     'purchase': '10.00'}]}), 400)
+
+    def test_null_date_means_no_filter(self):
+        response = self.http.post('/api/shops/1/expenses_table/delta',
+                                  json={'start_date': None, 'end_date': None})
+        self.assertEqual(response.status_code, 200)
+
+    def test_abort_errors_are_json(self):
+        self.assertJsonError(self.http.get('/api/shops/1/unknown'), 404)
+        self.assertJsonError(self.http.post('/api/shops/1/sales_returns/delta',
+                                            json=[1]), 400)
+        self.assertJsonError(self.client('m1').get('/api/shops/2/incomes'), 403)
+
+
+class ApiDashboardTest(AppTestCase):
+
+    def test_money_values_are_decimal_strings(self):
+        db.session.add(ShopExpense(shop_id=1, date=date(2026, 10, 2), purchase=1))
+        db.session.commit()
+        data = self.client().get(
+            '/api/dashboard?start_date=2026-10-01&end_date=2026-10-03').get_json()
+
+        values = [data['net_profit'], data['payroll'], *data['totals'].values()]
+        for items in data['series'].values():
+            values.extend(items)
+        for shop in data['shops']:
+            values.extend(shop['values'] + [shop['total']])
+        # Дни и магазины без данных — "0.00", а не число 0
+        self.assertEqual([value for value in values
+                          if not (isinstance(value, str) and MONEY_JSON.match(value))],
+                         [])
+        self.assertEqual(data['series']['purchase'], ['0.00', '1.00', '0.00'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask
+
+from app import assets
+from tests.helpers import AppTestCase
+
+
+class StaleAssetsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.static = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.static, 'js'))
+        for name in ('a.js', 'b.js'):
+            self.write(f'js/{name}', 'let x = 1;')
+        self.manifest = assets.build(self.static)
+
+    def tearDown(self):
+        shutil.rmtree(self.static)
+
+    def write(self, path, text):
+        with open(os.path.join(self.static, path), 'w', encoding='utf-8') as output:
+            output.write(text)
+
+    def make_app(self):
+        app = Flask(__name__, static_folder=self.static,
+                    static_url_path='/static')
+        app.config.update(ASSETS_FINGERPRINT=True, JINJA_BYTECODE_CACHE=False)
+        assets.init_app(app)
+        return app
+
+    def test_fresh_build_is_used(self):
+        self.assertEqual(assets.stale_sources(self.static, self.manifest), [])
+        self.assertEqual(self.make_app().extensions['assets'], self.manifest)
+
+    def test_edited_source_is_served_from_static(self):
+        self.write('js/a.js', 'let x = 2;')
+        self.assertEqual(assets.stale_sources(self.static, self.manifest),
+                         ['js/a.js'])
+        with self.assertLogs(level='WARNING'):
+            app = self.make_app()
+        self.assertEqual(list(app.extensions['assets']), ['js/b.js'])
+        with app.test_request_context():
+            self.assertEqual(assets.asset_url('js/a.js'), '/static/js/a.js')
+
+
+class DebugDefaultTest(AppTestCase):
+    environ = {'FLASK_DEBUG': '1'}
+
+    def test_fingerprint_off_in_debug(self):
+        self.assertFalse(self.app.config['ASSETS_FINGERPRINT'])
+        self.assertEqual(self.app.extensions['assets'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
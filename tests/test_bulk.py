@@ -0,0 +1,94 @@
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import update
+
+from app import dashboard_cache, db
+from app.bulk import apply_versioned
+from app.models import DailyShopTotal, ShopExpense
+from app.profiling import statement_count
+from app.rollups import check_daily_totals
+from tests.helpers import AppTestCase
+
+DAYS = (date(2026, 10, 1), date(2026, 10, 2), date(2026, 10, 3))
+
+
+class ApplyVersionedTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        db.session.add_all(ShopExpense(shop_id=1, date=day, purchase=100)
+                           for day in DAYS)
+        db.session.commit()
+        self.backend = self.app.extensions['dashboard_cache']
+        self.backend.clear()
+        # Кэш главной страницы магазина за каждый день
+        self.keys = [dashboard_cache.cache_key(1, day, day) for day in DAYS]
+        for key in self.keys:
+            self.backend.set(key, 'page')
+
+    def _apply_with_conflict(self):
+        rows = ShopExpense.query.order_by(ShopExpense.date).all()
+        # Вторую строку тем временем изменили в другом соединении
+        with db.engine.begin() as connection:
+            connection.execute(update(ShopExpense)
+                               .where(ShopExpense.id == rows[1].id)
+                               .values(version_id=ShopExpense.version_id + 1))
+        conflicts = apply_versioned([
+            (row, row.version_id, {'purchase': Decimal(amount)})
+            for row, amount in zip(rows, ('111.00', '222.00', '333.00'))])
+        return rows, conflicts
+
+    def _cached(self):
+        return [key in self.backend.keys() for key in self.keys]
+
+    def test_conflict_between_normal_rows(self):
+        rows, conflicts = self._apply_with_conflict()
+        self.assertEqual(conflicts, [{'id': rows[1].id, 'version': 2,
+                                      'reason': 'stale'}])
+        # Кэш сбрасывается только после коммита всей транзакции
+        self.assertEqual(self._cached(), [True, True, True])
+
+        db.session.commit()
+        self.assertEqual(self._cached(), [False, True, False])
+        with db.engine.connect() as connection:
+            self.assertEqual(check_daily_totals(connection), [])
+        db.session.remove()
+        self.assertEqual(
+            [row.purchase for row in
+             ShopExpense.query.order_by(ShopExpense.date)],
+            [Decimal('111.00'), Decimal('100.00'), Decimal('333.00')])
+
+    def test_one_statement_per_row(self):
+        rows = ShopExpense.query.order_by(ShopExpense.date).all()
+        before = statement_count()
+        conflicts = apply_versioned([
+            (rows[0], rows[0].version_id, {'purchase': Decimal('150.00')}),
+            (rows[1], rows[1].version_id, {'date': DAYS[2]}),
+            (rows[2], rows[2].version_id, None),
+        ])
+        self.assertEqual(conflicts, [])
+        # UPDATE/DELETE ... WHERE version_id = ... на строку, без SAVEPOINT
+        self.assertEqual(statement_count() - before, 3)
+        self.assertFalse(db.session.dirty)
+        self.assertEqual(rows[0].version_id, 2)
+
+        db.session.commit()
+        with db.engine.connect() as connection:
+            self.assertEqual(check_daily_totals(connection), [])
+        self.assertEqual(
+            {(total.date, total.purchase) for total in DailyShopTotal.query},
+            {(DAYS[0], Decimal('150.00')), (DAYS[2], Decimal('100.00'))})
+        self.assertEqual(self._cached(), [False, False, False])
+
+    def test_rollback_keeps_cache(self):
+        self._apply_with_conflict()
+        db.session.rollback()
+        self.assertEqual(self._cached(), [True, True, True])
+        db.session.commit()
+        self.assertEqual(self._cached(), [True, True, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
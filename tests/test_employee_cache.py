@@ -0,0 +1,60 @@
+import unittest
+
+from app import db
+from app.cache import employee_cache
+from app.listings import employee_choices
+from app.models import Employee
+from tests.helpers import AppTestCase
+
+MONTH = '2026-10'
+
+
+class EmployeeCacheTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        employee_cache.clear()
+        self.employee = Employee(name='Анна', shop_id=1, month=MONTH,
+                                 hours_worked=160, salary=30000, motivation=0,
+                                 total_salary=30000)
+        db.session.add(self.employee)
+        db.session.commit()
+        employee_choices(1, MONTH)
+        employee_choices(2, MONTH)
+
+    def test_flush_keeps_entry_until_commit(self):
+        self.employee.name = 'Мария'
+        db.session.flush()
+        self.assertIn((1, MONTH), employee_cache.keys())
+        db.session.commit()
+        self.assertNotIn((1, MONTH), employee_cache.keys())
+        # Записи других магазинов не сбрасываются
+        self.assertIn((2, MONTH), employee_cache.keys())
+        self.assertEqual([name for _, name in employee_choices(1, MONTH)],
+                         ['Мария'])
+
+    def test_rollback_keeps_entry(self):
+        self.employee.name = 'Мария'
+        db.session.flush()
+        db.session.rollback()
+        self.assertIn((1, MONTH), employee_cache.keys())
+        db.session.commit()
+        self.assertIn((1, MONTH), employee_cache.keys())
+
+    def test_transfer_resets_both_shops(self):
+        self.employee.shop_id = 2
+        db.session.commit()
+        self.assertNotIn((1, MONTH), employee_cache.keys())
+        self.assertNotIn((2, MONTH), employee_cache.keys())
+        self.assertEqual(employee_choices(1, MONTH), [])
+
+    def test_savepoint_waits_for_outer_commit(self):
+        with db.session.begin_nested():
+            self.employee.name = 'Мария'
+        self.assertIn((1, MONTH), employee_cache.keys())
+        db.session.commit()
+        self.assertNotIn((1, MONTH), employee_cache.keys())
+
+
+if __name__ == '__main__':
+    unittest.main()
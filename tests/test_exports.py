@@ -0,0 +1,36 @@
+import unittest
+from datetime import date
+
+from app import db
+from app.models import ShopExpense
+from tests.helpers import AppTestCase
+
+
+class ExportLedgerTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        db.session.add(ShopExpense(shop_id=1, date=date(2026, 10, 2), purchase=1))
+        db.session.commit()
+        self.http = self.client()
+
+    def test_period_in_filename(self):
+        response = self.http.get('/export/expenses_table.csv'
+                                 '?start_date=2026-10-01&end_date=2026-10-31')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.headers['Content-Disposition'],
+            'attachment; filename="expenses_table_2026-10-01_2026-10-31.csv"')
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 2)
+
+    def test_bad_date_is_rejected_before_streaming(self):
+        for value in ('2026"x', '2026-13-01', '01.10.2026'):
+            with self.subTest(value=value):
+                response = self.http.get('/export/expenses_table.csv',
+                                         query_string={'end_date': value})
+                self.assertEqual(response.status_code, 400)
+                self.assertNotIn('Content-Disposition', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
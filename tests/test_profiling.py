@@ -0,0 +1,87 @@
+import os
+import re
+import unittest
+from datetime import date
+
+from sqlalchemy import select
+
+from app import db
+from app.models import Employee, Shop, ShopExpense
+from app.parallel import run_parallel
+from app.profiling import statement_count
+from tests.helpers import AppTestCase
+
+SERVER_TIMING_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+class ParallelCountersTest(AppTestCase):
+    environ = {'PROFILE_REQUESTS': '1', 'PROFILE_LOG': os.devnull,
+               'DASHBOARD_CACHE_TTL': '0'}
+
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        db.session.add_all([
+            ShopExpense(shop_id=1, date=today, purchase=100),
+            ShopExpense(shop_id=2, date=today, rent=50),
+            Employee(name='Анна', shop_id=1, month=today.strftime('%Y-%m'),
+                     total_salary=1000),
+        ])
+        db.session.commit()
+
+    def profiled_queries(self, http, url):
+        response = http.get(url)
+        self.assertEqual(response.status_code, 200)
+        return int(SERVER_TIMING_QUERIES.search(
+            response.headers['Server-Timing']).group(1))
+
+    def test_dashboard_counts_match(self):
+        http = self.client()
+        counts = {}
+        for parallel in (False, True, False):
+            self.app.config['DASHBOARD_PARALLEL'] = parallel
+            counts.setdefault(parallel, []).append(
+                self.profiled_queries(http, '/?mode=shops'))
+        self.assertEqual(counts[False][0], counts[False][1])
+        self.assertEqual(counts[True][0], counts[False][0])
+
+    def test_run_parallel_counts_match(self):
+        def query():
+            return db.session.execute(select(ShopExpense.id)).all()
+
+        tasks = {name: query for name in ('first', 'second', 'third')}
+        counts = {}
+        for sequential in (True, False):
+            with self.app.test_request_context():
+                before = statement_count()
+                run_parallel(tasks, sequential=sequential)
+                counts[sequential] = statement_count() - before
+        self.assertEqual(counts[True], 3)
+        self.assertEqual(counts[False], 3)
+
+
+class ParallelConnectionTest(AppTestCase):
+
+    def test_request_connection_is_released(self):
+        def checked_out():
+            db.session.execute(select(Shop.id)).all()
+            return db.engine.pool.checkedout()
+
+        with self.app.test_request_context():
+            shop = Shop.query.first()
+            self.assertTrue(db.session().in_transaction())
+            results, _ = run_parallel({'pool': checked_out})
+            # Во время задачи занято только её соединение
+            self.assertEqual(results['pool'], 1)
+            self.assertFalse(db.session().in_transaction())
+            self.assertEqual(shop.name, 'Магазин 1')
+
+    def test_unsaved_changes_are_rejected(self):
+        with self.app.test_request_context():
+            Shop.query.first().name = 'Другое'
+            with self.assertRaises(RuntimeError):
+                run_parallel({'noop': lambda: None})
+
+
+if __name__ == '__main__':
+    unittest.main()
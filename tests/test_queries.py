@@ -0,0 +1,94 @@
+import unittest
+from datetime import date
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import db
+from app.models import SalesReturn, ShopExpense
+from benchmarks.queries import _count_statement, count_queries, listing_urls
+from benchmarks.seed import seed
+from tests.helpers import AppTestCase
+
+
+class ListingQueriesTest(AppTestCase):
+    """Число SQL-запросов списка не растёт с числом строк (нет N+1)."""
+
+    def test_listing_queries_are_constant(self):
+        end = date.today()
+        start = end.replace(year=end.year - 1)
+        seed(3000, start, end, shop_count=2, echo=lambda *args: None)
+        db.session.remove()
+
+        http = self.client()
+        event.listen(Engine, 'before_cursor_execute', _count_statement)
+        try:
+            for name, (small_url, large_url) in listing_urls(start, end).items():
+                with self.subTest(page=name):
+                    http.get(small_url)  # разовые запросы первого обращения
+                    small_queries, small_rows = count_queries(http, small_url)
+                    large_queries, large_rows = count_queries(http, large_url)
+                    # Сотрудники сравниваются в двух сортировках, остальные
+                    # списки — на коротком и длинном периоде
+                    self.assertGreaterEqual(large_rows, small_rows)
+                    self.assertGreater(small_rows, 1)
+                    self.assertEqual(large_queries, small_queries)
+        finally:
+            event.remove(Engine, 'before_cursor_execute', _count_statement)
+
+
+class BulkSaveQueriesTest(AppTestCase):
+    """
+    Сохранение таблицы: один SELECT строк по IN (...), по UPDATE на
+    изменённую строку и пересчёт итогов один раз — без запросов на чтение
+    каждой строки.
+    """
+
+    # Таблица -> (модель, текстовое поле, поле суммы)
+    TABLES = {
+        'expenses_table': (ShopExpense, 'purchase_desc', 'purchase'),
+        'sales_returns': (SalesReturn, 'sale', 'retail_sale_amount'),
+    }
+
+    def save(self, table, edited=0, added=0):
+        """Число SQL-запросов сохранения формы (заголовок X-SQL-Statements)."""
+        model, text_field, amount_field = self.TABLES[table]
+        rows = [model(shop_id=1, date=date(2026, 10, 1 + number % 28),
+                      **{amount_field: 100})
+                for number in range(edited)]
+        db.session.add_all(rows)
+        db.session.commit()
+
+        data = {}
+        for idx, row in enumerate(rows):
+            data.update({f'id_{idx}': row.id, f'version_{idx}': row.version_id,
+                         f'date_{idx}': row.date.isoformat(),
+                         f'{text_field}_{idx}': 'Правка',
+                         f'{amount_field}_{idx}': str(200 + idx)})
+        for idx in range(edited, edited + added):
+            data.update({f'date_{idx}': '2026-10-05',
+                         f'{text_field}_{idx}': 'Новая',
+                         f'{amount_field}_{idx}': '5', f'is_new_{idx}': 'true'})
+        data['row_count'] = str(edited + added)
+        db.session.remove()
+
+        response = self.client().post(f'/shop/1/{table}', data=data)
+        self.assertEqual(response.status_code, 302)
+        return int(response.headers['X-SQL-Statements'])
+
+    def test_one_update_per_changed_row(self):
+        for table in self.TABLES:
+            with self.subTest(table=table):
+                self.assertEqual(self.save(table, edited=20)
+                                 - self.save(table, edited=2), 18)
+
+    def test_at_most_one_insert_per_new_row(self):
+        # На PostgreSQL новые строки вставляются пачкой, на SQLite — по одной
+        for table in self.TABLES:
+            with self.subTest(table=table):
+                self.assertLessEqual(self.save(table, added=20)
+                                     - self.save(table, added=2), 18)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from app import db, load_user
+from app.cache import user_cache
+from app.models import User
+from tests.helpers import AppTestCase
+
+
+class UserCacheTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+        self.user_id = User.query.filter_by(username='m1').one().id
+        load_user(self.user_id)
+        db.session.remove()
+
+    def test_cached_user_is_attached_to_session(self):
+        self.assertIn(self.user_id, user_cache.keys())
+        user = load_user(self.user_id)
+        self.assertIn(user, db.session)
+        self.assertFalse(db.session.is_modified(user))
+        self.assertEqual(user.access_level, 'shop_manager')
+
+    def test_commit_invalidates(self):
+        db.session.get(User, self.user_id).access_level = 'admin'
+        db.session.flush()
+        self.assertIn(self.user_id, user_cache.keys())
+        db.session.commit()
+        self.assertNotIn(self.user_id, user_cache.keys())
+        db.session.remove()
+        self.assertEqual(load_user(self.user_id).access_level, 'admin')
+
+    def test_rollback_keeps_entry(self):
+        db.session.get(User, self.user_id).access_level = 'admin'
+        db.session.flush()
+        db.session.rollback()
+        self.assertIn(self.user_id, user_cache.keys())
+
+    def test_savepoint_waits_for_outer_commit(self):
+        with db.session.begin_nested():
+            db.session.get(User, self.user_id).access_level = 'admin'
+        self.assertIn(self.user_id, user_cache.keys())
+        db.session.commit()
+        self.assertNotIn(self.user_id, user_cache.keys())
+
+
+if __name__ == '__main__':
+    unittest.main()